@@ -40,7 +40,11 @@ __license__ = "GPL"
 # POSSIBILITY OF SUCH DAMAGE.
 
 import os
+import shutil
+import glob
+import tempfile
 import time
+import asyncio
 import subprocess
 import threading
 import queue
@@ -48,13 +52,43 @@ import base64
 import select
 import socket
 import codecs
+import re
+import json
+import hashlib
+import collections
+import contextlib
+import concurrent.futures
+import ctypes
 from pathlib import Path
 import logging
 
+try:
+    import fcntl
+except ImportError:
+    # not unix, no reflinks
+    fcntl = None
+
 import http.client
 import urllib.parse
 
 TIMEOUT = 1800 # Global time out 30 minutes
+CONSOLE_HISTORY = 50 # Console lines kept to report when hercules exits
+
+
+class HerculesExited(Exception):
+    '''
+    Raised to anyone waiting on the hercules console when hercules exits
+    without being asked to.
+
+    Attributes:
+        returncode (int): the hercules exit code
+        last_lines (list): the last console lines hercules printed
+    '''
+    def __init__(self, returncode, last_lines):
+        self.returncode = returncode
+        self.last_lines = last_lines
+        super().__init__("Hercules exited unexpectedly with return code {}. Last console lines:\n{}".format(
+            returncode, "\n".join(last_lines)))
 
 
 def print_maxcc(cc_list):
@@ -86,913 +120,4419 @@ def print_maxcc(cc_list):
     print(" # "+"-" * (sum(int(length) for length in max_lengths.values()) + len(max_lengths) + 5 ))
     print(" #")
 
-class automation:
+def parse_job_results(lines, logger, steps_cc={}, ignore=False):
+    '''
+    Turns the CSV lines returned by the AUTOMVS /JOB command in to the
+    results of each step.
 
-    def __new__(self,
-                 system_path="mvsce/",
-                 system='MVSCE',
-                 loglevel=logging.WARNING,
-                 config=None,
-                 rc=None, 
-                 ip='127.0.0.1',
-                 punch_port=3505,
-                 web_port=8038,
-                 timeout=TIMEOUT,
-                 username='HERC01',
-                 password='CUL8TR',
-                 remote=False,
-                 remote_port=3702
-                ):
-        
-        if remote:
-            return(
-                remote_mvs(
-                 system=system, 
-                 ip=ip,
-                 punch_port=punch_port,
-                 automvs_port=remote_port,
-                 web_port=web_port,
-                 loglevel=loglevel,
-                 timeout=timeout,
-                 username=username,
-                 password=password
-                )
-            )
-    
-        if 'MVSCE' in system.upper():
+    Args:
+        lines (list): the lines between '--- Job Results' and '--- DONE'
+        logger (logging.Logger): where to log each step
+        steps_cc (dict): OPTIONAL stepname: expected condition code, the
+            default for every step is '0000'
+        ignore (bool): OPTIONAL don't raise an error for unexpected codes
 
-            return(
-                mvs(
-                 mvsce=system_path,
-                 loglevel=loglevel,
-                 config=config,
-                 rc=rc,
-                 timeout=timeout
-                )
-            )
-        elif 'TK5' in system.upper() or 'TK4-' in system.upper():
+    returns: a list of dicts, one per step
+    '''
+    failed_step = False
+    job_status = []
 
-            return(
-                turnkey(
-                    ip=ip,
-                    system=system,
-                    mvs_tk_path=system_path,
-                    punch_port=punch_port,
-                    web_port=web_port,
-                    loglevel=loglevel,
-                    timeout=timeout,
-                    username=username,
-                    password=password
-                )
-            )
+    if len(lines) == 0:
+        raise Exception('No results from job in log, check printer output for errors')
+
+    for line in lines:
+        if len(line.split(',')) < 6:
+            raise Exception(f"Line from automvs too short: {line}")
+        num, name, step, proc, prog, cc = line.split(',')
         
+        logmsg = '[MAXCC] Jobnum: {:<4} Jobname: {:<8} Procname: {:<8} Stepname: {:<8} Progname: {:<8} Exit Code: {:<8}'
+
+        log = logmsg.format(num,name,proc,step,prog,cc)
+        step_status = {
+                        "jobnum"   : num,
+                        "jobname:" : name,
+                        "procname": proc,
+                        "stepname": step,
+                        "progname": prog,
+                        "exitcode": cc
+                    }
+        maxcc=cc
+        stepname = step.strip()
+
+        logger.debug(log)
+        job_status.append(step_status)
+
+        if stepname in steps_cc:
+            expected_cc = steps_cc[stepname]
         else:
-            raise ValueError(f'System must be one of MVSCE, TK5, or TK4-. system={system}')
+            expected_cc = '0000'
 
-reply_num = 0
+        if maxcc != expected_cc and maxcc != "*FLUSH*":
+            error = "[MAXCC] Step {} Condition Code does not match expected condition code: {} vs {} review prt00e.txt for errors".format(stepname,cc,expected_cc)
+            if ignore:
+                logger.debug(error)
+            else:
+                logger.error(error)
+            failed_step = True
 
-class mvs:
-    
-    error_check = [
-                'open error',
-                'Creating crash dump',
-                'DISASTROUS ERROR',
-                'HHC01023W Waiting for port 3270 to become free for console connections',
-                'disabled wait state 00020000 80000005',
-                'invalid ipl psw 0000000000000'
-              ]
-    cwd = os.getcwd()
-    quit_herc_event = threading.Event()
-    kill_hercules = threading.Event()
-    reset_herc_event = threading.Event()
-    STDERR_to_logs = threading.Event()
-    running_folder = os.getcwd()
+    if failed_step and not ignore:
+        logger.error(f"Job Failed with maxcc: {maxcc}")
+        print_maxcc(job_status)
+        raise ValueError(error)
 
-    '''
-    Mainframe automation class.
-    =================================
+    return job_status
 
-    This class contains modules to automate MVS/CE. 
+class ebcdic_codec:
+    '''
+    Converts between EBCDIC and ASCII (ISO-8859-1) with precomputed 256
+    byte tables, so a whole deck or dataset is converted with one
+    bytes.translate() call. Works on bytes, bytearray and memoryview.
 
-    Examples:
-        IPL MVS/CE and submit JCL and check the results, attach a device
-        and send an operator command::
+    Use ebcdic_codec.get() for one of the codepages in EBCDIC_CODEPAGES:
+    'cp037', 'cp1047' or 'hercules' (the Hercules 819/1047 codepage).
 
-            >>> from automvs import automation
-            >>> cwd = os.getcwd()
-            >>> build = automation()
-            >>> build.ipl(clpa=False)
-            >>> try:
-            >>>     print("Submitting {}/jcl/upload.jcl".format(cwd))
-            >>>     with open("{}/jcl/upload.jcl".format(cwd),"r") as jcl:
-            >>>         build.submit(jcl.read())
-            >>>     build.wait_for_string("HASP250 UPLOAD   IS PURGED")
-            >>>     build.check_maxcc("UPLOAD")
-            >>>     build.send_herc('devinit 170 tape/zdlib1.het')
-            >>>     build.wait_for_string("IEF238D SMP4P44 - REPLY DEVICE NAME OR 'CANCEL'.")
-            >>>     build.send_reply('170')
-            >>>     build.send_oper("$DU")
-            >>> finally:
-            >>>     build.quit_hercules()
+    Args:
+        name (str): the codepage name
+        to_ascii (bytes): 256 byte table of EBCDIC byte to ISO-8859-1 byte
+    '''
 
+    def __init__(self, name, to_ascii):
+        if sorted(to_ascii) != list(range(256)):
+            raise ValueError(f"{name} table must map all 256 bytes one to one")
+        self.name = name
+        self.to_ascii = bytes(to_ascii)
+        to_ebcdic = bytearray(256)
+        for e, a in enumerate(self.to_ascii):
+            to_ebcdic[a] = e
+        self.to_ebcdic = bytes(to_ebcdic)
+        self.space = self.to_ebcdic[0x20:0x21]
+
+    @classmethod
+    def get(cls, codepage='cp037'):
+        ''' returns the codec for a codepage name, or codepage if it is a codec '''
+        if isinstance(codepage, cls):
+            return codepage
+        try:
+            return EBCDIC_CODEPAGES[codepage.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown EBCDIC codepage {codepage}, use one of {list(EBCDIC_CODEPAGES)}")
+
+    def encode(self, text):
+        ''' str (or ISO-8859-1 bytes) to EBCDIC bytes '''
+        if isinstance(text, str):
+            text = text.encode('latin-1')
+        return text.translate(self.to_ebcdic)
+
+    def decode(self, data):
+        ''' EBCDIC bytes to str '''
+        return data.translate(self.to_ascii).decode('latin-1')
+
+    def split_records(self, data, lrecl=80):
+        ''' returns data split in to lrecl byte memoryviews, without copying '''
+        if len(data) % lrecl:
+            raise ValueError(f"{len(data)} bytes is not a whole number of {lrecl} byte records")
+        view = memoryview(data)
+        return [view[i:i + lrecl] for i in range(0, len(view), lrecl)]
+
+    def join_records(self, records, lrecl=80):
+        ''' joins EBCDIC records padding each one to lrecl with EBCDIC spaces '''
+        out = bytearray()
+        for record in records:
+            if len(record) > lrecl:
+                raise ValueError(f"Record longer than {lrecl} bytes: {self.decode(record)}")
+            out += record
+            out += self.space * (lrecl - len(record))
+        return bytes(out)
+
+    def encode_records(self, lines, lrecl=80):
+        ''' ASCII lines to lrecl byte EBCDIC records, padded with spaces '''
+        for line in lines:
+            if len(line) > lrecl:
+                raise ValueError(f"Line longer than {lrecl} bytes: {line}")
+        return self.encode(''.join(line.ljust(lrecl) for line in lines))
+
+    def decode_records(self, data, lrecl=80):
+        ''' lrecl byte EBCDIC records to ASCII lines, trailing spaces removed '''
+        text = self.decode(data)
+        return [text[i:i + lrecl].rstrip(' ') for i in range(0, len(text), lrecl)]
+
+CP037 = codecs.decode(bytes(range(256)), 'cp037').encode('latin-1')
+# cp1047 is cp037 with ^ ¬ [ ] Ý ¨ moved
+CP1047 = CP037.translate(bytes.maketrans(b'^\xac[]\xdd\xa8', b'\xac^\xdd\xa8[]'))
+# Hercules 819/1047 also swaps NL and LF, so EBCDIC newlines are ASCII ones
+HERCULES_1047 = CP1047.translate(bytes.maketrans(b'\n\x85', b'\x85\n'))
+
+EBCDIC_CODEPAGES = {
+    'cp037': ebcdic_codec('cp037', CP037),
+    'cp1047': ebcdic_codec('cp1047', CP1047),
+    'hercules': ebcdic_codec('hercules', HERCULES_1047),
+}
+EBCDIC_CODEPAGES['819/1047'] = EBCDIC_CODEPAGES['hercules']
+
+class ebcdic_text_writer:
+    '''
+    Converts an EBCDIC file to ASCII text as it is written to binary_out.
+    With an lrecl each record becomes a line with its trailing spaces
+    removed.
 
     Args:
-        mvsce (str): Path to the MVS/CE folder.
-        config (str): OPTIONAL path to a different hercules config file. If
-            one is not provided the one included with MVS/CE will be used.
-        rc (str): OPTIONAL path to a different hercules rc file. If
-            one is not provided the one included with MVS/CE will be used.
-        timeout (int): how long, in seconds, to wait for MVS console output
-            messages. Default is 30 minutes.
-        loglevel (int): Level of logging, based on
-            https://docs.python.org/3/library/logging.html#levels.
-            Defaults to ``loggin.WARNING``.
+        binary_out: writable binary file object
+        codepage (str): the codepage, see ebcdic_codec
+        lrecl (int): OPTIONAL record length
     '''
-    def __init__(self,
-                 mvsce="mvsce/",
-                 loglevel=logging.WARNING,
-                 config=None,
-                 rc=None,
-                 timeout=None
-                ):
-
-        self.config = config
-        self.rc = rc
-        self.timeout=timeout
-        self.mvsce_location = Path(mvsce)
-        self.hercproc = False
-        self.stderr_q = queue.Queue()
-        self.stdout_q = queue.Queue()
 
+    def __init__(self, binary_out, codepage='cp037', lrecl=None):
+        self.binary_out = binary_out
+        self.codec = ebcdic_codec.get(codepage)
+        self.lrecl = lrecl
+        self.pending = b''
+
+    def write(self, data):
+        if not self.lrecl:
+            self.binary_out.write(data.translate(self.codec.to_ascii))
+            return len(data)
+        size = len(data)
+        data = self.pending + data
+        end = len(data) - len(data) % self.lrecl
+        self.pending = data[end:]
+        lines = self.codec.decode_records(data[:end], self.lrecl)
+        self.binary_out.write(''.join(line + '\n' for line in lines).encode('latin-1'))
+        return size
+
+    def close(self):
+        if self.pending:
+            self.binary_out.write((self.codec.decode(self.pending).rstrip(' ') + '\n').encode('latin-1'))
+            self.pending = b''
+
+DECK_CHUNK_SIZE = 64 * 1024
+
+def card_images(chunks, lrecl=80, codepage='cp037'):
+    '''
+    Turns ASCII text in to EBCDIC card images, one lrecl byte record per
+    line padded with EBCDIC spaces.
 
-        if not self.config:
-            self.config = self.mvsce_location / "conf/local.cnf"
-        if not self.rc:
-            self.rc = self.mvsce_location / "conf/mvsce.rc"
+    Args:
+        chunks (iterable): pieces of text, lines can be split across them
+        codepage (str): OPTIONAL the codepage, see ebcdic_codec
 
-        # make sure this stuff exists
-        if not self.mvsce_location.exists():
-            raise Exception("The MVS/CE folder provided does not exist: {}".format(self.mvsce_location))
+    yields: bytes, one or more card images at a time
+    '''
+    codec = ebcdic_codec.get(codepage)
+    partial = ''
+    for chunk in chunks:
+        lines = (partial + chunk).split('\n')
+        partial = lines.pop()
+        if lines:
+            yield codec.encode_records([line.rstrip('\r') for line in lines], lrecl)
+    if partial:
+        yield codec.encode_records([partial.rstrip('\r')], lrecl)
+
+def send_deck(host, port, deck, ebcdic=False, chunk_size=DECK_CHUNK_SIZE, codepage='cp037'):
+    '''
+    Sends a deck to a hercules card reader socket without holding all of
+    it in memory.
 
-        if not self.config.exists():
-            raise Exception("The MVS/CE config file provided does not exist: {}".format(self.config))
-            
-        if not self.rc.exists():
-            raise Exception("The MVS/CE rc file provided does not exist: {}".format(self.rc))
+    Args:
+        host (str): hercules host
+        port (int): card reader port
+        deck: the JCL as a str or bytes, a path (pathlib.Path or other
+            os.PathLike, a str is always treated as JCL), an open file or
+            an iterable of bytes. Binary files and bytes are sent as they
+            are, files with socket.sendfile(), so with ebcdic they must
+            already be EBCDIC card images
+        ebcdic (bool): OPTIONAL the reader is in EBCDIC mode, text (and
+            paths, which are read as text) is turned in to 80 byte EBCDIC
+            card images as it is sent
+        chunk_size (int): OPTIONAL how much text to read/send at a time
+        codepage (str): OPTIONAL EBCDIC codepage for text, see ebcdic_codec
+
+    returns: the number of bytes sent
+    '''
+    with contextlib.ExitStack() as stack:
+        deck = _open_deck(stack, deck, ebcdic)
 
+        sock = stack.enter_context(socket.create_connection((host, int(port))))
 
-        # Create the Logger
-        self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
-        logger_formatter = logging.Formatter(
-            '%(levelname)s :: %(funcName)s :: %(message)s')
+        if isinstance(deck, (bytes, bytearray, memoryview)):
+            sock.sendall(deck)
+            return len(deck)
 
-        # Log to stderr
-        ch = logging.StreamHandler()
-        ch.setFormatter(logger_formatter)
-        ch.setLevel(loglevel)
-        if not self.logger.hasHandlers():
-            self.logger.addHandler(ch)
+        if not isinstance(deck, str) and hasattr(deck, 'read') and isinstance(deck.read(0), bytes):
+            return sock.sendfile(deck)
 
-        self.logger.debug("[AUTOMATION: MVS/CE] MVS/CE Location: {}".format(self.mvsce_location))
-        self.logger.debug("[AUTOMATION: MVS/CE] MVS/CE config location: {}".format(self.config))
-        self.logger.debug("[AUTOMATION: MVS/CE] MVS/CE RC location: {}".format(self.rc))
-        self.logger.debug("[AUTOMATION: MVS/CE] Current working directory {}".format(mvs.running_folder))
+        sent = 0
+        for data in _deck_chunks(deck, ebcdic, chunk_size, codepage):
+            sock.sendall(data)
+            sent += len(data)
+        return sent
 
-        self.change_to_mvsce()
+async def async_send_deck(host, port, deck, ebcdic=False, chunk_size=DECK_CHUNK_SIZE, codepage='cp037'):
+    ''' asyncio version of send_deck() '''
+    with contextlib.ExitStack() as stack:
+        deck = _open_deck(stack, deck, ebcdic)
 
-    def kill(self):
-        self.hercproc.kill()
+        reader, writer = await asyncio.open_connection(host, int(port))
+        try:
+            if isinstance(deck, (bytes, bytearray, memoryview)):
+                writer.write(deck)
+                await writer.drain()
+                return len(deck)
+
+            if not isinstance(deck, str) and hasattr(deck, 'read') and isinstance(deck.read(0), bytes):
+                return await asyncio.get_running_loop().sendfile(writer.transport, deck)
+
+            sent = 0
+            for data in _deck_chunks(deck, ebcdic, chunk_size, codepage):
+                writer.write(data)
+                sent += len(data)
+                await writer.drain()
+            return sent
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+def _open_deck(stack, deck, ebcdic):
+    ''' opens a path deck, as text if it has to be turned in to EBCDIC cards '''
+    if isinstance(deck, os.PathLike):
+        return stack.enter_context(open(deck, 'r' if ebcdic else 'rb'))
+    return deck
+
+def _deck_chunks(deck, ebcdic, chunk_size, codepage):
+    if isinstance(deck, str):
+        chunks = (deck[i:i + chunk_size] for i in range(0, len(deck), chunk_size))
+    elif hasattr(deck, 'read'):
+        chunks = iter(lambda: deck.read(chunk_size), '')
+    else:
+        return deck # already bytes
+    return card_images(chunks, codepage=codepage) if ebcdic else (chunk.encode() for chunk in chunks)
+
+XMI_DLM_CHARS = '@#$ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+def xmi_deck(path, dsn, jobname, user=None, password=None, replace=False, unit='SYSALLDA', dirblks=50):
+    '''
+    Builds the EBCDIC deck for a job that copies an XMI file from the card
+    reader with IEBGENER and unpacks it to dsn with RECV370. The file is
+    only read when the deck is sent.
 
-    def start_threads(self):
-        # start a pair of threads to read output from hercules
-        self.stdout_thread = threading.Thread(target=self.queue_stdout, args=(self.hercproc.stdout,self.stdout_q))
-        self.stderr_thread = threading.Thread(target=self.queue_stderr, args=(self.hercproc.stderr,self.stderr_q))
-        self.check_hercules_thread = threading.Thread(target=self.check_hercules, args=[self.hercproc])
-        # self.queue_printer_thread = threading.Thread(target=self.queue_printer, args=('prt00e.txt',printer_q))
-        self.stdout_thread.daemon = True
-        self.stderr_thread.daemon = True
-        # self.queue_printer_thread.daemon = True
-        self.check_hercules_thread.daemon = True
-        self.stdout_thread.start()
-        self.stderr_thread.start()
-        self.check_hercules_thread.start()
-        # self.queue_printer_thread.start()
+    Args:
+        path (str): the XMI file
+        dsn (str): the dataset to receive in to
+        jobname (str): the job name
+        user (str): OPTIONAL USER= for the job card
+        password (str): OPTIONAL PASSWORD= for the job card
+        replace (bool): OPTIONAL delete dsn first if it exists
+        unit (str): OPTIONAL unit for the datasets
+        dirblks (int): OPTIONAL directory blocks for dsn
+
+    returns: a generator of bytes for send_deck()
+    '''
+    size = os.path.getsize(path)
+    if size == 0 or size % 80:
+        raise ValueError(f"{path} is not an XMI file, its size ({size}) is not a multiple of 80")
+
+    # the delimiter can't be the start of any record of the XMI file
+    starts = set()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(80 * 1024), b''):
+            starts.update(chunk[i:i + 2] for i in range(0, len(chunk), 80))
+    dlm = next((a + b for a in XMI_DLM_CHARS for b in XMI_DLM_CHARS
+                if EBCDIC_CODEPAGES['cp037'].encode(a + b) not in starts), None)
+    if not dlm:
+        raise ValueError(f"No DLM= delimiter available for {path}")
+
+    cyls = size // 500000 + 1
+    jcl = f"//{jobname} JOB (XMI),'DEPLOY XMI',CLASS=A,MSGCLASS=A,\n"
+    jcl += "//         MSGLEVEL=(1,1)"
+    if user:
+        jcl += f",USER={user},PASSWORD={password}"
+    jcl += "\n"
+    if replace:
+        jcl += ( "//DELETE   EXEC PGM=IEFBR14\n"
+                f"//DD1      DD DSN={dsn},DISP=(MOD,DELETE),\n"
+                f"//            UNIT={unit},SPACE=(TRK,0)\n")
+    jcl += ( "//UPLOAD   EXEC PGM=IEBGENER\n"
+             "//SYSPRINT DD SYSOUT=*\n"
+             "//SYSIN    DD DUMMY\n"
+            f"//SYSUT2   DD DSN=&&XMIT,DISP=(NEW,PASS),UNIT={unit},\n"
+            f"//            SPACE=(CYL,({cyls},{cyls})),\n"
+             "//            DCB=(RECFM=FB,LRECL=80,BLKSIZE=3120)\n"
+            f"//SYSUT1   DD DATA,DLM={dlm}\n")
+    end = (f"{dlm}\n"
+            "//RECV370  EXEC PGM=RECV370,COND=(0,NE)\n"
+            "//RECVLOG  DD SYSOUT=*\n"
+            "//XMITIN   DD DSN=&&XMIT,DISP=(OLD,DELETE)\n"
+            "//SYSPRINT DD SYSOUT=*\n"
+            "//SYSIN    DD DUMMY\n"
+           f"//SYSUT1   DD UNIT={unit},SPACE=(CYL,({cyls},{cyls}))\n"
+           f"//SYSUT2   DD DSN={dsn},DISP=(NEW,CATLG,DELETE),UNIT={unit},\n"
+           f"//            SPACE=(CYL,({cyls},{cyls},{dirblks}),RLSE)\n"
+            "//\n")
+
+    def deck():
+        yield from card_images([jcl])
+        with open(path, 'rb') as f:
+            yield from iter(lambda: f.read(DECK_CHUNK_SIZE // 80 * 80), b'')
+        yield from card_images([end])
+
+    return deck()
+
+class printer_index:
+    '''
+    Incremental index of the IEF142I step messages in a hercules printer file.
 
-    def queue_stdout(self, pipe, q):
-        ''' queue the stdout in a non blocking way'''
-        global reply_num
-        while True:
+    Each call to refresh() only parses the bytes appended since the last
+    call, so looking up the steps of a job does not re-read the whole
+    printer file. If the printer file is truncated or replaced (e.g. when
+    hercules is restarted) the index is rebuilt from the start of the file.
 
-            l = pipe.readline()
-            if len(l.strip()) > 0:
-                if len(l.strip()) > 3 and l[0:2] == '/*' and l[2:4].isnumeric():
-                    reply_num = l[2:4]
-                    self.logger.debug("[AUTOMATION: MVS/CE] Reply number set to {}".format(reply_num))
-                if  "HHC90020W" not in l and "HHC00007I" not in l and "HHC00107I" not in l and "HHC00100I" not in l:
-                    # ignore these messages, they're just noise
-                    # HHC90020W 'hthread_setschedparam()' failed at loc=timer.c:193: rc=22: Invalid argument
-                    # HHC00007I Previous message from function 'hthread_set_thread_prio' at hthreads.c(1170)
-                    self.logger.debug("[HERCLOG] {}".format(l.strip()))
-                    q.put(l)
-                    for errors in mvs.error_check:
-                        if errors in l:
-                            self.logger.critical("Quiting! Irrecoverable Hercules error: {}".format(l.strip()))
-                            mvs.kill_hercules.set()
-            if mvs.reset_herc_event.is_set():
-                break
+    Args:
+        printer_file (str): location of the printer file from hercules
+    '''
 
-    def queue_stderr(self, pipe, q):
-        ''' queue the stderr in a non blocking way'''
-        while True:
-            l = pipe.readline()
-            if len(l.strip()) > 0:
-                if mvs.STDERR_to_logs.is_set():
-                    self.logger.debug("[DIAG] {}".format(l.strip()))
-                if 'MIPS' in l:
-                    self.logger.debug("[DIAG] {}".format(l.strip()))
-                q.put(l)
+    HASP373 = re.compile(r'JOB\s*(\d+)\s+\$HASP373\s+(\S+)')
+    CHUNK_SIZE = 1024 * 1024
 
-                for errors in mvs.error_check:
-                    if errors in l:
-                        self.logger.debug("Quiting! Irrecoverable Hercules error: {}".format(l.strip()))
-                        mvs.kill_hercules.set()
-            if mvs.reset_herc_event.is_set():
-                break
+    def __init__(self, printer_file):
+        self.printer_file = printer_file
+        self.clear()
 
-    def check_hercules(self, hercproc):
-        ''' check to make sure hercules is still running '''
-        while hercproc.poll() is None:
-            if mvs.quit_herc_event.is_set() or mvs.reset_herc_event.is_set():
-                self.logger.debug("[AUTOMATION: MVS/CE] Quit Event enabled exiting hercproc monitoring")
-                return
-            if mvs.kill_hercules.is_set():
-                hercproc.kill()
-                break
-            continue
+    def clear(self):
+        self.offset = 0
+        self.inode = None
+        self.partial = b''
+        self.jobs = {}       # jobname -> list of IEF142I step records
+        self.jobnums = {}    # jobnum -> list of IEF142I step records
+        self.current = {}    # jobname -> job number currently being printed
 
-        self.logger.debug("[ERROR] - Hercules Exited Unexpectedly")
-        os._exit(1)
+    def refresh(self):
+        ''' parses any output appended to the printer file since the last refresh '''
+        stat = os.stat(self.printer_file)
 
-    def check_maxcc(self, jobname, steps_cc={}, printer_file='printers/prt00e.txt',ignore=False):
-      '''Checks job and steps results, raises error
-          If the step is in steps_cc, check the step vs the cc in the dictionary
-          otherwise checks if step is zero
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            # new or truncated printer file, start over
+            self.clear()
+            self.inode = stat.st_ino
 
-         jobname (str): name of the job to check from the printer file output
-         steps_cc (dict): pairs of step names and expected CC. This should be used
-            if you expect a specific step to have a return code other than zero. Procs
-            are now supported, use PROCNAME.STEP
-         printer_file (str): location of the printer file from hercules that
-            contains the job output.
-         ignore (bool): tells the function to ignore failed steps
+        if stat.st_size == self.offset:
+            return
 
-         returns: a list of dicts with 'jobname, procname, stepname, exitcode'
+        with open(self.printer_file, 'rb') as f:
+            f.seek(self.offset)
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.offset += len(chunk)
+                lines = (self.partial + chunk).split(b'\n')
+                self.partial = lines.pop()
+                for line in lines:
+                    self.parse(line.decode(errors='ignore'))
+
+    def parse(self, line):
+        if '$HASP373' in line:
+            m = self.HASP373.search(line)
+            if m:
+                self.current[m.group(2)] = str(int(m.group(1)))
+            return
 
-      '''
-      self.logger.debug("[AUTOMATION: MVS/CE] Checking {} job results".format(jobname))
+        if 'IEF142I' not in line:
+            return
 
-      found_job = False
-      failed_step = False
-      job_status = []
+        x = line.strip().split()
+        y = x.index('IEF142I')
+        j = x[y:]
+        # IEF142I JOB STEP - ... COND CODE cc, or with a procstep
+        # IEF142I JOB PROC STEP - ... COND CODE cc, check_maxcc reads cc
+        if len(j) < (11 if j[3:4] == ['-'] else 12):
+            return
 
-      logmsg = '[MAXCC] Jobname: {:<8} Procname: {:<8} Stepname: {:<8} Exit Code: {:<8}'
+        jobnum = self.current.get(j[1])
+        record = {'jobnum': jobnum, 'fields': j}
+        self.jobs.setdefault(j[1], []).append(record)
+        if jobnum:
+            self.jobnums.setdefault(jobnum, []).append(record)
 
-      procname =''
-      with open(printer_file, 'r', errors='ignore') as f:
-          for line in f.readlines():
-              if 'IEF142I' in line and jobname in line:
+    def steps(self, jobname, jobnum=None):
+        ''' returns the IEF142I step records for jobname, or only job number jobnum '''
+        self.refresh()
+        if jobnum is not None:
+            return [r for r in self.jobnums.get(str(int(jobnum)), []) if r['fields'][1] == jobname]
+        return self.jobs.get(jobname, [])
 
-                  found_job = True
+class file_watch:
+    '''
+    Blocks until a file changes.
 
-                  x = line.strip().split()
-                  y = x.index('IEF142I')
-                  j = x[y:]
+    On Linux the folder containing the file is watched with inotify so
+    wait() returns as soon as anything is written, created, moved or
+    deleted in it. Everywhere else (or if inotify is not available) it
+    falls back to sleeping, doubling the delay each time nothing changed
+    up to MAX_DELAY. Call reset() whenever new data was found so the next
+    wait is short again.
 
-                  log = logmsg.format(j[1],'',j[2],j[10])
-                  step_status = {
-                                    "jobname" : j[1],
-                                    "procname": '',
-                                    "stepname": j[2],
-                                    "exitcode": j[10]
-                                }
-                  maxcc=j[10]
-                  stepname = j[2]
-
-                  if j[3] != "-":
-                      log = logmsg.format(j[1],j[2],j[3],j[11])
-                      step_status = {
-                                        "jobname" : j[1],
-                                        "procname": j[2],
-                                        "stepname": j[3],
-                                        "exitcode": j[11]
-                                    }
-                      stepname = j[3]
-                      procname = j[2]
-                      maxcc=j[11]
-
-                  self.logger.debug(log)
-                  job_status.append(step_status)
-
-                  if f"{procname}.{stepname}" in steps_cc:
-                      expected_cc = steps_cc[f"{procname}.{stepname}"]
-                  elif stepname in steps_cc:
-                      expected_cc = steps_cc[stepname]
-                  else:
-                      expected_cc = '0000'
-
-                  if maxcc != expected_cc:
-                      error = "Step {} Condition Code does not match expected condition code: {} vs {} review prt00e.txt for errors".format(stepname,j[-1],expected_cc)
-                      if ignore:
-                        self.logger.debug(error)
-                      else:
-                        self.logger.error(error)
-                        
-                      failed_step = True
+    Args:
+        path (str): the file to watch
+    '''
 
-      if not found_job:
-          raise ValueError("Job {} not found in printer output {}".format(jobname, printer_file))
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    MIN_DELAY = 0.001
+    MAX_DELAY = 0.1
+    MAX_INOTIFY_WAIT = 1 # recheck the file even if inotify is quiet
+
+    def __init__(self, path):
+        self.path = path
+        self.delay = self.MIN_DELAY
+        self.fd = None
 
-      if failed_step and not ignore:
-          raise ValueError(error)
-        
-      return(job_status)
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if fd < 0:
+                return
+            mask = (self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE |
+                    self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_CREATE |
+                    self.IN_DELETE)
+            folder = os.path.dirname(os.path.abspath(path))
+            if libc.inotify_add_watch(fd, os.fsencode(folder), mask) < 0:
+                os.close(fd)
+                return
+            self.fd = fd
+        except (OSError, AttributeError):
+            # not linux, no inotify
+            self.fd = None
+
+    def wait(self, timeout):
+        ''' waits at most timeout seconds for the file to change '''
+        if timeout <= 0:
+            return
 
-    def reset_hercules(self,clpa=False):
-        self.logger.debug('[AUTOMATION: MVS/CE] Restarting hercules')
-        self.quit_hercules(msg=False)
+        if self.fd is None:
+            time.sleep(min(self.delay, timeout))
+            self.delay = min(self.delay * 2, self.MAX_DELAY)
+            return
 
-        # drain STDERR and STDOUT
-        while True:
+        ready = select.select([self.fd], [], [], min(timeout, self.MAX_INOTIFY_WAIT))
+        if ready[0]:
+            # we only care that something happened, throw the events away
             try:
-                line = self.stdout_q.get(False).strip()
-            except queue.Empty:
-                break
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    async def async_wait(self, timeout):
+        ''' same as wait() but without blocking the asyncio event loop '''
+        if timeout <= 0:
+            return
 
-        while True:
-            try:
-                line = self.stderr_q.get(False).strip()
-            except queue.Empty:
-                break
+        if self.fd is None:
+            await asyncio.sleep(min(self.delay, timeout))
+            self.delay = min(self.delay * 2, self.MAX_DELAY)
+            return
 
-        mvs.reset_herc_event.set()
+        loop = asyncio.get_running_loop()
+        changed = loop.create_future()
+        loop.add_reader(self.fd, lambda: changed.done() or changed.set_result(None))
+        try:
+            await asyncio.wait_for(changed, min(timeout, self.MAX_INOTIFY_WAIT))
+        except asyncio.TimeoutError:
+            return
+        finally:
+            loop.remove_reader(self.fd)
 
         try:
-            self.hercmd = subprocess.check_output(["which", "hercules"]).strip()
-        except:
-            raise Exception('hercules not found')
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
 
-        self.logger.debug("[AUTOMATION: MVS/CE] Launching hercules")
+    def reset(self):
+        self.delay = self.MIN_DELAY
 
-        h = [ "hercules", '--externalgui', '-f',self.config ]
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
 
-        if not clpa:
-            h.append("-r")
-            h.append(self.rc)
+    def __del__(self):
+        self.close()
 
-        self.logger.debug("[AUTOMATION: MVS/CE] Launching hercules with: {}".format(h))
+class log_tail:
+    '''
+    Follows a log file with a single open file handle.
 
-        self.hercproc = subprocess.Popen(h,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True)
-        mvs.reset_herc_event.clear()
-        mvs.quit_herc_event.clear()
-        self.start_threads()
-
-        rc = self.hercproc.poll()
-        if rc is not None:
-            raise("[AUTOMATION: MVS/CE] Unable to start hercules")
-        self.logger.debug("[AUTOMATION: MVS/CE] Hercules launched")
-        #self.write_logs()
-        self.logger.debug("[AUTOMATION: MVS/CE] Hercules Re-initialization Complete")
+    read_lines() returns the complete lines added since the last call and
+    wait_lines() blocks (see file_watch) until there are some. If the log
+    is replaced (rotated) the rest of the old file is read before switching
+    to the new one, and if it is truncated (e.g. TK5 restarting) reading
+    starts again from the top.
+
+    Args:
+        path (str): the log file to follow
+    '''
 
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.inode = None
+        self.partial = b''
+        self.watch = file_watch(path)
 
-    def quit_hercules(self, msg=True):
-        if msg:
-            self.logger.debug("[AUTOMATION: MVS/CE] Shutting down hercules")
-        if not self.hercproc or self.hercproc.poll() is not None:
-            self.logger.debug("[AUTOMATION: MVS/CE] Hercules already shutdown")
+    def __open(self):
+        try:
+            self.file = open(self.path, 'rb')
+        except FileNotFoundError:
+            self.file = None
             return
-        mvs.quit_herc_event.set()
-        self.send_herc('quit')
-        self.wait_for_string('Hercules shutdown complete', stderr=True)
-        if msg:
-            self.logger.debug('[AUTOMATION: MVS/CE] Hercules has exited')
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.partial = b''
 
-    def wait_for_job(self, jobname, stderr=False, timeout=False):
-        self.wait_for_string("HASP250 {:<8} IS PURGED".format(jobname),stderr=stderr, timeout=timeout)
+    def read_lines(self):
+        ''' returns the new complete lines in the log, does not block '''
+        if not self.file:
+            self.__open()
+            if not self.file:
+                return []
 
-    def wait_for_string(self, string_to_waitfor, stderr=False, timeout=False):
+        data = self.file.read()
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+
+        if stat and stat.st_ino != self.inode:
+            # rotated, finish the old file then switch
+            self.file.close()
+            self.__open()
+            if self.file:
+                data += self.file.read()
+        elif stat and stat.st_size < self.file.tell():
+            # truncated, start from the top
+            self.file.seek(0)
+            self.partial = b''
+            data = self.file.read()
+
+        if not data:
+            return []
+
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        return [line.decode(errors='ignore') + '\n' for line in lines]
+
+    def wait_lines(self, timeout):
+        ''' waits up to timeout seconds for new lines, returns [] on timeout '''
+        deadline = time.monotonic() + timeout
+        while True:
+            lines = self.read_lines()
+            if lines:
+                self.watch.reset()
+                return lines
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            self.watch.wait(remaining)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.watch.close()
+
+class punch_reader:
+    '''
+    Follows a 3525 punch file attached in EBCDIC mode and splits what is
+    punched in to one deck per job using the JES2 separator cards.
+
+    The file is read from the last byte offset so each card is only read
+    once, and new cards are translated to ASCII all at once with a
+    translate table. A deck is returned once its end separator card is
+    punched. The default separator matches JES2's job separator cards,
+    e.g. ``****A  START  JOB   27  HERC01A   ROOM ...`` and the same with
+    ``END``, see tests/data/pch00d.txt.
+
+    Args:
+        path (str): the punch file
+        separator (str): OPTIONAL regex matching separator cards, with the
+            named groups 'edge' (START or END), 'jobnum' and 'jobname'
+        codepage (str): OPTIONAL EBCDIC codepage, see ebcdic_codec
+        lrecl (int): OPTIONAL card length
+    '''
+
+    SEPARATOR = r'^[\s*]*[A-Z]?\s*(?P<edge>START|END)\s+JOB\s+(?P<jobnum>\d+)\s+(?P<jobname>[A-Z@#$][A-Z0-9@#$]{0,7})'
+
+    def __init__(self, path, separator=SEPARATOR, codepage='cp037', lrecl=80):
+        self.path = path
+        self.separator = re.compile(separator)
+        self.codec = ebcdic_codec.get(codepage)
+        self.lrecl = lrecl
+        self.offset = 0
+        self.partial = b''
+        self.deck = None # the deck being punched
+        self.watch = file_watch(path)
+
+    def read_decks(self):
+        ''' returns the decks finished since the last call, does not block '''
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    # reattached or truncated, start from the top
+                    self.offset = 0
+                    self.partial = b''
+                    self.deck = None
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        if not data:
+            return []
+
+        self.offset += len(data)
+        data = self.partial + data
+        end = len(data) - len(data) % self.lrecl
+        data, self.partial = data[:end], data[end:]
+        text = self.codec.decode(data)
+
+        decks = []
+        for start in range(0, end, self.lrecl):
+            card = text[start:start + self.lrecl]
+            separator = self.separator.match(card)
+
+            if not separator:
+                if self.deck:
+                    self.deck['cards'].append(card.rstrip())
+                    self.deck['data'] += data[start:start + self.lrecl]
+                continue
+
+            edge, jobnum, jobname = separator.group('edge', 'jobnum', 'jobname')
+            if edge == 'START':
+                if not self.deck or self.deck['jobnum'] != jobnum:
+                    self.deck = {'jobname': jobname, 'jobnum': jobnum, 'cards': [], 'data': bytearray()}
+            elif self.deck and self.deck['jobnum'] == jobnum:
+                self.deck['data'] = bytes(self.deck['data'])
+                decks.append(self.deck)
+                self.deck = None
+
+        return decks
+
+    def wait_decks(self, timeout):
+        ''' waits up to timeout seconds for decks, returns [] on timeout '''
+        deadline = time.monotonic() + timeout
+        while True:
+            decks = self.read_decks()
+            if decks:
+                self.watch.reset()
+                return decks
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            self.watch.wait(remaining)
+
+    def follow(self, timeout=TIMEOUT):
         '''
-           Reads stdout queue waiting for expected response, default is
-           to check STDOUT queue, set stderr=True to check stderr queue instead
-           default timeout is 30 minutes
+        yields decks as they are punched, stops when there hasn't been a
+        new one for timeout seconds
+
+        yields: dicts with 'jobname', 'jobnum', 'cards' (ASCII, trailing
+            spaces removed) and 'data' (the EBCDIC cards)
         '''
-        time_started = time.time()
+        while True:
+            decks = self.wait_decks(timeout)
+            if not decks:
+                return
+            yield from decks
 
-        if not timeout and self.timeout:
-            timeout=self.timeout
+    def close(self):
+        self.watch.close()
 
-        if not timeout:
-            timeout = TIMEOUT
+class socket_reader:
+    '''
+    Buffered reader for a socket.
+
+    Data is received in large blocks with recv_into() into a reusable
+    buffer and anything past the end of the line (or frame) asked for is
+    kept for the next call.
 
-        self.logger.debug("[AUTOMATION: MVS/CE] Waiting {} seconds for string to appear in hercules log: {}".format(timeout,string_to_waitfor))
+    Args:
+        sock (socket.socket): connected socket to read from
+    '''
 
+    BUFFER_SIZE = 65536
+
+    def __init__(self, sock):
+        self.socket = sock
+        self.buffer = bytearray()
+        self.pos = 0 # start of the unread data in buffer
+        self.block = bytearray(self.BUFFER_SIZE)
+        self.view = memoryview(self.block)
+
+    def __fill(self, timeout):
+        ready = select.select([self.socket], [], [], timeout)
+        if len(ready[0]) == 0:
+            raise TimeoutError("Receive timeout")
+        received = self.socket.recv_into(self.view)
+        if received == 0:
+            raise ConnectionError("Connection closed by remote host")
+        if self.pos:
+            # drop what has already been handed out before growing the buffer
+            del self.buffer[:self.pos]
+            self.pos = 0
+        self.buffer += self.view[:received]
+
+    def readline(self, timeout):
+        ''' returns the next line, without the newline, as bytes '''
+        start = self.pos
         while True:
-            if time.time() > time_started + timeout:
-                exception = "Waiting for '{}' timed out after {} seconds".format(string_to_waitfor, timeout)
-                print("[AUTOMATION: MVS/CE] {}".format(exception))
-                raise Exception(exception)
+            end = self.buffer.find(b"\n", start)
+            if end >= 0:
+                line = bytes(self.buffer[self.pos:end])
+                self.pos = end + 1
+                return line
+            start = len(self.buffer) - self.pos
+            self.__fill(timeout)
+            start = start + self.pos
+
+    def read(self, size, timeout):
+        ''' returns exactly size bytes '''
+        while len(self.buffer) - self.pos < size:
+            self.__fill(timeout)
+        data = bytes(self.buffer[self.pos:self.pos + size])
+        self.pos += size
+        return data
+
+class job_tracker:
+    '''
+    Follows the JES2 messages of many jobs at once from one stream of
+    console lines.
 
-            try:
-                if stderr:
-                    line = self.stderr_q.get(False).strip()
-                else:
-                    line = self.stdout_q.get(False).strip()
-                while string_to_waitfor not in line:
-                    if stderr:
-                        line = self.stderr_q.get(False).strip()
-                    else:
-                        line = self.stdout_q.get(False).strip()
-                    continue
-                return
+    submit() sends a job and completed() reads console lines until at
+    least one of the jobs submitted is purged, then returns the finished
+    jobs with their check_maxcc() results. Jobs are matched to messages by
+    job number as soon as one is known ($HASP100 or the first message
+    with a number), so messages for one job can't be mistaken for another
+    job with the same name.
 
-            except queue.Empty:
-                #self.logger.debug("Empty Queue")
-                continue
-            
+    Args:
+        submit (function): submit(jcl, ebcdic=, jobname=) sends a job and
+            returns the number of bytes sent
+        check_maxcc (function): check_maxcc(jobname, steps_cc=, ignore=,
+            jobnum=) returns the step results of a job
+        next_line (function): next_line(timeout) returns the next console
+            line or None if there wasn't one before timeout
+        logger (logging.Logger): where to log
+        timeout (int): OPTIONAL seconds completed() waits, default TIMEOUT
+    '''
 
-    def wait_for_strings(self, strings_to_waitfor, stderr=False, timeout=False):
+    EVENT = re.compile(r'(?:JOB\s*(\d+)\s+)?\$HASP(100|373|395|250)\s+(\S+)')
+    STATUS = {'100': 'READ', '373': 'STARTED', '395': 'ENDED', '250': 'PURGED'}
+
+    def __init__(self, submit, check_maxcc, next_line, logger, timeout=False):
+        self.submit_job = submit
+        self.check_job = check_maxcc
+        self.next_line = next_line
+        self.logger = logger
+        self.timeout = timeout or TIMEOUT
+        self.unnumbered = {} # jobname: jobs without a job number yet, oldest first
+        self.jobs = {}       # jobnum: job
+        self.in_flight = 0
+        self.finished = []
+
+    def submit(self, jcl, jobname=False, steps_cc={}, ignore=False, ebcdic=False, **extra):
         '''
-           Reads stdout queue waiting for expected response, default is
-           to check STDOUT queue, set stderr=True to check stderr queue instead
-           default timeout is 30 minutes.and
+        Submits a job. Any extra arguments are kept in the job dict
+        returned by completed().
 
-           Unlike wait_for_string() this function takes a list of strings
-           and returns when any of the strings in the list are found. 
+        returns: the job dict, 'sent' is the number of bytes submitted
         '''
-        time_started = time.time()
+        if (ebcdic or not isinstance(jcl, str)) and not jobname:
+            raise Exception("Auto detection of EBCDIC or file JCL jobname not support. Missing jobname=")
 
-        if not timeout and self.timeout:
-            timeout=self.timeout
+        if not jobname:
+            jobname = jcl.split(" ")[0][2:]
 
-        if not timeout:
-            timeout = TIMEOUT
+        job = dict(extra, jobname=jobname.upper(), jobnum=None, status='SUBMITTED',
+                   steps_cc=steps_cc, ignore=ignore, steps=None, error=None)
 
-        self.logger.debug("[AUTOMATION: MVS/CE] Waiting {} seconds for string to appear in hercules log: {}".format(timeout,strings_to_waitfor))
+        self.logger.debug(f"[JOBS] Submitting {job['jobname']}")
+        self.unnumbered.setdefault(job['jobname'], collections.deque()).append(job)
+        self.in_flight += 1
+        job['sent'] = self.submit_job(jcl, ebcdic=ebcdic, jobname=job['jobname'])
+        return job
 
-        while True:
-            if time.time() > time_started + timeout:
-                exception = "Waiting for one of '{}' timed out after {} seconds".format(strings_to_waitfor, timeout)
-                print("[AUTOMATION: MVS/CE] {}".format(exception))
-                raise Exception(exception)
+    def feed(self, line):
+        ''' updates the jobs with a console line '''
+        m = self.EVENT.search(line)
+        if not m:
+            return
 
-            try:
-                if stderr:
-                    line = self.stderr_q.get(False).strip()
-                else:
-                    line = self.stdout_q.get(False).strip()
-                while not any(word in line for word in strings_to_waitfor):
-                    if stderr:
-                        line = self.stderr_q.get(False).strip()
-                    else:
-                        line = self.stdout_q.get(False).strip()
-                    continue
-                for word in strings_to_waitfor:
-                    if word in line:
-                        break
-                return word
+        jobnum, message, jobname = m.groups()
+        job = self.__find(jobname, jobnum)
+        if job is None:
+            return
 
-            except queue.Empty:
-                #self.logger.debug("Empty Queue")
-                continue
-            
+        job['status'] = self.STATUS[message]
+        self.logger.debug(f"[JOBS] {job['jobname']} #{job['jobnum']} {job['status']}")
 
-    def ipl(self, step_text='', clpa=False):
-        self.logger.debug(step_text)
-        self.reset_hercules(clpa=clpa)
-        #self.wait_for_string("0:0151 CKD")
+        if message == '250':
+            self.__finish(job)
 
-        if clpa:
-            self.send_herc("ipl 150")
-            self.wait_for_string("input for console 0:0009")
-            self.send_oper("r 0,clpa")
-            # self.wait_for_string('$HASP426 SPECIFY OPTIONS - HASP-II, VERSION JES2 4.1')
-            # self.send_oper('r 0,noreq')
-                             #IKT005I TCAS IS INITIALIZED
-        self.wait_for_string("IKT005I TCAS IS INITIALIZED")
+    def __find(self, jobname, jobnum):
+        if jobnum is not None:
+            jobnum = str(int(jobnum))
+            if jobnum in self.jobs:
+                return self.jobs[jobnum]
 
-    def shutdown_mvs(self, cust=False):
-        self.logger.debug("[AUTOMATION: MVS/CE] Shutting down MVS")
-        self.send_oper('$PJES2,ABEND')
-        self.wait_for_string("00 $HASP098 ENTER TERMINATION OPTION")
-        self.send_oper("r 00,PURGE")
-        if cust:
-            self.wait_for_string('IEF404I JES2 - ENDED - ')
-        else:
-            self.wait_for_string('IEF196I IEF285I   VOL SER NOS= SPOOL0.')
-        self.send_oper('z eod')
-        self.wait_for_string('IEE334I HALT     EOD SUCCESSFUL')
-        self.send_oper('quiesce')
-        self.wait_for_string("disabled wait state")
-        self.send_herc('stop')
+        waiting = self.unnumbered.get(jobname)
 
-    def send_herc(self, command=''):
-        ''' Sends hercules commands '''
-        self.logger.debug("[AUTOMATION: MVS/CE] Sending Hercules Command: {}".format(command))
-        self.hercproc.stdin.write(command+"\n")
-        self.hercproc.stdin.flush()
+        if jobnum is None:
+            # no number in the message, it belongs to the oldest job with this name
+            for job in self.jobs.values():
+                if job['jobname'] == jobname:
+                    return job
+            return waiting[0] if waiting else None
 
-    def send_oper(self, command=''):
-        ''' Sends operator/console commands (i.e. prepends /) '''
-        self.logger.debug("[AUTOMATION: MVS/CE] Sending Operator command: /{}".format(command))
-        self.send_herc("/{}".format(command))
+        if not waiting:
+            return None
 
-    def send_reply(self, command=''):
-        ''' Sends operator/console commands with automated number '''
-        self.logger.debug("[AUTOMATION: MVS/CE] Sending reply: /r {},{}".format(reply_num,command))
-        self.send_herc("/r {},{}".format(reply_num,command))
+        job = waiting.popleft()
+        job['jobnum'] = jobnum
+        self.jobs[jobnum] = job
+        return job
 
-    def submit(self,jcl, host='127.0.0.1',port=3505, ebcdic=False):
-        '''submits a job (in ASCII) to hercules listener'''
-        self.logger.debug("[AUTOMATION: MVS/CE] Submitting JCL host={} port={} EBCDIC={}".format(host,port,ebcdic))
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    def __finish(self, job):
+        if job['jobnum'] is None:
+            self.unnumbered[job['jobname']].remove(job)
+        else:
+            del self.jobs[job['jobnum']]
+        self.in_flight -= 1
 
         try:
-            # Connect to server and send data
-            sock.connect((host, port))
-            if ebcdic:
-              sock.send(jcl)
-            else:
-              sock.send(jcl.encode())
-
-        finally:
-            sock.close()
+            job['steps'] = self.check_job(job['jobname'], steps_cc=job['steps_cc'], ignore=job['ignore'], jobnum=job['jobnum'])
+        except Exception as e:
+            job['error'] = e
 
+        self.finished.append(job)
 
-    def submit_and_check(self, jcl, host='127.0.0.1',port=3505, ebcdic=False, jobname=False):
+    def completed(self, timeout=False):
+        '''
+        Blocks until at least one job is purged
 
-        if ebcdic and not jobname:
-            raise Exception("Auto detection of EBCDIC JCL jobname not support. Missing jobname=")
+        returns: a list of job dicts with 'jobname', 'jobnum', 'steps' (the
+            check_maxcc() results) and 'error' (the exception raised by
+            check_maxcc() or None)
+        '''
+        if not timeout:
+            timeout = self.timeout
 
-        if not jobname:
-            self.logger.debug("[AUTOMATION: MVS/CE] Getting job name from JCL")
-            jobname = jcl.split(" ")[0][2:]
-        
-        self.logger.debug("[AUTOMATION: MVS/CE] Submitting {}".format(jobname))
-        self.submit(jcl, host=host,port=port, ebcdic=ebcdic)
-        self.wait_for_job(jobname)
-        self.check_maxcc(jobname)
-        
+        deadline = time.monotonic() + timeout
 
-    def change_to_mvsce(self):
-        self.logger.debug("[AUTOMATION: MVS/CE] Changing to MVS/CE Folder {}".format(self.mvsce_location))
-        os.chdir(self.mvsce_location)
+        while not self.finished:
+            if not self.in_flight:
+                return []
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                waiting = [job['jobname'] for job in self.jobs.values()]
+                waiting += [job['jobname'] for jobs in self.unnumbered.values() for job in jobs]
+                raise Exception(f"Waiting for jobs {waiting} timed out after {timeout} seconds")
 
-    def change_punchcard_output(self,path):
-        self.logger.debug("[AUTOMATION: MVS/CE] Changing 3525 Punchcard output location to: '{}'".format(path))
-        if not os.path.exists(os.path.dirname(path)): 
-            self.logger.debug("[AUTOMATION: MVS/CE] Punchcard folder '{}' does not exist".format(path))
-            raise Exception("Punchcard folder '{}' does no exist".format(path))
-        self.send_herc(command='detach d')
-        self.send_herc(command='attach d 3525 {} ebcdic'.format(path))
+            line = self.next_line(remaining)
+            if line:
+                self.feed(line)
 
-class turnkey:
+        finished, self.finished = self.finished, []
+        return finished
 
-    def __init__(self,
-                 system="TK5",
-                 mvs_tk_path="mvs-tk5", 
-                 ip='127.0.0.1',
-                 punch_port=3505,
-                 web_port=8038,
-                 loglevel=logging.WARNING,timeout=300,
-                 username='HERC01',
-                 password='CUL8TR'
-                ):
-        
-        self.system = system
-        self.mvs_path = mvs_tk_path
-        self.ip = ip
-        self.timeout = timeout
-        if not Path(f"{self.mvs_path}/prt/prt00e.txt").is_file():
-            raise Exception(f"could not find TK4/TK5 prt/prt00e.txt file: {self.mvs_path}/prt/prt00e.txt")
-        if not Path(f"{self.mvs_path}/log/hardcopy.log").is_file():
-            raise Exception(f"could not find TK4/TK5 log/hardcopy.log file: {self.mvs_path}/prt/prt00e.txt")
+class remote_job_tracker:
+    '''
+    job_tracker for remote_mvs: each job submitted gets its own /JOB
+    request. With a pipelined remote_mvs they all wait at the same time
+    on the one connection, otherwise each submit() waits for its job.
 
-        self.logfile = f"{self.mvs_path}/log/hardcopy.log"
-        self.printer = f"{self.mvs_path}/prt/prt00e.txt"
+    Args:
+        remote (remote_mvs): the connection to use
+        timeout (int): OPTIONAL seconds to wait for each job
+        keep (bool): OPTIONAL don't purge the jobs once they are checked
+        port (int): OPTIONAL card reader port, default remote.punch_port
+    '''
 
-        self.username = username
-        self.password = password
+    def __init__(self, remote, timeout=False, keep=False, port=None):
+        self.remote = remote
+        self.port = port
+        self.logger = remote.logger
+        self.timeout = timeout or remote.timeout or TIMEOUT
+        self.keep = keep
+        self.pending = {} # future: job
+        self.finished = []
 
-        # Create the Logger
-        self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
-        logger_formatter = logging.Formatter(
-            '%(levelname)s :: %(funcName)s :: %(message)s')
+    @property
+    def in_flight(self):
+        return len(self.pending)
 
-        # Log to stderr
-        ch = logging.StreamHandler()
-        ch.setFormatter(logger_formatter)
-        ch.setLevel(loglevel)
-        if not self.logger.hasHandlers():
-            self.logger.addHandler(ch)
+    def submit(self, jcl, jobname=False, steps_cc={}, ignore=False, ebcdic=False, **extra):
+        ''' same as job_tracker.submit() '''
+        if (ebcdic or not isinstance(jcl, str)) and not jobname:
+            raise Exception("Auto detection of EBCDIC or file JCL jobname not support. Missing jobname=")
 
-        self.punch_port = punch_port
-        self.web_port = web_port
+        if not jobname:
+            jobname = jcl.split(" ")[0][2:]
 
-        self.logger.debug(f"[AUTOMATION: {self.system}] Using TK Automation with - IP: {self.ip}")
-        self.check_ports()
+        job = dict(extra, jobname=jobname.upper(), jobnum=None, status='SUBMITTED',
+                   steps_cc=steps_cc, ignore=ignore, steps=None, error=None)
 
-    def submit(self,jcl, ebcdic=False, port=None):
-        self.logger.debug(f"[AUTOMATION: {self.system}] Submitting JCL host={self.ip} port={self.punch_port} EBCDIC={ebcdic}")
-        #print(jcl)
-        self.read_log_lines() #establish baseline
-        self.read_prt_lines() #establish baseline
-        if not port:
-            port = self.punch_port 
+        self.logger.debug(f"[JOBS] Submitting {job['jobname']}")
+        job['sent'] = self.remote.submit(jcl, ebcdic=ebcdic, port=self.port)
+        future = self.remote.request(f"/JOB {job['jobname']} TIMEOUT={self.timeout}", start_string='--- Job Results')
+        self.pending[future] = job
+        return job
 
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            # Connect to server and send data
-            sock.connect((self.ip, port))
-            if ebcdic:
-              sock.send(jcl)
-            else:
-              sock.send(jcl.encode())
+    def completed(self, timeout=False):
+        ''' same as job_tracker.completed() '''
+        if not timeout:
+            timeout = self.timeout
 
-        finally:
-            sock.close()
+        if not self.finished and self.pending:
+            done, _ = concurrent.futures.wait(self.pending, timeout, concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                waiting = [job['jobname'] for job in self.pending.values()]
+                raise Exception(f"Waiting for jobs {waiting} timed out after {timeout} seconds")
+
+            for future in done:
+                job = self.pending.pop(future)
+                try:
+                    job['steps'] = parse_job_results(future.result(), self.logger, job['steps_cc'], job['ignore'])
+                    job['jobnum'] = job['steps'][-1]['jobnum']
+                except Exception as e:
+                    job['error'] = e
+                job['status'] = 'ENDED'
+                if job['jobnum'] and not self.keep:
+                    self.remote.purge(job['jobnum'], job['jobname'])
+                    job['status'] = 'PURGED'
+                self.finished.append(job)
+
+        finished, self.finished = self.finished, []
+        return finished
+
+class job_graph:
+    '''
+    Runs jobs in dependency order, as many at the same time as allowed.
 
+    Every job whose dependencies have all finished without errors is
+    submitted, up to max_in_flight at once (e.g. the number of JES2
+    initiators), and the results are checked with check_maxcc() as each
+    one is purged. When a job fails the jobs that depend on it, directly
+    or not, are cancelled. Unless keep_going is set no other new jobs are
+    submitted either, the ones running are left to finish.
 
-    def wait_for_string(self,string_to_waitfor):
-        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting for '{string_to_waitfor}' in {self.logfile}")
-        time_started = time.time()
+    Works the same for mvs, turnkey and remote_mvs, see job_tracker().
 
-        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting {self.timeout} seconds for string to appear in hercules log: {string_to_waitfor}")
+    Examples:
+        Build a library then link two programs at the same time::
 
-        while True:
-            if time.time() > time_started + self.timeout:
-                exception = f"Waiting for '{string_to_waitfor}' timed out after {self.timeout} seconds"
-                print("[ERR] {}".format(exception))
-                raise Exception(exception)
+            >>> graph = job_graph(automation(), max_in_flight=3)
+            >>> graph.add('alloc', alloc_jcl)
+            >>> graph.add('asm1', asm1_jcl, after=['alloc'])
+            >>> graph.add('asm2', asm2_jcl, after=['alloc'], steps_cc={'LKED': '0004'})
+            >>> graph.add('install', install_jcl, after=['asm1', 'asm2'])
+            >>> results = graph.run()
 
-            new_lines = self.read_log_lines()
-            for line in new_lines:
-                if string_to_waitfor in line:
-                    return
+    Args:
+        build: the mvs, turnkey or remote_mvs object from automation()
+        max_in_flight (int): most jobs submitted but not finished
+        keep_going (bool): OPTIONAL after a failure keep running the jobs
+            that don't depend on it
+    '''
 
+    def __init__(self, build, max_in_flight=3, keep_going=False):
+        self.build = build
+        self.max_in_flight = max_in_flight
+        self.keep_going = keep_going
+        self.jobs = {} # name: job, in the order they were added
 
+    def add(self, name, jcl, after=(), steps_cc={}, ignore=False, jobname=False, ebcdic=False):
+        '''
+        Adds a job to the graph
 
-    def wait_for_strings(self,strings_to_waitfor):
+        Args:
+            name (str): unique name for this job in the graph, the same JCL
+                job name can be used by many jobs
+            jcl (str): the JCL to submit
+            after (list): OPTIONAL names of the jobs that must finish first
+            steps_cc, ignore: see check_maxcc()
+            jobname, ebcdic: see submit_and_check()
         '''
-        Unlike string to wait for this function takes a list of strings and returns when any of them hit
+        if name in self.jobs:
+            raise ValueError(f"Job {name} already added")
+        self.jobs[name] = {
+            'name': name, 'jcl': jcl, 'after': list(after), 'steps_cc': steps_cc,
+            'ignore': ignore, 'jobname': jobname, 'ebcdic': ebcdic,
+            'status': 'WAITING', 'result': None
+        }
+
+    def __check(self):
+        ''' makes sure every dependency exists and there are no loops '''
+        for job in self.jobs.values():
+            for dep in job['after']:
+                if dep not in self.jobs:
+                    raise ValueError(f"Job {job['name']} depends on unknown job {dep}")
+
+        checked = set()
+        def visit(name, path):
+            if name in path:
+                raise ValueError(f"Dependency loop: {' -> '.join(path + [name])}")
+            if name in checked:
+                return
+            for dep in self.jobs[name]['after']:
+                visit(dep, path + [name])
+            checked.add(name)
+
+        for name in self.jobs:
+            visit(name, [])
+
+    def __cancel_dependents(self, name):
+        for job in self.jobs.values():
+            if name in job['after'] and job['status'] == 'WAITING':
+                self.build.logger.error(f"[JOBS] Cancelling {job['name']}, {name} did not finish")
+                job['status'] = 'CANCELLED'
+                self.__cancel_dependents(job['name'])
+
+    def run(self, timeout=False):
         '''
-        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting for any of these strings '{strings_to_waitfor}' in {self.logfile}")
-        time_started = time.time()
+        Runs every job in the graph
 
-        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting {self.timeout} seconds for strings to appear in hercules log: {strings_to_waitfor}")
+        Args:
+            timeout (int): OPTIONAL seconds to wait for the next job to finish
+
+        returns: a dict of name: job dict with 'status' ('DONE', 'FAILED'
+            or 'CANCELLED') and 'result' (the job_tracker job with 'steps'
+            and 'error'). Raises the first error after the running jobs
+            have finished if any job failed.
+        '''
+        self.__check()
+        tracker = self.build.job_tracker(timeout=timeout)
+        failed = []
 
         while True:
-            if time.time() > time_started + self.timeout:
-                exception = f"Waiting for any of the strings timed out after {self.timeout} seconds"
-                print("[ERR] {}".format(exception))
-                raise Exception(exception)
+            if not failed or self.keep_going:
+                for job in self.jobs.values():
+                    if tracker.in_flight >= self.max_in_flight:
+                        break
+                    if job['status'] != 'WAITING':
+                        continue
+                    if all(self.jobs[dep]['status'] == 'DONE' for dep in job['after']):
+                        job['status'] = 'RUNNING'
+                        tracker.submit(job['jcl'], jobname=job['jobname'], steps_cc=job['steps_cc'],
+                                       ignore=job['ignore'], ebcdic=job['ebcdic'], name=job['name'])
+
+            if not tracker.in_flight:
+                break
 
-            new_lines = self.read_log_lines()
-            for line in new_lines:
-                for word in strings_to_waitfor:
-                    if word in line:
-                        return word
+            for result in tracker.completed(timeout):
+                job = self.jobs[result['name']]
+                job['result'] = result
+                if result['error']:
+                    job['status'] = 'FAILED'
+                    failed.append(job)
+                    self.build.logger.error(f"[JOBS] {job['name']} failed: {result['error']}")
+                    self.__cancel_dependents(job['name'])
+                else:
+                    job['status'] = 'DONE'
 
-    def wait_for_job(self, jobname):
-        self.wait_for_string("HASP250 {:<8} IS PURGED".format(jobname))
+        for job in self.jobs.values():
+            if job['status'] == 'WAITING':
+                job['status'] = 'CANCELLED'
 
-    def change_punchcard_output(self,path):
-        self.logger.debug(f"[AUTOMATION: {self.system}] Changing 3525 Punchcard output location to: '{path}'")
-        if not os.path.exists(os.path.dirname(path)): 
+        if failed:
+            raise failed[0]['result']['error']
+
+        return self.jobs
+
+class build_cache:
+    '''
+    Skips jobs that already ran successfully with exactly the same input.
+
+    The key for a job is a sha256 of the target system (see cache_key()
+    on mvs, turnkey and remote_mvs), the JCL, the job name waited for, the
+    expected condition codes and the contents of any input files the job
+    reads. When a job ends without errors its check_maxcc() results are
+    saved in a JSON file and the next time the same key comes up they are
+    returned without contacting MVS. With ignore=True the results are only
+    saved if every step still ended with the expected condition code.
+
+    Examples:
+        Only rebuild when upload.jcl or the files it loads change::
+
+            >>> cache = build_cache(build)
+            >>> cache.submit_and_check(jcl, inputs=['src/prog.asm', 'src/prog.mac'])
+
+    Args:
+        build: the mvs, turnkey or remote_mvs object from automation()
+        path (str): OPTIONAL the cache file, default automvs_cache.json in
+            the current folder
+        system (str): OPTIONAL use this instead of build.cache_key(), e.g.
+            to share results between copies of the same system
+        force (bool): OPTIONAL run every job, the results are still saved
+    '''
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, build, path='automvs_cache.json', system=None, force=False):
+        if asyncio.iscoroutinefunction(build.submit_and_check):
+            raise Exception(f"build_cache needs mvs, turnkey or remote_mvs, not {type(build).__name__}")
+        self.build = build
+        self.path = os.path.abspath(path) # the working folder can change, pin it now
+        self.system = system or build.cache_key()
+        self.force = force
+        self.logger = build.logger
+
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def key(self, jcl, inputs=(), steps_cc={}, ignore=False, jobname=False):
+        ''' returns the cache key for a job '''
+        h = hashlib.sha256()
+        h.update(self.system.encode())
+        h.update(b'\0')
+        if isinstance(jcl, os.PathLike):
+            self.__hash_file(h, jcl)
+        elif isinstance(jcl, (str, bytes)):
+            h.update(jcl if isinstance(jcl, bytes) else jcl.encode())
+        else:
+            raise ValueError("Cannot cache JCL from an open file, use a path")
+        h.update(b'\0')
+        h.update(json.dumps([steps_cc, bool(ignore), jobname or None], sort_keys=True).encode())
+
+        for input_file in inputs:
+            h.update(b'\0')
+            h.update(os.fsencode(input_file))
+            h.update(b'\0')
+            self.__hash_file(h, input_file)
+
+        return h.hexdigest()
+
+    def __hash_file(self, h, path):
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                h.update(chunk)
+
+    def submit_and_check(self, jcl, inputs=(), jobname=False, steps_cc={}, ignore=False, ebcdic=False, force=False, **kwargs):
+        '''
+        Runs build.submit_and_check() unless the same job already ran
+        successfully
+
+        Args:
+            jcl (str): the JCL
+            inputs (list): OPTIONAL paths of the files the job reads, e.g.
+                files uploaded or included by the JCL
+            force (bool): OPTIONAL run it even if it is cached
+            jobname, steps_cc, ignore, ebcdic and anything else are passed
+                to submit_and_check()
+
+        returns: the check_maxcc() results, from MVS or from the cache
+        '''
+        if not jobname and not ebcdic and isinstance(jcl, str):
+            jobname = jcl.split(" ")[0][2:]
+
+        key = self.key(jcl, inputs, steps_cc, ignore, jobname)
+
+        if not (force or self.force) and key in self.entries:
+            entry = self.entries[key]
+            self.logger.debug(f"[CACHE] {entry['jobname']} unchanged since {entry['time']}, skipping")
+            return entry['results']
+
+        results = self.build.submit_and_check(jcl, ebcdic=ebcdic, jobname=jobname, steps_cc=steps_cc, ignore=ignore, **kwargs)
+
+        if ignore and not self.passed(results, steps_cc):
+            self.logger.debug(f"[CACHE] {jobname} had failed steps, not saving it")
+            return results
+
+        self.entries[key] = {
+            'system': self.system,
+            'jobname': jobname,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'results': results
+        }
+        self.save()
+        return results
+
+    def invalidate(self, jcl=None, inputs=(), steps_cc={}, ignore=False, jobname=False):
+        ''' forgets one job, or everything for this system if jcl is None '''
+        if jcl is None:
+            self.entries = {k: v for k, v in self.entries.items() if v['system'] != self.system}
+        else:
+            if not jobname and isinstance(jcl, str):
+                jobname = jcl.split(" ")[0][2:]
+            self.entries.pop(self.key(jcl, inputs, steps_cc, ignore, jobname), None)
+        self.save()
+
+    @staticmethod
+    def passed(results, steps_cc={}):
+        '''
+        True if every step in check_maxcc() results ended with its
+        condition code in steps_cc (PROC.STEP or STEP), or '0000'
+        '''
+        for step in results:
+            stepname = str(step['stepname']).strip()
+            expected = steps_cc.get(f"{str(step['procname']).strip()}.{stepname}", steps_cc.get(stepname, '0000'))
+            if str(step['exitcode']).strip() != expected:
+                return False
+        return True
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.path)
+
+class automation:
+
+    def __new__(self,
+                 system_path="mvsce/",
+                 system='MVSCE',
+                 loglevel=logging.WARNING,
+                 config=None,
+                 rc=None, 
+                 ip='127.0.0.1',
+                 punch_port=3505,
+                 web_port=8038,
+                 timeout=TIMEOUT,
+                 username='HERC01',
+                 password='CUL8TR',
+                 remote=False,
+                 remote_port=3702,
+                 pipeline=False,
+                 backend='threads'
+                ):
+        
+        if remote:
+            return(
+                remote_mvs(
+                 system=system, 
+                 ip=ip,
+                 punch_port=punch_port,
+                 automvs_port=remote_port,
+                 web_port=web_port,
+                 loglevel=loglevel,
+                 timeout=timeout,
+                 username=username,
+                 password=password,
+                 pipeline=pipeline
+                )
+            )
+    
+        if 'MVSCE' in system.upper():
+
+            return(
+                mvs(
+                 mvsce=system_path,
+                 loglevel=loglevel,
+                 config=config,
+                 rc=rc,
+                 timeout=timeout,
+                 punch_port=punch_port,
+                 backend=backend
+                )
+            )
+        elif 'TK5' in system.upper() or 'TK4-' in system.upper():
+
+            return(
+                turnkey(
+                    ip=ip,
+                    system=system,
+                    mvs_tk_path=system_path,
+                    punch_port=punch_port,
+                    web_port=web_port,
+                    loglevel=loglevel,
+                    timeout=timeout,
+                    username=username,
+                    password=password
+                )
+            )
+        
+        else:
+            raise ValueError(f'System must be one of MVSCE, TK5, or TK4-. system={system}')
+
+    @staticmethod
+    def deploy_xmi(build, paths, target_hlq, port=3506, max_in_flight=3, replace=False, timeout=False):
+        '''
+        Deploys XMI files: each one is streamed to an EBCDIC card reader in
+        a job that unpacks it with RECV370. Up to max_in_flight jobs are
+        queued at once so the next file is sent while the last one runs.
+
+        Args:
+            build: the mvs, turnkey or remote_mvs object from automation()
+            paths (list): the XMI files, each goes to target_hlq.<file name>,
+                or a dict of path: dataset name. Each job is named after its
+                file, with a number on the end if the name is already used.
+            target_hlq (str): high level qualifier(s) for the datasets
+            port (int): OPTIONAL the EBCDIC card reader port
+            max_in_flight (int): OPTIONAL most jobs queued at once
+            replace (bool): OPTIONAL replace datasets that already exist
+            timeout (int): OPTIONAL seconds to wait for the next job
+
+        returns: a list of dicts in the order of paths with 'path', 'dsn',
+            'jobname', 'jobnum', 'sent' (bytes), 'steps' (check_maxcc
+            results) and 'error' (the exception or None)
+        '''
+        if not isinstance(paths, dict):
+            paths = {path: None for path in paths}
+
+        decks = []
+        for path, dsn in paths.items():
+            name = re.sub(r'[^A-Z0-9@#$]', '', Path(path).stem.upper())
+            if not name or name[0].isdigit():
+                name = f"X{name}"
+            name = name[:8]
+            dsn = (dsn or f"{target_hlq}.{name}").upper()
+            if dsn in (d['dsn'] for d in decks):
+                raise ValueError(f"{path} would also be received to {dsn}")
+            # JES2 holds a job until any other job with its name has ended,
+            # so each file gets its own job name
+            jobname, count = name, 0
+            while jobname in (d['jobname'] for d in decks):
+                count += 1
+                jobname = name[:8 - len(str(count))] + str(count)
+            name = jobname
+            deck = xmi_deck(path, dsn, name, getattr(build, 'username', None),
+                            getattr(build, 'password', None), replace=replace)
+            decks.append({'path': path, 'dsn': dsn, 'jobname': name, 'deck': deck})
+
+        build.logger.debug(f"[XMI] Deploying {len(decks)} XMI files to port {port}")
+        tracker = build.job_tracker(port=port, timeout=timeout)
+        report = [None] * len(decks)
+        pending = iter(enumerate(decks))
+
+        while True:
+            while tracker.in_flight < max_in_flight:
+                index, deck = next(pending, (None, None))
+                if deck is None:
+                    break
+                tracker.submit(deck['deck'], jobname=deck['jobname'], ebcdic=True,
+                               index=index, path=deck['path'], dsn=deck['dsn'])
+
+            if not tracker.in_flight:
+                break
+
+            for job in tracker.completed():
+                build.logger.debug(f"[XMI] {job['path']} -> {job['dsn']} {job['status']}")
+                report[job['index']] = {key: job[key] for key in ('path', 'dsn', 'jobname', 'jobnum', 'sent', 'steps', 'error')}
+
+        return report
+
+FICLONE = 0x40049409 # linux ioctl, clone a file sharing its blocks (btrfs, xfs)
+
+def clone_file(src, dst):
+    '''
+    Copies src to dst as a reflink, copy-on-write clone where the filesystem
+    supports it so nothing is copied. Otherwise it is a normal copy.
+    '''
+    if fcntl:
+        try:
+            with open(src, 'rb') as s, open(dst, 'wb') as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            shutil.copystat(src, dst)
+            return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
+def clone_tree(src, dst, ignore=None):
+    ''' shutil.copytree() using clone_file() '''
+    return shutil.copytree(src, dst, symlinks=True, ignore=ignore, copy_function=clone_file)
+
+DASD_LINE = re.compile(r'^(\s*[0-9A-Fa-f]{3,4}(?:[-.][0-9A-Fa-f]{3,4})?\s+'
+                       r'(?:2311|2314|3330|3340|3350|3375|3380|3390|9345|3310|3370|9336|0671)\s+)(\S+)(.*)$',
+                       re.MULTILINE)
+
+CONSOLE_CHUNK_SIZE = 64 * 1024 # bytes read from hercules' stdout/stderr at a time
+
+class console_lines:
+    '''
+    Splits hercules console output, read in binary chunks, in to lines.
+    Each chunk's complete lines are decoded in one go, a partial last line
+    is kept for the next chunk.
+    '''
+
+    def __init__(self):
+        self.partial = b''
+
+    def feed(self, data):
+        ''' returns the complete lines, without line endings, read so far '''
+        if self.partial:
+            data = self.partial + data
+        end = data.rfind(b'\n') + 1
+        self.partial = data[end:]
+        if not end:
+            return []
+        return data[:end].decode(errors='replace').replace('\r\n', '\n').split('\n')[:-1]
+
+    def flush(self):
+        ''' returns the partial last line at EOF '''
+        data, self.partial = self.partial, b''
+        return [data.decode(errors='replace').rstrip('\r')] if data else []
+
+class console_classifier:
+    '''
+    Labels hercules console lines as noise (dropped), fatal (hercules is
+    killed) or an event (its callback is called) with one compiled regex,
+    so each batch of lines is scanned once however many patterns there
+    are. Only the lines something was found in are looked at again, one at
+    a time, so no pattern can match across the end of a line. A line found
+    by patterns with different labels is fatal before it is an event and an
+    event before it is noise; within a label it gets the first pattern
+    found in it.
+
+    The plain strings are merged in to a trie (one regex branch per common
+    prefix) which re only tries where one of their first characters
+    appears, so adding strings costs next to nothing. Regular expressions
+    (regex=True) are tried everywhere, use them sparingly.
+
+    Examples:
+        >>> build = automation()
+        >>> build.classifier.add_fatal('IEA911E COMPLETE DUMP')
+        >>> build.classifier.add_noise(r'HHC0\\d+I Device .* busy', regex=True)
+        >>> build.classifier.add_event('ipl', 'IKT005I TCAS IS INITIALIZED', lambda name, line: print(line))
+
+    Args:
+        noise (list): OPTIONAL strings of lines to drop
+        fatal (list): OPTIONAL strings of irrecoverable hercules errors
+    '''
+
+    PRECEDENCE = ('fatal', 'event', 'noise')
+
+    def __init__(self, noise=(), fatal=()):
+        self.patterns = [] # (pattern, (label, name, callback), regex)
+        self.patterns += [(pattern, ('noise', pattern, None), False) for pattern in noise]
+        self.patterns += [(pattern, ('fatal', pattern, None), False) for pattern in fatal]
+        self.compile()
+
+    def add_noise(self, pattern, regex=False):
+        ''' drops the lines pattern is found in '''
+        self.add('noise', pattern, pattern, None, regex)
+
+    def add_fatal(self, pattern, regex=False):
+        ''' kills hercules when pattern is found '''
+        self.add('fatal', pattern, pattern, None, regex)
+
+    def add_event(self, name, pattern, callback=None, regex=False):
+        ''' calls callback(name, line) for the lines pattern is found in '''
+        self.add('event', name, pattern, callback, regex)
+
+    def add(self, label, name, pattern, callback=None, regex=False):
+        '''
+           Adds a pattern labelled label. pattern is a string to look for,
+           or a regular expression (of one line) if regex is True.
+        '''
+        if label not in ('noise', 'fatal', 'event'):
+            raise ValueError(f"label must be noise, fatal or event: {label}")
+        self.patterns.append((pattern, (label, name, callback), regex))
+        self.compile()
+
+    def remove(self, name):
+        ''' removes the patterns called name (the pattern itself for noise and fatal) '''
+        self.patterns = [p for p in self.patterns if p[1][1] != name]
+        self.compile()
+
+    def compile(self):
+        labels = {} # regex group name: label
+        strings = {} # kind: {plain string: label}
+        branches = []
+        # fatal branches first so they win where several start at the same
+        # place, each wrapped in a lookahead so a match doesn't hide others
+        # that start inside it
+        for kind in self.PRECEDENCE:
+            regexes = []
+            for i, (pattern, label, regex) in enumerate(self.patterns):
+                if label[0] != kind:
+                    continue
+                if regex:
+                    regexes.append(f"(?P<p{i}>{pattern})")
+                    labels[f"p{i}"] = label
+                else:
+                    strings.setdefault(kind, {}).setdefault(pattern, label)
+            if kind in strings:
+                branches.append(f"(?P<{kind}>{self.trie(strings[kind])})")
+            branches += regexes
+        regex = re.compile("(?={})".format("|".join(branches)), re.MULTILINE) if branches else None
+        # readers may be classifying right now, swap everything at once
+        self.compiled = (regex, labels, strings)
+
+    @staticmethod
+    def trie(strings):
+        ''' returns a regex matching any of strings, longest first, factored by prefix '''
+        root = {}
+        for string in strings:
+            node = root
+            for ch in string:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+
+        def branch(node):
+            alternatives = [re.escape(ch) + branch(child) for ch, child in node.items() if ch]
+            if not alternatives:
+                return ''
+            regex = alternatives[0] if len(alternatives) == 1 else "(?:{})".format("|".join(alternatives))
+            return "(?:{})?".format(regex) if '' in node else regex
+
+        return branch(root)
+
+    def classify(self, lines, text=None):
+        '''
+           Returns {index: (label, name, callback)} for the lines in the
+           list lines that match a pattern. text is the lines joined with
+           newlines, if the caller already has it.
+        '''
+        regex, labels, strings = self.compiled
+        if regex is None:
+            return {}
+        if text is None:
+            text = "\n".join(lines)
+
+        # one pass over the batch for the lines anything starts in
+        candidates = []
+        line = pos = 0
+        for m in regex.finditer(text):
+            line += text.count("\n", pos, m.start())
+            pos = m.start()
+            if not candidates or candidates[-1] != line:
+                candidates.append(line)
+
+        # then each of those on its own, a match across lines doesn't count
+        found = {}
+        for i in candidates:
+            best = None
+            for m in regex.finditer(lines[i]):
+                label = strings[m.lastgroup][m.group(m.lastgroup)] if m.lastgroup in strings else labels[m.lastgroup]
+                if best is None or self.PRECEDENCE.index(label[0]) < self.PRECEDENCE.index(best[0]):
+                    best = label
+                    if label[0] == self.PRECEDENCE[0]:
+                        break
+            if best is not None:
+                found[i] = best
+        return found
+
+BACKGROUND_LOOP = None
+BACKGROUND_LOOP_LOCK = threading.Lock()
+
+def background_loop():
+    '''
+       Returns the event loop that runs hercules for every
+       mvs(backend='asyncio') in this process, started in a daemon thread
+       the first time it is needed.
+    '''
+    global BACKGROUND_LOOP
+    with BACKGROUND_LOOP_LOCK:
+        if BACKGROUND_LOOP is None:
+            BACKGROUND_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=BACKGROUND_LOOP.run_forever, name='automvs', daemon=True).start()
+        return BACKGROUND_LOOP
+
+def dasd_images(config):
+    ''' returns the DASD image files in a hercules config, as written in it '''
+    return [image for image, shadows in dasd_devices(config)]
+
+def dasd_devices(config):
+    '''
+    returns (image, shadows) for each DASD in a hercules config, as written
+    in it. shadows is the sf= shadow file name or None.
+    '''
+    with open(config, 'r') as f:
+        text = f.read()
+    devices = []
+    for match in DASD_LINE.finditer(text):
+        shadows = re.search(r'\ssf=(\S+)', ' ' + match.group(3).partition('#')[0])
+        devices.append((match.group(2), shadows.group(1) if shadows else None))
+    return devices
+
+def shadow_files(shadows):
+    '''
+    returns the shadow files that exist for sf= file name shadows, hercules
+    puts the shadow file number where the * is
+    '''
+    folder, name = os.path.split(shadows)
+    return sorted(glob.glob(os.path.join(glob.escape(folder), '[0-9]'.join(glob.escape(part) for part in name.split('*')))))
+
+class mvs:
+    
+    error_check = [
+                'open error',
+                'Creating crash dump',
+                'DISASTROUS ERROR',
+                'HHC01023W Waiting for port 3270 to become free for console connections',
+                'disabled wait state 00020000 80000005',
+                'invalid ipl psw 0000000000000'
+              ]
+    console_noise = [
+                # HHC90020W 'hthread_setschedparam()' failed at loc=timer.c:193: rc=22: Invalid argument
+                'HHC90020W',
+                # HHC00007I Previous message from function 'hthread_set_thread_prio' at hthreads.c(1170)
+                'HHC00007I',
+                'HHC00107I',
+                'HHC00100I'
+              ]
+    '''
+    Mainframe automation class.
+    =================================
+
+    This class contains modules to automate MVS/CE. Each instance has its
+    own hercules and state, so more than one can be used in the same
+    process (each MVS/CE folder can only be running once).
+
+    Examples:
+        IPL MVS/CE and submit JCL and check the results, attach a device
+        and send an operator command::
+
+            >>> from automvs import automation
+            >>> cwd = os.getcwd()
+            >>> build = automation()
+            >>> build.ipl(clpa=False)
+            >>> try:
+            >>>     print("Submitting {}/jcl/upload.jcl".format(cwd))
+            >>>     with open("{}/jcl/upload.jcl".format(cwd),"r") as jcl:
+            >>>         build.submit(jcl.read())
+            >>>     build.wait_for_string("HASP250 UPLOAD   IS PURGED")
+            >>>     build.check_maxcc("UPLOAD")
+            >>>     build.send_herc('devinit 170 tape/zdlib1.het')
+            >>>     build.wait_for_string("IEF238D SMP4P44 - REPLY DEVICE NAME OR 'CANCEL'.")
+            >>>     build.send_reply('170')
+            >>>     build.send_oper("$DU")
+            >>> finally:
+            >>>     build.quit_hercules()
+
+
+    Args:
+        mvsce (str): Path to the MVS/CE folder.
+        config (str): OPTIONAL path to a different hercules config file. If
+            one is not provided the one included with MVS/CE will be used.
+        rc (str): OPTIONAL path to a different hercules rc file. If
+            one is not provided the one included with MVS/CE will be used.
+        punch_port (int): OPTIONAL the ASCII card reader port, default 3505
+        timeout (int): how long, in seconds, to wait for MVS console output
+            messages. Default is 30 minutes.
+        loglevel (int): Level of logging, based on
+            https://docs.python.org/3/library/logging.html#levels.
+            Defaults to ``loggin.WARNING``.
+        backend (str): OPTIONAL how hercules' console is read. ``threads``
+            (the default) starts three threads per instance, ``asyncio``
+            runs hercules with asyncio and reads every instance's console
+            from one shared event loop. The methods are the same either way.
+        classifier (console_classifier): OPTIONAL the noise, fatal error and
+            event patterns to look for on the console. Defaults to one with
+            mvs.console_noise and mvs.error_check, add your own to
+            self.classifier.
+    '''
+    def __init__(self,
+                 mvsce="mvsce/",
+                 loglevel=logging.WARNING,
+                 config=None,
+                 rc=None,
+                 timeout=None,
+                 punch_port=3505,
+                 backend='threads',
+                 classifier=None
+                ):
+
+        if backend not in ('threads', 'asyncio'):
+            raise ValueError(f"backend must be threads or asyncio: {backend}")
+
+        # relative paths are relative to where we started, not to wherever
+        # the working directory is later on
+        self.running_folder = os.getcwd()
+        self.config = Path(config).absolute() if config else None
+        self.rc = Path(rc).absolute() if rc else None
+        self.timeout=timeout
+        self.punch_port = punch_port
+        self.backend = backend
+        self.classifier = classifier or console_classifier(noise=mvs.console_noise, fatal=mvs.error_check)
+        self.mvsce_location = Path(mvsce).absolute()
+        self.hercproc = False
+        self.hercules_loop = None # the event loop running hercules, asyncio only
+        self.stderr_q = queue.Queue()
+        self.stdout_q = queue.Queue()
+        self.stdout_pending = collections.deque() # the rest of the last batch of lines taken from stdout_q
+        self.stderr_pending = collections.deque()
+        self.console_history = collections.deque(maxlen=CONSOLE_HISTORY)
+        self.hercules_exit = None
+        self.printer_indexes = {}
+        self.punch_path = self.mvsce_path('punchcards/pch00d.txt')
+        self.reply_num = 0
+        self.quit_herc_event = threading.Event()
+        self.kill_hercules = threading.Event()
+        self.reset_herc_event = threading.Event()
+        self.STDERR_to_logs = threading.Event()
+
+
+        if not self.config:
+            self.config = self.mvsce_location / "conf/local.cnf"
+        if not self.rc:
+            self.rc = self.mvsce_location / "conf/mvsce.rc"
+
+        # make sure this stuff exists
+        if not self.mvsce_location.exists():
+            raise Exception("The MVS/CE folder provided does not exist: {}".format(self.mvsce_location))
+
+        if not self.config.exists():
+            raise Exception("The MVS/CE config file provided does not exist: {}".format(self.config))
+            
+        if not self.rc.exists():
+            raise Exception("The MVS/CE rc file provided does not exist: {}".format(self.rc))
+
+
+        # Create the Logger
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        logger_formatter = logging.Formatter(
+            '%(levelname)s :: %(funcName)s :: %(message)s')
+
+        # Log to stderr
+        ch = logging.StreamHandler()
+        ch.setFormatter(logger_formatter)
+        ch.setLevel(loglevel)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(ch)
+        # skip formatting lines nobody will see, setLevel() turned level
+        # names like 'DEBUG' in to numbers
+        self.console_debug = ch.level <= logging.DEBUG
+
+        self.logger.debug("[AUTOMATION: MVS/CE] MVS/CE Location: {}".format(self.mvsce_location))
+        self.logger.debug("[AUTOMATION: MVS/CE] MVS/CE config location: {}".format(self.config))
+        self.logger.debug("[AUTOMATION: MVS/CE] MVS/CE RC location: {}".format(self.rc))
+        self.logger.debug("[AUTOMATION: MVS/CE] Current working directory {}".format(self.running_folder))
+
+    def kill(self):
+        if isinstance(self.hercproc, subprocess.Popen):
+            self.hercproc.kill()
+        else:
+            self.hercules_loop.call_soon_threadsafe(self.hercproc.kill)
+
+    def start_threads(self):
+        # start a pair of threads to read output from hercules
+        self.stdout_thread = threading.Thread(target=self.queue_stdout, args=(self.hercproc.stdout,self.stdout_q))
+        self.stderr_thread = threading.Thread(target=self.queue_stderr, args=(self.hercproc.stderr,self.stderr_q))
+        self.check_hercules_thread = threading.Thread(target=self.check_hercules, args=[self.hercproc])
+        # self.queue_printer_thread = threading.Thread(target=self.queue_printer, args=('prt00e.txt',printer_q))
+        self.stdout_thread.daemon = True
+        self.stderr_thread.daemon = True
+        # self.queue_printer_thread.daemon = True
+        self.check_hercules_thread.daemon = True
+        self.stdout_thread.start()
+        self.stderr_thread.start()
+        self.check_hercules_thread.start()
+        # self.queue_printer_thread.start()
+
+    def queue_stdout(self, pipe, q):
+        ''' queue the stdout in a non blocking way'''
+        self.queue_console(pipe, self.stdout_lines, q)
+
+    def queue_stderr(self, pipe, q):
+        ''' queue the stderr in a non blocking way'''
+        self.queue_console(pipe, self.stderr_lines, q)
+
+    def queue_console(self, pipe, handle_lines, q):
+        '''
+           Reads a hercules pipe CONSOLE_CHUNK_SIZE bytes at a time and
+           queues the lines of each read, after handle_lines(), as one list.
+        '''
+        lines = console_lines()
+        fd = pipe.fileno()
+        while True:
+            data = os.read(fd, CONSOLE_CHUNK_SIZE)
+            batch = handle_lines(lines.feed(data) if data else lines.flush())
+            if batch:
+                q.put(batch)
+            if not data:
+                # EOF, hercules has exited
+                break
+            if self.reset_herc_event.is_set():
+                break
+
+    def stdout_lines(self, lines):
+        '''
+           Handles lines hercules wrote to stdout: keeps the reply number,
+           logs them and acts on what the classifier finds in them. Returns
+           the lines that aren't empty or noise, to be queued.
+        '''
+        text = "\n".join(lines)
+        batch, fatal = self.__classify(lines, text)
+        if '/*' in text:
+            for l in batch:
+                if l[0:2] == '/*' and l[2:4].isnumeric() and len(l.strip()) > 3:
+                    self.reply_num = l[2:4]
+                    self.logger.debug("[AUTOMATION: MVS/CE] Reply number set to {}".format(self.reply_num))
+
+        if self.console_debug:
+            for l in batch:
+                self.logger.debug("[HERCLOG] {}".format(l.strip()))
+        self.__history(batch)
+        self.__fatal(fatal)
+        return batch
+
+    def stderr_lines(self, lines):
+        ''' same as stdout_lines() for stderr, where noise is kept '''
+        batch, fatal = self.__classify(lines, noise=False)
+        if self.console_debug:
+            for l in batch:
+                if self.STDERR_to_logs.is_set() or 'MIPS' in l:
+                    self.logger.debug("[DIAG] {}".format(l.strip()))
+        self.__history(batch)
+        self.__fatal(fatal)
+        return batch
+
+    def __classify(self, lines, text=None, noise=True):
+        '''
+           Drops empty lines and, if noise is set, noise and calls event
+           callbacks. Returns the lines to keep and the fatal ones, for
+           __fatal() once they are logged.
+        '''
+        labels = self.classifier.classify(lines, text)
+        if not labels:
+            return [l for l in lines if l and not l.isspace()], []
+
+        batch = []
+        fatal = []
+        for i, l in enumerate(lines):
+            if not l or l.isspace():
+                continue
+            if i in labels:
+                label, name, callback = labels[i]
+                if label == 'noise':
+                    if noise:
+                        continue
+                elif label == 'fatal':
+                    fatal.append(l)
+                elif callback:
+                    callback(name, l)
+            batch.append(l)
+        return batch, fatal
+
+    def __history(self, batch):
+        self.console_history.extend(l.rstrip() for l in batch[-CONSOLE_HISTORY:])
+
+    def __fatal(self, fatal):
+        for l in fatal:
+            self.logger.critical("Quiting! Irrecoverable Hercules error: {}".format(l.strip()))
+            self.__kill_hercules()
+
+    def __kill_hercules(self):
+        ''' kills hercules after an irrecoverable error, check_hercules reports it '''
+        self.kill_hercules.set()
+        if self.hercules_running():
+            self.hercproc.kill()
+
+    def hercules_running(self):
+        ''' True if hercules has been started and hasn't exited '''
+        if not self.hercproc:
+            return False
+        if isinstance(self.hercproc, subprocess.Popen):
+            return self.hercproc.poll() is None
+        return self.hercproc.returncode is None # asyncio
+
+    def check_hercules(self, hercproc):
+        '''
+           Blocks until hercules exits. If it was not asked to quit or reset
+           the exit code and last console lines are handed to anyone waiting
+           on the console as a HerculesExited exception.
+        '''
+        rc = hercproc.wait()
+
+        if self.quit_herc_event.is_set() or self.reset_herc_event.is_set() or hercproc is not self.hercproc:
+            self.logger.debug("[AUTOMATION: MVS/CE] Quit Event enabled exiting hercproc monitoring")
+            return
+
+        # let the readers drain whatever hercules printed before it died
+        for reader in (self.stdout_thread, self.stderr_thread):
+            reader.join(timeout=5)
+
+        self.hercules_exited(rc)
+
+        # wake up anyone waiting on the console
+        self.stdout_q.put(None)
+        self.stderr_q.put(None)
+
+    def hercules_exited(self, rc):
+        ''' keeps the HerculesExited exception for whoever waits on the console next '''
+        self.hercules_exit = HerculesExited(rc, list(self.console_history))
+        if self.kill_hercules.is_set():
+            self.logger.critical("[ERROR] - Hercules killed after irrecoverable error, return code {}".format(rc))
+        else:
+            self.logger.critical("[ERROR] - Hercules Exited Unexpectedly, return code {}".format(rc))
+
+    def check_maxcc(self, jobname, steps_cc={}, printer_file='printers/prt00e.txt',ignore=False, jobnum=None):
+      '''Checks job and steps results, raises error
+          If the step is in steps_cc, check the step vs the cc in the dictionary
+          otherwise checks if step is zero
+
+         jobname (str): name of the job to check from the printer file output
+         steps_cc (dict): pairs of step names and expected CC. This should be used
+            if you expect a specific step to have a return code other than zero. Procs
+            are now supported, use PROCNAME.STEP
+         printer_file (str): location of the printer file from hercules that
+            contains the job output, relative to the MVS/CE folder.
+         ignore (bool): tells the function to ignore failed steps
+         jobnum (str): OPTIONAL only check the run of the job with this
+            job number
+
+         returns: a list of dicts with 'jobname, procname, stepname, exitcode'
+
+      '''
+      self.logger.debug("[AUTOMATION: MVS/CE] Checking {} job results".format(jobname))
+
+      found_job = False
+      failed_step = False
+      job_status = []
+
+      logmsg = '[MAXCC] Jobname: {:<8} Procname: {:<8} Stepname: {:<8} Exit Code: {:<8}'
+
+      printer_file = self.mvsce_path(printer_file)
+      if printer_file not in self.printer_indexes:
+          self.printer_indexes[printer_file] = printer_index(printer_file)
+
+      procname =''
+      for record in self.printer_indexes[printer_file].steps(jobname, jobnum):
+          found_job = True
+
+          j = record['fields']
+
+          log = logmsg.format(j[1],'',j[2],j[10])
+          step_status = {
+                            "jobname" : j[1],
+                            "procname": '',
+                            "stepname": j[2],
+                            "exitcode": j[10]
+                        }
+          maxcc=j[10]
+          stepname = j[2]
+
+          if j[3] != "-":
+              log = logmsg.format(j[1],j[2],j[3],j[11])
+              step_status = {
+                                "jobname" : j[1],
+                                "procname": j[2],
+                                "stepname": j[3],
+                                "exitcode": j[11]
+                            }
+              stepname = j[3]
+              procname = j[2]
+              maxcc=j[11]
+
+          self.logger.debug(log)
+          job_status.append(step_status)
+
+          if f"{procname}.{stepname}" in steps_cc:
+              expected_cc = steps_cc[f"{procname}.{stepname}"]
+          elif stepname in steps_cc:
+              expected_cc = steps_cc[stepname]
+          else:
+              expected_cc = '0000'
+
+          if maxcc != expected_cc:
+              error = "Step {} Condition Code does not match expected condition code: {} vs {} review prt00e.txt for errors".format(stepname,j[-1],expected_cc)
+              if ignore:
+                self.logger.debug(error)
+              else:
+                self.logger.error(error)
+                
+              failed_step = True
+
+      if not found_job:
+          raise ValueError("Job {} not found in printer output {}".format(jobname, printer_file))
+
+      if failed_step and not ignore:
+          raise ValueError(error)
+        
+      return(job_status)
+
+    def reset_hercules(self,clpa=False):
+        self.logger.debug('[AUTOMATION: MVS/CE] Restarting hercules')
+        self.quit_hercules(msg=False)
+
+        h = self.prepare_hercules(clpa)
+
+        if self.backend == 'asyncio':
+            self.reset_herc_event.clear()
+            self.quit_herc_event.clear()
+            self.hercproc = asyncio.run_coroutine_threadsafe(self.spawn_hercules(h), background_loop()).result()
+        else:
+            self.hercproc = subprocess.Popen(h,
+                        cwd=self.mvsce_location,
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+            self.reset_herc_event.clear()
+            self.quit_herc_event.clear()
+            self.start_threads()
+
+        if not self.hercules_running():
+            raise Exception("[AUTOMATION: MVS/CE] Unable to start hercules")
+        self.logger.debug("[AUTOMATION: MVS/CE] Hercules launched")
+        #self.write_logs()
+        self.logger.debug("[AUTOMATION: MVS/CE] Hercules Re-initialization Complete")
+
+    def prepare_hercules(self, clpa=False):
+        '''
+           Clears what is left of the last hercules and returns the command
+           to launch the next one with.
+        '''
+        # drain STDERR and STDOUT
+        for q in (self.stdout_q, self.stderr_q):
+            while not q.empty():
+                q.get_nowait()
+        self.stdout_pending.clear()
+        self.stderr_pending.clear()
+
+        self.reset_herc_event.set()
+        self.kill_hercules.clear()
+        self.hercules_exit = None
+        self.console_history.clear()
+
+        try:
+            self.hercmd = subprocess.check_output(["which", "hercules"]).strip()
+        except:
+            raise Exception('hercules not found')
+
+        self.logger.debug("[AUTOMATION: MVS/CE] Launching hercules")
+
+        h = [ "hercules", '--externalgui', '-f',self.config ]
+
+        if not clpa:
+            h.append("-r")
+            h.append(self.rc)
+
+        self.logger.debug("[AUTOMATION: MVS/CE] Launching hercules with: {}".format(h))
+        return h
+
+    async def spawn_hercules(self, h):
+        '''
+           Starts hercules with asyncio, a task per pipe queues its console
+           and another reports if it exits when it shouldn't. Lines go
+           through stdout_lines() and stderr_lines() like the reader threads.
+        '''
+        proc = await asyncio.create_subprocess_exec(*h,
+                    cwd=self.mvsce_location,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE)
+        self.hercules_loop = asyncio.get_running_loop()
+        # set before the tasks can run, watch_hercules() checks it's us
+        self.hercproc = proc
+        readers = [
+            asyncio.ensure_future(self.read_hercules(proc.stdout, self.stdout_lines, self.stdout_q)),
+            asyncio.ensure_future(self.read_hercules(proc.stderr, self.stderr_lines, self.stderr_q))
+        ]
+        self.hercules_watch = asyncio.ensure_future(self.watch_hercules(proc, readers))
+        return proc
+
+    async def read_hercules(self, pipe, handle_lines, q):
+        ''' queue_console() for spawn_hercules() '''
+        lines = console_lines()
+        while True:
+            data = await pipe.read(CONSOLE_CHUNK_SIZE)
+            batch = handle_lines(lines.feed(data) if data else lines.flush())
+            if batch:
+                q.put_nowait(batch)
+            if not data:
+                # EOF, hercules has exited
+                break
+
+    async def watch_hercules(self, proc, readers):
+        ''' check_hercules() for spawn_hercules() '''
+        rc = await proc.wait()
+
+        if self.quit_herc_event.is_set() or self.reset_herc_event.is_set() or proc is not self.hercproc:
+            self.logger.debug("[AUTOMATION: MVS/CE] Quit Event enabled exiting hercproc monitoring")
+            return
+
+        await asyncio.wait(readers, timeout=5)
+
+        self.hercules_exited(rc)
+
+        self.stdout_q.put_nowait(None)
+        self.stderr_q.put_nowait(None)
+
+    def quit_hercules(self, msg=True):
+        if msg:
+            self.logger.debug("[AUTOMATION: MVS/CE] Shutting down hercules")
+        if not self.hercules_running():
+            self.logger.debug("[AUTOMATION: MVS/CE] Hercules already shutdown")
+            return
+        self.quit_herc_event.set()
+        self.send_herc('quit')
+        self.wait_for_string('Hercules shutdown complete', stderr=True)
+        self.wait_hercules()
+        if msg:
+            self.logger.debug('[AUTOMATION: MVS/CE] Hercules has exited')
+
+    def wait_hercules(self):
+        ''' waits for hercules to exit and returns its exit code '''
+        if self.backend == 'asyncio':
+            return asyncio.run_coroutine_threadsafe(self.hercproc.wait(), self.hercules_loop).result()
+        return self.hercproc.wait()
+
+    def wait_for_job(self, jobname, stderr=False, timeout=False):
+        self.wait_for_string("HASP250 {:<8} IS PURGED".format(jobname),stderr=stderr, timeout=timeout)
+
+    def wait_for_string(self, string_to_waitfor, stderr=False, timeout=False):
+        '''
+           Reads stdout queue waiting for expected response, default is
+           to check STDOUT queue, set stderr=True to check stderr queue instead
+           default timeout is 30 minutes
+        '''
+        self.__wait_for_console([string_to_waitfor], stderr=stderr, timeout=timeout)
+
+    def wait_for_strings(self, strings_to_waitfor, stderr=False, timeout=False):
+        '''
+           Reads stdout queue waiting for expected response, default is
+           to check STDOUT queue, set stderr=True to check stderr queue instead
+           default timeout is 30 minutes.and
+
+           Unlike wait_for_string() this function takes a list of strings
+           and returns when any of the strings in the list are found. 
+        '''
+        return self.__wait_for_console(strings_to_waitfor, stderr=stderr, timeout=timeout)
+
+    def __wait_for_console(self, strings_to_waitfor, stderr=False, timeout=False):
+        '''
+           Blocks on the stdout (or stderr) queue until a line containing one
+           of strings_to_waitfor arrives or the timeout expires. The reader
+           threads wake us up through the queue so no CPU is used while
+           waiting. Returns the string that was found.
+        '''
+        if not timeout and self.timeout:
+            timeout=self.timeout
+
+        if not timeout:
+            timeout = TIMEOUT
+
+        self.logger.debug("[AUTOMATION: MVS/CE] Waiting {} seconds for string to appear in hercules log: {}".format(timeout,strings_to_waitfor))
+
+        deadline = time.monotonic() + timeout
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if len(strings_to_waitfor) == 1:
+                    exception = "Waiting for '{}' timed out after {} seconds".format(strings_to_waitfor[0], timeout)
+                else:
+                    exception = "Waiting for one of '{}' timed out after {} seconds".format(strings_to_waitfor, timeout)
+                print("[AUTOMATION: MVS/CE] {}".format(exception))
+                raise Exception(exception)
+
+            line = self.__console_line(stderr, remaining)
+            if line is None:
+                continue
+
+            for word in strings_to_waitfor:
+                if word in line:
+                    return word
+
+    def __console_line(self, stderr, timeout):
+        '''
+           Returns the next line from stdout (or stderr), None if there
+           wasn't one within timeout seconds. The queues hold a list of
+           lines per read, what is left of the last one is kept in
+           stdout_pending/stderr_pending. Raises HerculesExited if hercules
+           is gone.
+        '''
+        pending = self.stderr_pending if stderr else self.stdout_pending
+        if pending:
+            return pending.popleft()
+
+        q = self.stderr_q if stderr else self.stdout_q
+        try:
+            batch = q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        if batch is None:
+            # hercules is gone, leave the marker for the next waiter
+            q.put(None)
+            raise self.hercules_exit
+
+        pending.extend(batch)
+        return pending.popleft()
+
+    def job_tracker(self, host='127.0.0.1', port=None, printer_file='printers/prt00e.txt', timeout=False):
+        '''
+           Returns a job_tracker that follows the console (stdout) for the
+           jobs it submits. While it is in use nothing else should wait on
+           the console.
+        '''
+        return job_tracker(
+            lambda jcl, ebcdic=False, jobname=None: self.submit(jcl, host=host, port=port, ebcdic=ebcdic),
+            lambda jobname, **kwargs: self.check_maxcc(jobname, printer_file=printer_file, **kwargs),
+            lambda timeout: self.__console_line(False, timeout),
+            self.logger,
+            timeout=timeout or self.timeout
+        )
+
+    def submit_many(self, jcls, max_in_flight=3, host='127.0.0.1', port=None, printer_file='printers/prt00e.txt', timeout=False):
+        '''
+           Submits many jobs, keeping up to max_in_flight of them in JES2 at
+           the same time so more than one initiator can be used, and yields
+           each job as it is purged. One pass over the console follows all
+           of them, see job_tracker.
+
+           jcls (list): the jobs, each either the JCL (str) or a dict with
+              'jcl' and optionally 'jobname', 'steps_cc', 'ignore' and
+              'ebcdic' (see check_maxcc and submit_and_check)
+           max_in_flight (int): most jobs submitted but not yet purged
+           timeout (int): seconds to wait for the next job to be purged
+
+           yields: a dict per job with 'index' (position in jcls),
+              'jobname', 'jobnum', 'steps' (check_maxcc results) and 'error'
+              (the exception check_maxcc raised, or None)
+        '''
+        tracker = self.job_tracker(host=host, port=port, printer_file=printer_file, timeout=timeout)
+        jobs = enumerate(jcls)
+
+        while True:
+            while tracker.in_flight < max_in_flight:
+                index, job = next(jobs, (None, None))
+                if job is None:
+                    break
+                if isinstance(job, str):
+                    job = {'jcl': job}
+                tracker.submit(index=index, **job)
+
+            if not tracker.in_flight:
+                return
+
+            yield from tracker.completed()
+
+    def ipl(self, step_text='', clpa=False):
+        self.logger.debug(step_text)
+        self.reset_hercules(clpa=clpa)
+        #self.wait_for_string("0:0151 CKD")
+
+        if clpa:
+            self.send_herc("ipl 150")
+            self.wait_for_string("input for console 0:0009")
+            self.send_oper("r 0,clpa")
+            # self.wait_for_string('$HASP426 SPECIFY OPTIONS - HASP-II, VERSION JES2 4.1')
+            # self.send_oper('r 0,noreq')
+                             #IKT005I TCAS IS INITIALIZED
+        self.wait_for_string("IKT005I TCAS IS INITIALIZED")
+
+    def shutdown_mvs(self, cust=False):
+        self.logger.debug("[AUTOMATION: MVS/CE] Shutting down MVS")
+        self.send_oper('$PJES2,ABEND')
+        self.wait_for_string("00 $HASP098 ENTER TERMINATION OPTION")
+        self.send_oper("r 00,PURGE")
+        if cust:
+            self.wait_for_string('IEF404I JES2 - ENDED - ')
+        else:
+            self.wait_for_string('IEF196I IEF285I   VOL SER NOS= SPOOL0.')
+        self.send_oper('z eod')
+        self.wait_for_string('IEE334I HALT     EOD SUCCESSFUL')
+        self.send_oper('quiesce')
+        self.wait_for_string("disabled wait state")
+        self.send_herc('stop')
+
+    def send_herc(self, command=''):
+        ''' Sends hercules commands '''
+        self.logger.debug("[AUTOMATION: MVS/CE] Sending Hercules Command: {}".format(command))
+        if self.backend == 'asyncio':
+            # only the loop hercules runs in may touch its pipes
+            asyncio.run_coroutine_threadsafe(self.write_herc(command), self.hercules_loop).result()
+            return
+        self.hercproc.stdin.write((command+"\n").encode())
+        self.hercproc.stdin.flush()
+
+    async def write_herc(self, command):
+        ''' writes a command to hercules' stdin, waiting for the pipe to take it '''
+        self.hercproc.stdin.write((command+"\n").encode())
+        await self.hercproc.stdin.drain()
+
+    def send_oper(self, command=''):
+        ''' Sends operator/console commands (i.e. prepends /) '''
+        self.logger.debug("[AUTOMATION: MVS/CE] Sending Operator command: /{}".format(command))
+        self.send_herc("/{}".format(command))
+
+    def send_reply(self, command=''):
+        ''' Sends operator/console commands with automated number '''
+        self.logger.debug("[AUTOMATION: MVS/CE] Sending reply: /r {},{}".format(self.reply_num,command))
+        self.send_herc("/r {},{}".format(self.reply_num,command))
+
+    def submit(self,jcl, host='127.0.0.1',port=None, ebcdic=False, codepage='cp037'):
+        '''
+        submits a job (in ASCII) to hercules listener, jcl can also be a
+        path or open file, see send_deck()
+
+        returns: the number of bytes sent
+        '''
+        if not port:
+            port = self.punch_port
+        self.logger.debug("[AUTOMATION: MVS/CE] Submitting JCL host={} port={} EBCDIC={}".format(host,port,ebcdic))
+        return send_deck(host, port, jcl, ebcdic, codepage=codepage)
+
+
+    def submit_and_check(self, jcl, host='127.0.0.1',port=None, ebcdic=False, jobname=False, steps_cc={}, ignore=False):
+        '''
+           Submits a job, waits for it to be purged and checks the results.
+
+           returns: the check_maxcc() results
+        '''
+
+        if (ebcdic or not isinstance(jcl, str)) and not jobname:
+            raise Exception("Auto detection of EBCDIC or file JCL jobname not support. Missing jobname=")
+
+        if not jobname:
+            self.logger.debug("[AUTOMATION: MVS/CE] Getting job name from JCL")
+            jobname = jcl.split(" ")[0][2:]
+        
+        self.logger.debug("[AUTOMATION: MVS/CE] Submitting {}".format(jobname))
+        self.submit(jcl, host=host,port=port, ebcdic=ebcdic)
+        self.wait_for_job(jobname)
+        return self.check_maxcc(jobname, steps_cc=steps_cc, ignore=ignore)
+
+    def cache_key(self):
+        ''' identifies this system for build_cache '''
+        return "MVSCE:{}".format(self.mvsce_location.resolve())
+        
+
+    def mvsce_path(self, path):
+        ''' returns path, if it is relative, as a path in the MVS/CE folder '''
+        return os.path.join(self.mvsce_location, path)
+
+    def change_to_mvsce(self):
+        '''
+        Changes the working directory to the MVS/CE folder. Paths are
+        resolved per instance so this is only needed by scripts that use
+        relative paths to files in the MVS/CE folder themselves.
+        '''
+        self.logger.debug("[AUTOMATION: MVS/CE] Changing to MVS/CE Folder {}".format(self.mvsce_location))
+        os.chdir(self.mvsce_location)
+
+    def change_punchcard_output(self,path):
+        self.logger.debug("[AUTOMATION: MVS/CE] Changing 3525 Punchcard output location to: '{}'".format(path))
+        path = self.mvsce_path(path)
+        if not os.path.exists(os.path.dirname(path)): 
+            self.logger.debug("[AUTOMATION: MVS/CE] Punchcard folder '{}' does not exist".format(path))
+            raise Exception("Punchcard folder '{}' does no exist".format(path))
+        self.send_herc(command='detach d')
+        self.send_herc(command='attach d 3525 {} ebcdic'.format(path))
+        self.punch_path = path
+
+    def punch_reader(self, path=None, **kwargs):
+        '''
+        Returns a punch_reader for the punch file, by default the one set
+        with change_punchcard_output(). Anything else is passed to
+        punch_reader.
+        '''
+        return punch_reader(path or self.punch_path, **kwargs)
+
+    def snapshot(self, name):
+        '''
+        Saves the DASD used by the hercules config as snapshot name (in
+        snapshots/ in the MVS/CE folder). For DASD with shadow files (sf=,
+        like mvs_pool(shadow=True) instances) only the shadow files are
+        saved, the image under them is never written to; other DASD images
+        are saved whole. Files are cloned with reflinks where the
+        filesystem supports it so this takes seconds and no extra space.
+        Hercules must not be running, so the files are consistent:
+        shutdown_mvs() and quit_hercules() first.
+        '''
+        if self.hercules_running():
+            raise Exception("Hercules is running, use shutdown_mvs() and quit_hercules() before taking a snapshot")
+
+        folder = self.mvsce_path(f"snapshots/{name}")
+        tmp = f"{folder}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        self.logger.debug(f"[AUTOMATION: MVS/CE] Taking snapshot {name}")
+        for image, shadows in self.__dasd_files():
+            for path in shadow_files(shadows) if shadows else [image]:
+                target = os.path.join(tmp, os.path.relpath(path, self.mvsce_location))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                clone_file(path, target)
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(tmp, folder)
+
+    def restore(self, name):
+        '''
+        Puts the DASD back the way they were when snapshot name was taken,
+        quitting hercules first if it is running. Shadow files made since
+        are deleted. ipl() afterwards.
+        '''
+        folder = self.mvsce_path(f"snapshots/{name}")
+        if not os.path.isdir(folder):
+            raise Exception(f"No snapshot named {name} in {self.mvsce_location}")
+
+        if self.hercules_running():
+            self.quit_hercules()
+        self.logger.debug(f"[AUTOMATION: MVS/CE] Restoring snapshot {name}")
+        for image, shadows in self.__dasd_files():
+            if not shadows:
+                clone_file(os.path.join(folder, os.path.relpath(image, self.mvsce_location)), image)
+                continue
+            for path in shadow_files(shadows):
+                os.remove(path)
+            saved = os.path.join(folder, os.path.relpath(shadows, self.mvsce_location))
+            for path in shadow_files(saved):
+                clone_file(path, os.path.join(self.mvsce_location, os.path.relpath(path, folder)))
+
+    def snapshots(self):
+        ''' returns the names of the snapshots '''
+        folder = self.mvsce_path("snapshots")
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name for name in os.listdir(folder) if not name.endswith('.tmp'))
+
+    def __dasd_files(self):
+        '''
+        returns (image, shadows) for each DASD as paths, shadows being the
+        sf= shadow file name or None. Whatever a snapshot saves must be in
+        the MVS/CE folder.
+        '''
+        devices = dasd_devices(self.config)
+        if not devices:
+            raise Exception(f"No DASD found in {self.config}")
+        files = []
+        for image, shadows in devices:
+            image = self.mvsce_path(image)
+            if shadows:
+                shadows = self.mvsce_path(shadows)
+                if '*' not in os.path.basename(shadows):
+                    raise Exception(f"Shadow files {shadows} of DASD {image} have no * for the file number, they can't be part of a snapshot")
+            saved = shadows or image
+            if os.path.relpath(saved, self.mvsce_location).startswith('..'):
+                raise Exception(f"DASD {saved} is not in {self.mvsce_location}, it can't be part of a snapshot")
+            files.append((image, shadows))
+        return files
+
+class mvs_pool:
+    '''
+    Keeps size MVS/CE instances IPL'd and idle so builds don't wait for an
+    IPL. Each instance runs in its own copy of the MVS/CE folder with its
+    own ports, acquire() hands out an idle one and release() recycles it in
+    the background. When an instance fails to start acquire() raises the
+    error and the instance is booted again, after a delay that doubles
+    each time it fails in a row.
+
+    Examples:
+        >>> pool = mvs_pool('mvsce/', size=4)
+        >>> with pool.instance() as build:
+        >>>     build.submit_and_check(jcl)
+        >>> pool.close()
+
+    Args:
+        golden (str): the MVS/CE folder to copy, it is never run itself
+        size (int): OPTIONAL number of instances
+        work_dir (str): OPTIONAL folder for the copies, default a new
+            temporary folder which close() removes
+        base_port (int): OPTIONAL first port used, instance i uses the
+            ports from base_port + i * port_step
+        port_step (int): OPTIONAL ports set aside for each instance
+        recycle (str): OPTIONAL how released instances are made clean
+            again: 'fresh' (a new copy of golden, the default) or 'reipl'
+            (IPL the same copy again)
+        shadow (bool): OPTIONAL don't copy the DASD images, every instance
+            uses golden's read only with its own hercules shadow files
+            (sf=) for what it changes. A fresh instance only needs its
+            shadow files removed. The images must be compressed (CCKD).
+        clpa (bool): OPTIONAL IPL with CLPA
+        loglevel, timeout, backend: passed to mvs
+    '''
+
+    PORTS = [
+        re.compile(r'^(\s*(?:CNSLPORT|HTTPPORT|HTTP\s+PORT)\s+(?:[\w.]+:)?)(\d+)', re.IGNORECASE | re.MULTILINE),
+        re.compile(r'^(\s*\S+\s+\S+\s+)(\d+)(?=\s+sockdev\b)', re.IGNORECASE | re.MULTILINE),
+    ]
+    READER_PORT = 3505
+    BOOT_RETRY_DELAY = 1 # seconds before booting a slot again after it failed, doubled each time
+    MAX_BOOT_RETRY_DELAY = 60
+
+    def __init__(self, golden, size=2, work_dir=None, base_port=20000, port_step=10,
+                 recycle='fresh', shadow=False, clpa=False, loglevel=logging.WARNING, timeout=None,
+                 backend='threads'):
+        if recycle not in ('fresh', 'reipl'):
+            raise ValueError(f"recycle must be fresh or reipl: {recycle}")
+        self.golden = Path(golden).absolute()
+        if not (self.golden / "conf/local.cnf").exists():
+            raise Exception(f"Not an MVS/CE folder, no conf/local.cnf: {self.golden}")
+        self.size = size
+        self.temp_dir = None if work_dir else tempfile.mkdtemp(prefix='automvs_pool_')
+        self.work_dir = Path(work_dir or self.temp_dir).absolute()
+        self.base_port = base_port
+        self.port_step = port_step
+        self.recycle = recycle
+        self.shadow = shadow
+        self.clpa = clpa
+        self.loglevel = loglevel
+        self.timeout = timeout
+        self.backend = backend
+        self.logger = logging.getLogger(__name__)
+        self.idle = queue.Queue() # ready mvs objects, or (index, exception) when one failed to start
+        self.instances = {} # index: mvs, for every running instance
+        self.ports = {} # index: {golden port: instance port}
+        self.failures = {} # index: boots in a row that failed
+        self.lock = threading.Lock() # instances and threads
+        self.closing = threading.Event()
+        self.closed = False
+        self.threads = []
+
+        for index in range(size):
+            self.__start(self.__boot, index)
+
+    def __start(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        with self.lock:
+            self.threads = [t for t in self.threads if t.is_alive()] + [thread]
+            thread.start()
+
+    def __retry(self, index, delay):
+        ''' boots a slot again after a failure, unless the pool is closed first '''
+        if not self.closing.wait(delay):
+            self.__boot(index)
+
+    def __boot(self, index):
+        build = None
+        try:
+            folder = self.work_dir / f"mvsce{index}"
+            if self.shadow and self.recycle == 'fresh' and index in self.ports:
+                shutil.rmtree(folder / "shadows")
+                os.makedirs(folder / "shadows")
+            elif self.recycle == 'fresh' or index not in self.ports:
+                self.copy(folder)
+                self.ports[index] = self.rewrite_ports(folder / "conf/local.cnf", index)
+            ports = self.ports[index]
+            self.logger.debug(f"[POOL] Starting instance {index} in {folder} ports {ports}")
+            build = mvs(mvsce=folder, loglevel=self.loglevel, timeout=self.timeout,
+                        punch_port=ports.get(self.READER_PORT, self.READER_PORT), backend=self.backend)
+            build.pool_index = index
+            build.ports = ports
+            with self.lock:
+                self.instances[index] = build
+            build.ipl(clpa=self.clpa)
+            self.logger.debug(f"[POOL] Instance {index} ready")
+            self.failures.pop(index, None)
+            if self.closed:
+                self.__stop(build)
+            else:
+                self.idle.put(build)
+        except Exception as e:
+            self.logger.error(f"[POOL] Instance {index} failed to start: {e}")
+            if build is not None:
+                self.__stop(build)
+            self.idle.put((index, e))
+
+    def copy(self, folder):
+        '''
+        makes folder a new copy (reflinks where possible, see clone_tree())
+        of the golden MVS/CE folder, with shadow files for the DASD if
+        shadow is set
+        '''
+        if folder.exists():
+            shutil.rmtree(folder)
+
+        if not self.shadow:
+            clone_tree(self.golden, folder)
+            return
+
+        images = {os.path.abspath(self.golden / image) for image in dasd_images(self.golden / "conf/local.cnf")}
+        clone_tree(self.golden, folder, ignore=lambda path, names: [
+            name for name in names if os.path.abspath(os.path.join(path, name)) in images])
+        os.makedirs(folder / "shadows")
+
+        def shadow(match):
+            image = Path(os.path.abspath(self.golden / match.group(2)))
+            options, hash, comment = match.group(3).partition('#')
+            options = re.sub(r'\s+sf=\S+', '', options).rstrip()
+            shadows = f"sf={folder}/shadows/{image.stem}_*{image.suffix}"
+            return f"{match.group(1)}{image}{options} {shadows}" + (f" #{comment}" if hash else '')
+
+        with open(folder / "conf/local.cnf", 'r') as f:
+            text = DASD_LINE.sub(shadow, f.read())
+        with open(folder / "conf/local.cnf", 'w') as f:
+            f.write(text)
+
+    def rewrite_ports(self, config, index):
+        '''
+        Moves the ports in a hercules config (console, http and sockdev
+        card readers) to this instance's range.
+
+        returns: a dict of old port: new port
+        '''
+        with open(config, 'r') as f:
+            text = f.read()
+
+        ports = {}
+        def move(match):
+            old = int(match.group(2))
+            if old not in ports:
+                if len(ports) == self.port_step:
+                    raise Exception(f"More than {self.port_step} ports in {config}")
+                ports[old] = self.base_port + index * self.port_step + len(ports)
+            return match.group(1) + str(ports[old])
+
+        for pattern in self.PORTS:
+            text = pattern.sub(move, text)
+
+        with open(config, 'w') as f:
+            f.write(text)
+        return ports
+
+    def acquire(self, timeout=None):
+        ''' returns an idle IPL'd mvs, waiting up to timeout seconds (forever if None) for one '''
+        if self.closed:
+            raise Exception("mvs_pool is closed")
+        try:
+            build = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise Exception(f"No MVS/CE instance became available within {timeout} seconds")
+        if isinstance(build, tuple):
+            index, e = build
+            # try the slot again, later each time it fails, so the pool
+            # doesn't shrink
+            failures = self.failures[index] = self.failures.get(index, 0) + 1
+            delay = min(self.BOOT_RETRY_DELAY * 2 ** (failures - 1), self.MAX_BOOT_RETRY_DELAY)
+            self.logger.debug(f"[POOL] Booting instance {index} again in {delay} seconds")
+            self.__start(self.__retry, index, delay)
+            raise e
+        self.logger.debug(f"[POOL] Acquired instance {build.pool_index}")
+        return build
+
+    def release(self, build):
+        ''' gives an instance back, it is recycled in the background '''
+        self.logger.debug(f"[POOL] Releasing instance {build.pool_index}")
+        self.__start(self.__recycle, build)
+
+    def __recycle(self, build):
+        self.__stop(build)
+        if not self.closed:
+            self.__boot(build.pool_index)
+
+    def __stop(self, build):
+        try:
+            build.quit_hercules()
+        except Exception as e:
+            self.logger.debug(f"[POOL] Instance {build.pool_index} did not quit cleanly: {e}")
+            if build.hercules_running():
+                build.kill()
+        with self.lock:
+            self.instances.pop(build.pool_index, None)
+
+    @contextlib.contextmanager
+    def instance(self, timeout=None):
+        ''' acquire() for a with block, released at the end of it '''
+        build = self.acquire(timeout)
+        try:
+            yield build
+        finally:
+            self.release(build)
+
+    def close(self):
+        ''' stops every instance and removes the temporary copies '''
+        self.closed = True
+        self.closing.set()
+        while True:
+            with self.lock:
+                threads = [t for t in self.threads if t.is_alive()]
+            if not threads:
+                break
+            for thread in threads:
+                thread.join()
+        with self.lock:
+            running = list(self.instances.values())
+        for build in running:
+            self.__stop(build)
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class turnkey:
+
+    JOB_STARTED = re.compile(r'(?:JOB\s*(\d+)\s+)?IEF403I\s+(\S+)')
+    JOB_CARD = re.compile(r'^//(\S+)\s+JOB\s', re.MULTILINE)
+
+    def __init__(self,
+                 system="TK5",
+                 mvs_tk_path="mvs-tk5", 
+                 ip='127.0.0.1',
+                 punch_port=3505,
+                 web_port=8038,
+                 loglevel=logging.WARNING,timeout=300,
+                 username='HERC01',
+                 password='CUL8TR'
+                ):
+        
+        self.system = system
+        self.mvs_path = mvs_tk_path
+        self.ip = ip
+        self.timeout = timeout
+        if not Path(f"{self.mvs_path}/prt/prt00e.txt").is_file():
+            raise Exception(f"could not find TK4/TK5 prt/prt00e.txt file: {self.mvs_path}/prt/prt00e.txt")
+        if not Path(f"{self.mvs_path}/log/hardcopy.log").is_file():
+            raise Exception(f"could not find TK4/TK5 log/hardcopy.log file: {self.mvs_path}/prt/prt00e.txt")
+
+        self.logfile = f"{self.mvs_path}/log/hardcopy.log"
+        self.printer = f"{self.mvs_path}/prt/prt00e.txt"
+        self.punch_path = f"{self.mvs_path}/pch/pch00d.txt"
+        self.log_tail = log_tail(self.logfile)
+        self.prt_jobs = {} # (jobname, jobnum): printer lines of that run, see index_prt_lines()
+        self.prt_current = None
+
+        self.username = username
+        self.password = password
+
+        # Create the Logger
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        logger_formatter = logging.Formatter(
+            '%(levelname)s :: %(funcName)s :: %(message)s')
+
+        # Log to stderr
+        ch = logging.StreamHandler()
+        ch.setFormatter(logger_formatter)
+        ch.setLevel(loglevel)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(ch)
+
+        self.punch_port = punch_port
+        self.web_port = web_port
+
+        self.logger.debug(f"[AUTOMATION: {self.system}] Using TK Automation with - IP: {self.ip}")
+        self.check_ports()
+
+    def submit(self,jcl, ebcdic=False, port=None, codepage='cp037'):
+        self.logger.debug(f"[AUTOMATION: {self.system}] Submitting JCL host={self.ip} port={self.punch_port} EBCDIC={ebcdic}")
+        #print(jcl)
+        self.read_log_lines() #establish baseline
+        self.read_prt_lines() #establish baseline
+        return self.__punch(jcl, ebcdic, port, codepage)
+
+    def __punch(self, jcl, ebcdic=False, port=None, codepage='cp037'):
+        if not port:
+            port = self.punch_port 
+
+        return send_deck(self.ip, port, jcl, ebcdic, codepage=codepage)
+
+    def job_tracker(self, port=None, timeout=False):
+        '''
+        Returns a job_tracker that follows the hardcopy log for the jobs it
+        submits. Printer output is split up by job so the results of many
+        jobs running at once can be checked. While it is in use nothing
+        else should read the log or printer.
+        '''
+        lines = collections.deque()
+
+        def next_line(timeout):
+            if not lines:
+                lines.extend(self.__log_lines(self.log_tail.wait_lines(timeout)))
+            return lines.popleft() if lines else None
+
+        def submit(jcl, ebcdic=False, jobname=None):
+            # jobs are checked by job number, earlier runs can't get in the way
+            self.index_prt_lines()
+            return self.__punch(jcl, ebcdic, port)
+
+        def check_maxcc(jobname, steps_cc={}, ignore=False, jobnum=None):
+            self.index_prt_lines()
+            return self.parse_maxcc(jobname, self.pop_prt_job(jobname, jobnum), steps_cc, ignore)
+
+        self.read_log_lines() #establish baseline
+        return job_tracker(submit, check_maxcc, next_line, self.logger, timeout=timeout or self.timeout)
+
+
+    def wait_for_string(self,string_to_waitfor):
+        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting for '{string_to_waitfor}' in {self.logfile}")
+
+        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting {self.timeout} seconds for string to appear in hercules log: {string_to_waitfor}")
+
+        if not self.__wait_for_log([string_to_waitfor]):
+            exception = f"Waiting for '{string_to_waitfor}' timed out after {self.timeout} seconds"
+            print("[ERR] {}".format(exception))
+            raise Exception(exception)
+
+    def wait_for_strings(self,strings_to_waitfor):
+        '''
+        Unlike string to wait for this function takes a list of strings and returns when any of them hit
+        '''
+        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting for any of these strings '{strings_to_waitfor}' in {self.logfile}")
+
+        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting {self.timeout} seconds for strings to appear in hercules log: {strings_to_waitfor}")
+
+        word = self.__wait_for_log(strings_to_waitfor)
+        if not word:
+            exception = f"Waiting for any of the strings timed out after {self.timeout} seconds"
+            print("[ERR] {}".format(exception))
+            raise Exception(exception)
+        return word
+
+    def __wait_for_log(self, strings_to_waitfor):
+        '''
+        Follows the hardcopy log until a line contains one of strings_to_waitfor,
+        sleeping between writes to the log. Returns the string found or None
+        on timeout.
+        '''
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            for line in self.__log_lines(self.log_tail.wait_lines(remaining)):
+                for word in strings_to_waitfor:
+                    if word in line:
+                        return word
+
+    def wait_for_job(self, jobname):
+        self.wait_for_string("HASP250 {:<8} IS PURGED".format(jobname))
+
+    def submit_and_check(self, jcl, ebcdic=False, jobname=False, steps_cc={}, ignore=False):
+        '''
+        Submits a job, waits for it to be purged and checks the results.
+
+        returns: the check_maxcc() results
+        '''
+        if (ebcdic or not isinstance(jcl, str)) and not jobname:
+            raise Exception("Auto detection of EBCDIC or file JCL jobname not support. Missing jobname=")
+
+        if not jobname:
+            jobname = jcl.split(" ")[0][2:]
+
+        self.logger.debug(f"[AUTOMATION: {self.system}] Submitting {jobname}")
+        self.submit(jcl, ebcdic=ebcdic)
+        self.wait_for_job(jobname)
+        return self.check_maxcc(jobname, steps_cc=steps_cc, ignore=ignore)
+
+    def cache_key(self):
+        ''' identifies this system for build_cache '''
+        return f"{self.system.upper()}:{os.path.abspath(self.mvs_path)}"
+
+    def change_punchcard_output(self,path):
+        self.logger.debug(f"[AUTOMATION: {self.system}] Changing 3525 Punchcard output location to: '{path}'")
+        if not os.path.exists(os.path.dirname(path)): 
             self.logger.debug(f"[AUTOMATION: {self.system}] Punchcard folder '{path}' does not exist")
             raise Exception("Punchcard folder '{}' does not exist".format(path))
         self.send_herc(command='detach d')
         self.send_herc(command='attach d 3525 {} ebcdic'.format(path))
+        self.punch_path = os.path.join(self.mvs_path, path)
+
+    def punch_reader(self, path=None, **kwargs):
+        ''' same as mvs.punch_reader() '''
+        return punch_reader(path or self.punch_path, **kwargs)
+
+    def read_log_lines(self):
+        ''' returns the lines added to the hardcopy log since the last read '''
+        return self.__log_lines(self.log_tail.read_lines())
+
+    def __log_lines(self, new_lines):
+        for line in new_lines:
+            self.logger.debug(f"[LOG] {line.strip()}")
+        return new_lines
+
+    
+    def read_prt_lines(self):
+        #self.logger.debug(f"reading {self.logfile}")
+        with open(self.printer, "r",errors='ignore') as file:
+            # Check if the last_size attribute exists in the instance
+            if not hasattr(self, 'prt_last_size'):
+                # If not, initialize it to 0
+                self.prt_last_size = 0
+            
+            # Move the cursor to the last known position
+            file.seek(self.prt_last_size)
+            
+            # Read new lines
+            new_lines = file.readlines()
+
+            # if self.prt_last_size > 0 :
+            #     for line in new_lines:
+            #         self.logger.debug(f"[PRT] {line.strip()}")
+            
+            # Update the last known file size
+            self.prt_last_size = file.tell()
+            #self.logger.debug(f"returning {len(new_lines)} lines")
+            return new_lines
+
+    def check_maxcc(self, jobname, steps_cc={},ignore=False):
+        self.logger.debug(f"[AUTOMATION: {self.system}] Checking {jobname} job results")
+        return self.parse_maxcc(jobname, self.read_prt_lines(), steps_cc, ignore)
+
+    def index_prt_lines(self):
+        ''' reads the new printer output and splits it up by job in to prt_jobs '''
+        for line in self.read_prt_lines():
+            started = self.JOB_STARTED.search(line)
+            if started:
+                jobnum, jobname = started.groups()
+                self.prt_current = (jobname, str(int(jobnum)) if jobnum else None)
+                self.prt_jobs[self.prt_current] = []
+            if self.prt_current:
+                self.prt_jobs[self.prt_current].append(line)
+                if ('IEF404I' in line or 'IEF453I' in line) and self.prt_current[0] in line:
+                    self.prt_current = None
+
+    def pop_prt_job(self, jobname, jobnum=None):
+        '''
+        Returns, and forgets, the printer lines indexed for job number jobnum
+        of jobname, or without jobnum for its last run. [] if there are none.
+        '''
+        if jobnum is not None:
+            keys = [(jobname, str(int(jobnum))), (jobname, None)]
+        else:
+            keys = [key for key in reversed(self.prt_jobs) if key[0] == jobname][:1]
+        for key in keys:
+            if key in self.prt_jobs:
+                return self.prt_jobs.pop(key)
+        return []
+
+    def drop_prt_jobs(self, jobname):
+        ''' forgets the printer lines of the finished runs of jobname '''
+        for key in [key for key in self.prt_jobs if key[0] == jobname and key != self.prt_current]:
+            del self.prt_jobs[key]
+
+    def parse_maxcc(self, jobname, lines, steps_cc={}, ignore=False):
+        '''
+        Finds the step results for jobname in printer output lines, see
+        check_maxcc()
+        '''
+        found_job = False
+        failed_step = False
+        job_status = []
+        log = None
+
+        logmsg = '[MAXCC] Jobname: {:<8} Procname: {:<8} Stepname: {:<8} Progname: {:<8} Exit Code: {:<8}'
+        for line in lines:
+            #print(line.strip())
+            if 'IEF403I' in line and f' {jobname} ' in line:
+                found_job = True
+                continue
+            
+
+            if ('IEF404I' in line or 'IEF453I' in line) and jobname in line:
+                break
+
+            if found_job and f' {jobname} ' in line and ' ABEND ' not in line:
+
+                x = line.strip().split()
+                #y = x.index('IEF142I')
+                j = x[3:]
+                #print(j)
+                if len(j) == 5:
+                    log = logmsg.format(j[0],'',j[1],j[2],j[4])
+                    step_status = {
+                                    "jobname:" : j[0],
+                                    "procname": '',
+                                    "stepname": j[1],
+                                    "progname": j[2],
+                                    "exitcode": j[4]
+                                }
+                    maxcc=j[4]
+                    stepname = j[1]
+
+                elif len(j) == 6:
+                    log = logmsg.format(j[0],j[2],j[1],j[3],j[5])
+                    step_status = {
+                                    "jobname:" : j[0],
+                                    "procname": j[2],
+                                    "stepname": j[1],
+                                    "progname": j[3],
+                                    "exitcode": j[5]
+                                }
+                    stepname = j[3]
+                    maxcc=j[5]
+
+                elif len(j) == 4:
+                    log = logmsg.format(j[0],'',j[1],j[2],j[3])
+                    step_status = {
+                                    "jobname:" : j[0],
+                                    "procname": '',
+                                    "stepname": j[1],
+                                    "progname": j[2],
+                                    "exitcode": j[3]
+                                }
+                    maxcc=j[3]
+                    stepname = j[1]
+
+                self.logger.debug(log)
+                job_status.append(step_status)
+
+                if stepname in steps_cc:
+                    expected_cc = steps_cc[stepname]
+                else:
+                    expected_cc = '0000'
+
+                if maxcc != expected_cc:
+                    error = "[MAXCC] Step {} Condition Code does not match expected condition code: {} vs {} review prt00e.txt for errors".format(stepname,j[-1],expected_cc)
+                    if ignore:
+                        self.logger.debug(error)
+                    else:
+                        self.logger.error(error)
+                    failed_step = True
+
+        if not found_job:
+            raise ValueError("Job {} not found in printer output {}".format(jobname, self.printer))
+
+        if failed_step and not ignore:
+            self.logger.error(f"Job Failed with maxcc: {maxcc}")
+            print_maxcc(job_status)
+            raise ValueError(error)
+            
+        return(job_status)
+
+    def hercules_web_command(self,command=''):
+        
+        cmd = f"/cgi-bin/tasks/syslog?command=" + urllib.parse.quote(command)
+        conn = http.client.HTTPConnection(self.ip, self.web_port)
+        conn.request("GET", cmd)
+        response = conn.getresponse()
+        conn.close()
+
+    def send_herc(self, command=''):
+        ''' Sends hercules commands '''
+        self.logger.debug(f"[AUTOMATION: {self.system}] Sending Hercules Command: {command}")
+        self.hercules_web_command(command)
+
+    def send_oper(self, command=''):
+        ''' Sends operator/console commands (i.e. prepends /) '''
+        self.logger.debug(f"[AUTOMATION: {self.system}] Sending Operator command: /{command}")
+        self.send_herc(f"/{command}")
+    
+    def check_ports(self):
+        self.logger.debug(f"[AUTOMATION: {self.system}] Checking if {self.system} ports are available")
+        self.check_port(self.ip,self.punch_port)
+        self.check_port(self.ip,self.web_port)
+
+    def check_port(self, ip, port):
+        self.logger.debug(f"[AUTOMATION: {self.system}] Checking {ip}:{port}")
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(2)  # Set a timeout for the connection attempt
+
+        try:
+            # Attempt to connect to the IP address and port
+            result = sock.connect_ex((ip, port))
+            if result == 0:
+                self.logger.debug(f"[AUTOMATION: {self.system}] Port {port} is open")
+            else:
+                self.logger.debug(f"[AUTOMATION: {self.system}] Port {port} is closed")
+                raise Exception(f"Port {port} is not available, is TK5 running?")
+        except Exception as e:
+            raise Exception(f"Error checking port {port}: {e}")
+        finally:
+            # Close the socket
+            sock.close()
+
+    def jobcard(self, jobname, title, jclass='A', msgclass='A'):
+        '''
+        This function generates the jobcard needed to submit the jobs
+        '''
+
+        jobcard = ( 
+                  "//{jobname} JOB (BREXX),'{title}'," +
+                  "//       CLASS={jclass},MSGCLASS={msgclass}, " +
+                  "//       REGION=8M,MSGLEVEL=(1,1),USER={user},PASSWORD={password} " +
+                  "//********************************************************************\n"
+                  )
+
+        return jobcard.format(
+            jobname=jobname.upper(),
+            title=title,
+            jclass=jclass,
+            msgclass=msgclass,
+            user=self.username.upper(),
+            password=self.password.upper()
+            )
+
+    def test(self,times=5):
+        t = ''
+        for i in range(1,times):
+            t += f"//TEST{i} EXEC PGM=IEFBR14\n"
+
+        proc = "//TSTPROC      PROC\n//TESTPROC  EXEC  PGM=IEFBR14\n// PEND\n"
+        p = ''
+        for i in range(1,times):
+            p += f"//TST{i}     EXEC TSTPROC\n"
+
+        self.submit(self.jobcard('test','test job')+t+proc+p)
+        self.wait_for_string("$HASP250 TEST     IS PURGED")
+        results = self.check_maxcc('TEST')
+        self.logger.debug("TEST Completed Succesfully")
+        print_maxcc(results)
+        self.send_herc('/$da')
+        self.send_oper('$da')
+
+class base64_writer:
+    '''
+    Decodes base64 lines as they arrive, in 4 byte aligned chunks of
+    about chunk_size, and writes them to binary_out.
+
+    Args:
+        binary_out: writable binary file object
+        progress (function): OPTIONAL called with the total bytes written
+        written (int): OPTIONAL bytes already written for this file
+    '''
+
+    def __init__(self, binary_out, progress=None, chunk_size=65536, written=0):
+        self.binary_out = binary_out
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.written = written
+        self.expected = None # from the '--- Size:' trailer, if sent
+        self.pending = []
+        self.pending_size = 0
+
+    def __flush(self, final=False):
+        b64 = ''.join(self.pending)
+        aligned = len(b64) if final else len(b64) - (len(b64) % 4)
+        data = base64.b64decode(b64[:aligned])
+        self.binary_out.write(data)
+        self.written += len(data)
+        self.pending = [b64[aligned:]]
+        self.pending_size = len(self.pending[0])
+        if self.progress:
+            self.progress(self.written)
+
+    def line(self, line):
+        if line.startswith('--- Size:'):
+            self.expected = int(line.split(':')[1])
+            return
+        self.pending.append(line)
+        self.pending_size += len(line)
+        if self.pending_size >= self.chunk_size:
+            self.__flush()
+
+    def close(self):
+        ''' writes what is left, returns the number of bytes written '''
+        if self.pending_size:
+            self.__flush(final=True)
+        return self.written
+
+class frame_writer:
+    '''
+    Writes a raw BINARY or TRUNC file to binary_out as it arrives. TRUNC
+    records are a 2 byte length followed by the record with its trailing
+    blanks removed, they are padded back to lrecl with EBCDIC blanks.
+
+    Args:
+        mode (str): 'BINARY' or 'TRUNC'
+        lrecl (int): record length for TRUNC
+        binary_out: writable binary file object
+        progress (function): OPTIONAL called with the total bytes written
+    '''
+
+    def __init__(self, mode, lrecl, binary_out, progress=None):
+        self.mode = mode
+        self.lrecl = lrecl
+        self.binary_out = binary_out
+        self.progress = progress
+        self.written = 0
+        self.pending = b''
+
+    def write(self, chunk):
+        if self.mode == 'TRUNC':
+            records = []
+            chunk = self.pending + chunk
+            pos = 0
+            while pos + 2 <= len(chunk):
+                length = int.from_bytes(chunk[pos:pos + 2], 'big')
+                if pos + 2 + length > len(chunk):
+                    break
+                records.append(chunk[pos + 2:pos + 2 + length].ljust(self.lrecl, b'\x40'))
+                pos += 2 + length
+            self.pending = chunk[pos:]
+            chunk = b''.join(records)
+
+        self.binary_out.write(chunk)
+        self.written += len(chunk)
+        if self.progress:
+            self.progress(self.written)
+
+    def close(self):
+        ''' returns the number of bytes written '''
+        if self.pending:
+            raise Exception(f"{len(self.pending)} bytes left over after TRUNC frame")
+        return self.written
+
+class tagged_reader:
+    '''
+    Reader for the responses to one tagged command on a pipelined
+    remote_mvs connection.
+
+    The remote_mvs reader thread puts the lines (without the tag) and
+    raw file data sent for the tag in a queue and they are read back the
+    same way as with socket_reader. If future is set the lines are
+    collected for remote_mvs.request() instead.
+
+    Args:
+        tag (str): the tag sent with the command
+    '''
+
+    def __init__(self, tag, future=None, end_string='--- DONE', start_string=False, error_string="Error:"):
+        self.tag = tag
+        self.queue = queue.Queue()
+        self.frame = b'' # file data received but not read yet
+        self.future = future
+        self.lines = []
+        self.end_string = end_string
+        self.start_string = start_string
+        self.error_string = error_string
+
+    def __get(self, kind, timeout):
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("Receive timeout")
+        if item is None:
+            self.queue.put(None)
+            raise ConnectionError("Connection closed by remote host")
+        if item[0] != kind:
+            raise ConnectionError(f"Expected {kind} for tag {self.tag}, received {item[0]}")
+        return item[1]
+
+    def readline(self, timeout):
+        ''' returns the next line, without the tag or newline, as bytes '''
+        return self.__get('line', timeout)
+
+    def read(self, size, timeout):
+        ''' returns exactly size bytes of file data '''
+        while len(self.frame) < size:
+            self.frame += self.__get('frame', timeout)
+        data = self.frame[:size]
+        self.frame = self.frame[size:]
+        return data
+
+class remote_mvs:
+
+    FILE_HEADER = re.compile(r'--- Sending (\w+) (?:Encoded )?File(?: LRECL=(\d+))?(?: \((\d+) bytes\))?')
+    FILE_COMMANDS = ('/FILE', '/FILES')
+
+    @staticmethod
+    def file_command(command):
+        ''' True if command is one whose response can have raw file data in it '''
+        words = command.split(maxsplit=1)
+        return bool(words) and words[0].upper() in remote_mvs.FILE_COMMANDS
+
+    @staticmethod
+    def file_response_done(text):
+        ''' True if text is the last line of a /FILE or /FILES response '''
+        return text.startswith('--- DONE') or text.startswith('Error:')
+
+    def __init__(self,
+                 system="TK5", 
+                 ip='127.0.0.1',
+                 punch_port=3505,
+                 automvs_port=3702,
+                 web_port=8038,
+                 loglevel=logging.WARNING,timeout=300,
+                 username='HERC01',
+                 password='CUL8TR',
+                 pipeline=False
+                ):
+        '''
+        Args:
+            pipeline (bool): OPTIONAL tag every command so many can be
+                running at once on this one connection. Each thread waits
+                for the responses to its own commands, and request() can
+                send commands without waiting at all. Needs an AUTOMVS
+                server that supports tagged commands.
+        '''
+        
+        self.system = system
+        self.ip = ip
+        self.port = automvs_port
+        self.timeout = timeout
+        self.username = username
+        self.password = password
+        self.socket = None
+        self.reader = None
+        self.pipeline = pipeline
+        self.pipeline_thread = None
+        self.send_lock = threading.RLock()
+        self.channels_lock = threading.Lock()
+        self.channels = {} # tag: tagged_reader
+        self.file_tags = set() # tags of /FILE and /FILES commands still being answered
+        self.last_tag = 0
+        self.local = threading.local() # the last command sent by each thread
+        self.loglevel = logging.getLevelName(loglevel)
+        self.current_job = {} # dict with jobname and jobnum
+
+        # Create the Logger
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        logger_formatter = logging.Formatter(
+            '%(levelname)s :: %(funcName)s :: %(message)s')
+
+        # Log to stderr
+        ch = logging.StreamHandler()
+        ch.setFormatter(logger_formatter)
+        ch.setLevel(loglevel)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(ch)
+
+        self.punch_port = punch_port
+        self.web_port = web_port
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Starting Automation")
+        self.check_ports()
+        self.connect()
+
+    def connect(self):
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Connecting to {self.ip}:{self.port}")
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.connect((self.ip, int(self.port)))
+        self.reader = socket_reader(self.socket)
+        
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Connection done")
+
+        self.wait_for_socket('Please /LOGON to continue',timeout=5)
+
+        self.send_automvs("/LOGON {user} {passw}".format(user=self.username,passw=self.__hash__(self.password)))
+
+        self.wait_for_socket('LOGON OK',error_string='Logon Failed:')
+
+        if self.pipeline:
+            self.pipeline_thread = threading.Thread(target=self.__demux, daemon=True)
+            self.pipeline_thread.start()
+
+    def __demux(self):
+        '''
+        Reads everything sent by the server on a pipelined connection and
+        hands each line, and the raw file data after a BINARY or TRUNC
+        header, to the command with the same tag.
+        '''
+        reader = self.reader
+        while True:
+            try:
+                line = reader.readline(None)
+            except (ConnectionError, OSError, ValueError):
+                break
+
+            text = line.decode(encoding="ascii", errors="ignore")
+            self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Received: {text}")
+
+            if not line.startswith(b'#'):
+                continue
+
+            tag, _, data = line[1:].partition(b' ')
+            tag = tag.decode(encoding="ascii", errors="ignore")
+            text = data.decode(encoding="ascii", errors="ignore")
+            with self.channels_lock:
+                channel = self.channels.get(tag)
+                # only file commands are followed by raw data, anything
+                # else that looks like a header is just text
+                file_data = tag in self.file_tags
+                if file_data and self.file_response_done(text):
+                    self.file_tags.discard(tag)
+
+            if channel is None:
+                self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Nothing waiting for tag {tag}")
+            elif channel.future is None:
+                channel.queue.put(('line', data))
+            else:
+                self.__collect(channel, text)
+
+            header = self.FILE_HEADER.search(text) if file_data else None
+            if header and header.group(3):
+                # the raw file data follows its header straight away
+                left = int(header.group(3))
+                try:
+                    while left:
+                        chunk = reader.read(min(socket_reader.BUFFER_SIZE, left), None)
+                        left -= len(chunk)
+                        if channel is not None:
+                            channel.queue.put(('frame', chunk))
+                except (ConnectionError, OSError, ValueError):
+                    break
+
+        with self.channels_lock:
+            channels = list(self.channels.values())
+            self.channels = {}
+        for channel in channels:
+            channel.queue.put(None)
+            if channel.future is not None and not channel.future.done():
+                channel.future.set_exception(ConnectionError("Connection closed by remote host"))
+
+    def __collect(self, channel, line):
+        ''' adds a line to a request(), completing it at the end or an error '''
+        kind = self.match_line(line, channel.end_string, channel.start_string, channel.error_string)
+        if kind == 'line':
+            channel.lines.append(line.strip())
+            return
+        if kind == 'skip':
+            return
+        self.__close_channel(channel)
+        if kind == 'end':
+            channel.future.set_result(channel.lines)
+        else:
+            channel.future.set_exception(Exception(f"Error from {self.ip}:{self.port}: {line}"))
+
+    def __open_channel(self, command, **kwargs):
+        with self.channels_lock:
+            self.last_tag += 1
+            channel = tagged_reader(str(self.last_tag), **kwargs)
+            self.channels[channel.tag] = channel
+            if self.file_command(command):
+                self.file_tags.add(channel.tag)
+        return channel
+
+    def __close_channel(self, channel):
+        with self.channels_lock:
+            self.channels.pop(channel.tag, None)
+
+    def __reader(self):
+        ''' the reader for the responses to this thread's last command '''
+        if not self.pipeline_thread:
+            return self.reader
+        channel = getattr(self.local, 'channel', None)
+        if channel is None:
+            raise Exception("Pipelined read attempted before sending a command from this thread")
+        return channel
+
+    def request(self, command, end_string='--- DONE', start_string=False, error_string="Error:"):
+        '''
+        Sends an AUTOMVS command without waiting for it to finish
+
+        With pipeline=True any number of requests can be running at the
+        same time, e.g. one /JOB per job being watched. Otherwise the
+        command is run before returning.
+
+        Args:
+            command (str): the AUTOMVS command, e.g. '/JOB TESTJOB'
+            end_string, start_string, error_string: see wait_for_socket()
+
+        returns: a concurrent.futures.Future with the list of lines sent
+            back, or the exception if the server sent an error
+        '''
+        future = concurrent.futures.Future()
+
+        if not self.socket:
+            self.connect()
+
+        if not self.pipeline_thread:
+            self.send_automvs(command)
+            try:
+                future.set_result(self.wait_for_socket(end_string, start_string=start_string, error_string=error_string))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        channel = self.__open_channel(command, future=future, end_string=end_string, start_string=start_string, error_string=error_string)
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Sending: #{channel.tag} {command}")
+        with self.send_lock:
+            self.socket.sendall(f"#{channel.tag} {command}\n".encode('ascii'))
+        return future
+
+    @staticmethod
+    def match_line(line, end_string, start_string=False, error_string="Error:"):
+        '''
+        What a line received while waiting for end_string is: 'skip' for
+        job log and start_string lines, 'end', 'error' or 'line'
+        '''
+        if '*JOBLOG*' in line:
+            return 'skip'
+        if start_string and start_string in line:
+            return 'skip'
+        if end_string in line:
+            return 'end'
+        if error_string in line:
+            return 'error'
+        return 'line'
+        
+
+
+    def wait_for_socket(self,end_string,start_string=False, error_string="Error:",timeout=False):
+        return list(self.iter_socket(end_string, start_string=start_string, error_string=error_string, timeout=timeout))
+
+    def iter_socket(self,end_string,start_string=False, error_string="Error:",timeout=False):
+        '''
+        Same as wait_for_socket() but yields each line as it is received
+        instead of collecting them in a list.
+        '''
+
+        if not timeout:
+            timeout = self.timeout
+        if not timeout:
+            timeout = TIMEOUT
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Waiting {timeout} seconds for '{end_string}'")
+
+        time_started = time.time()
+
+        while True:
+            if time.time() > time_started + timeout:
+                exception = f"Waiting for '{end_string}' timed out after {self.timeout} seconds"
+                print("[ERR] {}".format(exception))
+                raise Exception(exception)
+            
+            line = self.read_automvs(timeout=timeout)
+            #self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] received {line}")
+
+            kind = self.match_line(line, end_string, start_string, error_string)
+
+            if kind == 'skip':
+                continue
+
+            if kind == 'end':
+                break
+            
+            if kind == 'error':
+                raise Exception(f"Error from {self.ip}:{self.port}: {line}")
+            
+            yield line.strip()
+
+    def read_automvs(self,timeout=False):
+        if not self.socket:
+            raise Exception("Read attempted on closed socket")
+        
+        if not timeout:
+            timeout = self.timeout
+
+        if not timeout:
+            timeout = TIMEOUT
+
+        data = self.__reader().readline(timeout)
+
+        # self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Received {len(data)} bytes: {data.hex()}")
+        _d = data.decode(encoding="ascii", errors="ignore")
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Received: {_d}")
+
+        return _d
+
+    def __hash__(self,password):
+        # Convert the string to EBCDIC bytes
+        ebcdic_bytes = EBCDIC_CODEPAGES['cp037'].encode(password.upper())
+        
+        # Calculate the hash using the EBCDIC bytes
+        hashCode = 0
+        for byte in ebcdic_bytes:
+            hashCode = (hashCode * 31 + byte) & (2**32 - 1)  # unsigned
+        if hashCode & 2**31:
+            hashCode -= 2**32  # make it signed
+        return hashCode
+    
+    def send_automvs(self,command):
+        if not self.socket:
+            self.connect()
+        if self.pipeline_thread:
+            # responses are read from this thread's channel until it sends again
+            channel = getattr(self.local, 'channel', None)
+            if channel is not None:
+                self.__close_channel(channel)
+            self.local.channel = self.__open_channel(command)
+            command = f"#{self.local.channel.tag} {command}\n"
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Sending: {command}")
+        with self.send_lock:
+            self.socket.sendall(command.encode('ascii'))
+
+    def disconnect(self):
+        self.send_automvs("/QUIT")
+        if self.pipeline_thread:
+            self.socket.shutdown(socket.SHUT_RDWR)
+            self.pipeline_thread.join()
+            self.pipeline_thread = None
+        self.socket.close()
+        self.socket = None
+        self.reader = None
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Disconnected")
+
+    def check_ports(self):
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Checking if {self.system} ports are available")
+        self.check_port(self.ip,self.punch_port)
+        self.check_port(self.ip,self.web_port)
+        self.check_port(self.ip,self.port)
+
+    def check_port(self, ip, port):
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Checking {ip}:{port}")
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(2)  # Set a timeout for the connection attempt
+
+    def change_punchcard_output(self,path,are_u_sure=False):
+        '''
+        Changes the punch out device `d` to the specified path
+
+        Args:
+
+            path: str the path for the new punch card
+            are_u_sure: bool since this is remote we only change it if this is true
+        '''
+        if not are_u_sure:
+            self.logger.debug("are_u_sure variable set to False. Not changing punch out location")
+        else:
+            self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Changing 3525 Punchcard output location to: '{path}'")
+            self.send_herc(command='detach d')
+            self.send_herc(command=f'attach d 3525 {path} ebcdic')
+    
+    def __remote_wait_for(self, wait_for_it, timeout=False):
+
+        if not timeout and self.timeout:
+            timeout=self.timeout
+
+        if not timeout:
+            timeout = TIMEOUT
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Waiting for '{wait_for_it}'")
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Waiting {self.timeout} seconds for string to appear in hercules log: {wait_for_it}")
+
+        self.send_automvs(f"{wait_for_it}")
+
+        self.wait_for_socket('--- DONE',timeout=timeout)
+    
+    def wait_for_string(self, string_to_waitfor, stderr=False, timeout=False):
+        self.__remote_wait_for(f"/WAITFOR {string_to_waitfor}",timeout=timeout)
+    
+    def wait_for_job(self, jobname, stderr=False, timeout=False,debug=False):
+        
+        if not timeout:
+            timeout = self.timeout
+
+        if debug or self.loglevel == 'DEBUG':
+            self.__remote_wait_for(f"/JOB {jobname} DEBUG TIMEOUT={timeout}",timeout=timeout)
+        else:
+            self.__remote_wait_for(f"/JOB {jobname} TIMEOUT={timeout}",timeout=timeout)
+    
+    def check_maxcc(self, jobname, steps_cc={}, ignore=False, keep=False):
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Checking {jobname} job results")
+
+        self.send_automvs(f"/JOB {jobname}")
+
+        lines = self.wait_for_socket('--- DONE',start_string='--- Job Results')
+
+        job_status = parse_job_results(lines, self.logger, steps_cc, ignore)
+        self.current_job = {'jobnum': job_status[-1]['jobnum'], 'jobname': job_status[-1]['jobname:']}
+        
+        if not keep:
+            self.purge(self.current_job['jobnum'],self.current_job['jobname'])
+            
+        return(job_status)
+    
+    def purge(self, jobnum=False, jobname=False):
+        self.logger.debug(f"Purging job {jobname} #{jobnum}")
+        self.send_automvs(f"/PURGE {jobnum} {jobname}")
+        self.wait_for_socket('--- DONE')
+
+    def submit_and_check(self, jcl, ebcdic=False, jobname=False, steps_cc={}, ignore=False, keep=False):
+        '''
+        Submits a job, waits for it to end and checks (and unless keep
+        purges) it.
+
+        returns: the check_maxcc() results
+        '''
+        if (ebcdic or not isinstance(jcl, str)) and not jobname:
+            raise Exception("Auto detection of EBCDIC or file JCL jobname not support. Missing jobname=")
+
+        if not jobname:
+            jobname = jcl.split(" ")[0][2:]
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Submitting {jobname}")
+        self.submit(jcl, ebcdic=ebcdic)
+        self.wait_for_job(jobname)
+        return self.check_maxcc(jobname, steps_cc=steps_cc, ignore=ignore, keep=keep)
+
+    def cache_key(self):
+        ''' identifies this system for build_cache '''
+        return f"{self.system.upper()}:{self.ip}:{self.port}"
+
+    def job_tracker(self, port=None, timeout=False, keep=False):
+        '''
+        Returns a remote_job_tracker, jobs are only waited on at the same
+        time if this connection is pipelined
+        '''
+        return remote_job_tracker(self, timeout=timeout, keep=keep, port=port)
+
+
+        
+    def get_file(self,dsn,out_file,timeout=False,progress=None,mode='base64',codepage=None,lrecl=None):
+        '''
+        Using Automvs rexx script get a file
+
+        The file is decoded as it arrives and written straight to out_file,
+        so memory use does not grow with the size of the dataset.
+
+        Args:
+            dsn (str): the dataset (and member) to download
+            out_file (str): path of the file to write, or a writable binary
+                file object
+            progress (function): OPTIONAL called with the total number of
+                bytes written so far after each chunk is written
+            timeout (int): OPTIONAL seconds to wait for the file
+            mode (str): OPTIONAL transfer mode to ask the server for, one of:
+                'base64' (the default) base64 encoded lines
+                'binary' the raw bytes, no base64 overhead
+                'trunc' like binary but trailing blanks are removed from
+                fixed length records before sending and put back here.
+                Best for 80 byte FB datasets. Servers that do not support
+                a mode fall back to base64 or binary.
+            codepage (str): OPTIONAL convert the file to ASCII text with
+                this EBCDIC codepage (see ebcdic_codec) as it is written
+            lrecl (int): OPTIONAL with codepage, write each lrecl byte
+                record as a line with its trailing blanks removed
+
+        returns: the number of bytes received
+        '''
+
+        mode = mode.upper()
+        if mode == 'BASE64':
+            self.send_automvs(f'/FILE {dsn}')
+        else:
+            self.send_automvs(f'/FILE {dsn} {mode}')
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Writing file to: {out_file}")
+
+        if hasattr(out_file, 'write'):
+            output = contextlib.nullcontext(out_file)
+        else:
+            output = open(out_file,'wb')
+
+        with output as binary_out:
+            if codepage:
+                binary_out = ebcdic_text_writer(binary_out, codepage, lrecl)
+            written = self.__receive_file(binary_out, progress, timeout)
+            if codepage:
+                binary_out.close()
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] File Decoded - {written} bytes")
+        return written
+
+    def get_files(self,pattern_or_list,dest_dir,timeout=False,progress=None,mode='base64',codepage=None,lrecl=None):
+        '''
+        Using Automvs rexx script get many files in one round trip
+
+        Args:
+            pattern_or_list (str|list): the datasets to download. Either a
+                list of datasets/dataset(member) or a string with one or
+                more of them separated by spaces. Use pds(*) for every member
+                of a pds or pds(prefix*) for the members starting with prefix.
+            dest_dir (str): folder to write the files to. Sequential datasets
+                are saved with the dataset name, members with the member name
+                in a folder named after the pds, so members of different
+                pds with the same name don't overwrite each other.
+            progress (function): OPTIONAL called with the file name (relative
+                to dest_dir) and the total number of bytes written so far for
+                that file
+            timeout (int): OPTIONAL seconds to wait for each file
+            mode (str): OPTIONAL transfer mode, see get_file()
+            codepage (str): OPTIONAL convert to ASCII, see get_file()
+            lrecl (int): OPTIONAL record length for codepage, see get_file()
+
+        returns: a dict of dataset name to the path it was written to. Datasets
+            the server could not send are logged and left out.
+        '''
+        if not isinstance(pattern_or_list, str):
+            pattern_or_list = ' '.join(pattern_or_list)
+
+        mode = mode.upper()
+        if mode == 'BASE64':
+            self.send_automvs(f'/FILES {pattern_or_list}')
+        else:
+            self.send_automvs(f'/FILES {pattern_or_list} {mode}')
+
+        def next_file(directory=None):
+            # the dataset name from the next '--- File' line, None at '--- DONE'
+            for line in self.iter_socket('--- DONE',start_string='--- Directory',timeout=timeout):
+                if line.startswith('--- File'):
+                    return line.split(None, 2)[2]
+                if directory is not None:
+                    directory.append(line)
+            return None
+
+        directory = []
+        dsn = next_file(directory)
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Receiving {len(directory)} files")
+
+        os.makedirs(dest_dir, exist_ok=True)
+        files = {}
+
+        while dsn:
+            line = self.read_automvs(timeout=timeout)
+            if line.startswith('--- Skipped'):
+                self.logger.error(f"[AUTOMATION: {self.ip}:{self.port}] {line}")
+            else:
+                if '(' in dsn:
+                    pds, member = dsn.rstrip(')').split('(')
+                    name = os.path.join(pds, member)
+                    os.makedirs(os.path.join(dest_dir, pds), exist_ok=True)
+                else:
+                    name = dsn
+                out_file = os.path.join(dest_dir, name)
+                self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Writing {dsn} to: {out_file}")
+                file_progress = (lambda written, name=name: progress(name, written)) if progress else None
+                with open(out_file, 'wb') as binary_out:
+                    if codepage:
+                        binary_out = ebcdic_text_writer(binary_out, codepage, lrecl)
+                    self.__receive_file(binary_out, file_progress, timeout, end_string='--- End', header=line)
+                    if codepage:
+                        binary_out.close()
+                files[dsn] = out_file
+
+            dsn = next_file()
+
+        return files
+
+    def __receive_file(self, binary_out, progress=None, timeout=False, end_string='--- DONE', header=None):
+        '''
+        Reads the '--- Sending ... File' header and then the file in
+        whichever mode the server picked, up to and including end_string.
+        header is the header line if it was already read.
+        '''
+        while True:
+            line = header if header else self.read_automvs(timeout=timeout)
+            header = None
+            if "Error:" in line:
+                raise Exception(f"Error from {self.ip}:{self.port}: {line}")
+            header = self.FILE_HEADER.search(line)
+            if header:
+                break
+
+        mode, lrecl, frame_size = header.groups()
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Receiving {mode} file")
+
+        if mode == 'BASE64':
+            return self.__receive_base64(self.iter_socket(end_string,timeout=timeout), binary_out, progress)
+
+        written = self.__receive_frame(int(frame_size), mode, int(lrecl or 0), binary_out, progress, timeout)
+        return self.__receive_base64(self.iter_socket(end_string,timeout=timeout), binary_out, written=written)
+
+    def __receive_frame(self, frame_size, mode, lrecl, binary_out, progress=None, timeout=False, chunk_size=65536):
+        '''
+        Reads a raw BINARY or TRUNC frame of frame_size bytes from the socket
+        and writes the file to binary_out, see frame_writer
+        '''
+        if not timeout:
+            timeout = self.timeout or TIMEOUT
+
+        frame = frame_writer(mode, lrecl, binary_out, progress)
+        left = frame_size
+
+        while left:
+            chunk = self.__reader().read(min(chunk_size, left), timeout)
+            left -= len(chunk)
+            frame.write(chunk)
+
+        try:
+            return frame.close()
+        except Exception as e:
+            raise Exception(f"Error from {self.ip}:{self.port}: {e}")
+
+    def __receive_base64(self, lines, binary_out, progress=None, chunk_size=65536, written=0):
+        '''
+        Decodes base64 lines as they arrive, see base64_writer. If the server
+        sends a '--- Size:' trailer the number of bytes written is checked
+        against it. written is the number of bytes already written for this
+        file, if any.
+        '''
+        writer = base64_writer(binary_out, progress, chunk_size, written)
+
+        for line in lines:
+            writer.line(line)
+
+        written = writer.close()
+
+        if writer.expected is not None and written != writer.expected:
+            raise Exception(f"Error from {self.ip}:{self.port}: received {written} bytes, expected {writer.expected}")
+
+        return written
+    
+    def put_file(self,source,dsn,recfm='FB',lrecl=80,ebcdic=False,timeout=False,progress=None,chunk_size=32768,codepage='cp037'):
+        '''
+        Using Automvs rexx script write a file to a dataset
+
+        The file is read, converted and sent in chunks so it never has to
+        fit in memory. The dataset must already exist, members are created
+        in an existing pds.
+
+        Args:
+            source (str): path of the file to send, or a readable file object
+            dsn (str): the dataset (and member) to write
+            recfm (str): OPTIONAL record format of the dataset, 'FB' (the
+                default) or 'VB'
+            lrecl (int): OPTIONAL record length of the dataset, default 80
+            ebcdic (bool): OPTIONAL source is already EBCDIC binary data and
+                is split in to lrecl sized records (FB only). Otherwise source
+                is ASCII text, each line becomes a record converted to EBCDIC
+                and, for FB, padded with blanks.
+            codepage (str): OPTIONAL EBCDIC codepage for text, see ebcdic_codec
+            progress (function): OPTIONAL called with the total number of
+                bytes sent so far
+            timeout (int): OPTIONAL seconds to wait for the server
+
+        returns: the number of bytes written to the dataset
+        '''
+        recfm = recfm.upper()
+        if recfm not in ('FB', 'VB'):
+            raise ValueError(f"recfm must be FB or VB: {recfm}")
+        if ebcdic and recfm != 'FB':
+            raise ValueError("EBCDIC source files can only be written to FB datasets")
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Sending {source} to {dsn} RECFM={recfm} LRECL={lrecl}")
+
+        if hasattr(source, 'read'):
+            infile = contextlib.nullcontext(source)
+        else:
+            infile = open(source, 'rb' if ebcdic else 'r')
+
+        sent = 0
+        # nothing else can be sent, even when pipelined, until '--- END'
+        with infile as f, self.send_lock:
+            self.send_automvs(f'/PUT {dsn} RECFM={recfm} LRECL={lrecl}')
+            self.wait_for_socket('--- Ready', timeout=timeout)
+
+            chunk = []
+            chunk_length = 0
+            for record in self.__records(f, recfm, lrecl, ebcdic, codepage):
+                line = base64.b64encode(record) + b"\n"
+                chunk.append(line)
+                chunk_length += len(line)
+                sent += len(record)
+                if chunk_length >= chunk_size:
+                    self.socket.sendall(b''.join(chunk))
+                    chunk = []
+                    chunk_length = 0
+                    if progress:
+                        progress(sent)
+            chunk.append(b"--- END\n")
+            self.socket.sendall(b''.join(chunk))
+            if progress:
+                progress(sent)
+
+        written = sent
+        for line in self.iter_socket('--- DONE', timeout=timeout):
+            if line.startswith('--- Wrote'):
+                written = int(line.split()[2])
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Wrote {written} bytes to {dsn}")
+        return written
+
+    def __records(self, f, recfm, lrecl, ebcdic, codepage='cp037', batch_size=65536):
+        ''' yields the EBCDIC records to send for put_file() '''
+        codec = ebcdic_codec.get(codepage)
+        if ebcdic:
+            for chunk in iter(lambda: f.read(batch_size // lrecl * lrecl), b''):
+                chunk += codec.space * (-len(chunk) % lrecl)
+                yield from codec.split_records(chunk, lrecl)
+            return
+
+        max_length = lrecl if recfm == 'FB' else lrecl - 4
+        # convert a batch of lines at a time
+        for lines in iter(lambda: f.readlines(batch_size), []):
+            lines = [line.rstrip('\r\n') for line in lines]
+            for line in lines:
+                if len(line) > max_length:
+                    raise ValueError(f"Line longer than the {recfm} record length of {lrecl}: {line.strip()}")
+            if recfm == 'FB':
+                yield from codec.split_records(codec.encode_records(lines, lrecl), lrecl)
+            else:
+                data = memoryview(codec.encode(''.join(lines)))
+                pos = 0
+                for line in lines:
+                    yield data[pos:pos + len(line)]
+                    pos += len(line)
+
+    def hercules_web_command(self,command=''):
+        raise Exception("Hercules Web not supported in remote mode")
 
-    def read_log_lines(self):
-        #self.logger.debug(f"reading {self.logfile}")
-        with open(self.logfile, "r",errors='ignore') as file:
-            # Check if the last_size attribute exists in the instance
-            if not hasattr(self, 'log_last_size'):
-                # If not, initialize it to 0
-                self.log_last_size = 0
-            
-            # Move the cursor to the last known position
-            file.seek(self.log_last_size)
-            
-            # Read new lines
-            new_lines = file.readlines()
+    def send_herc(self, command='uptime'):
+        ''' Sends hercules commands '''
+        self.logger.debug(f"[AUTOMATION: {self.ip}] Sending Hercules Command: {command}")
+        self.send_automvs(f'/HERCULES {command}')
+        self.wait_for_socket('--- DONE')       
 
-            for line in new_lines:
-                self.logger.debug(f"[LOG] {line.strip()}")
-            
-            # Update the last known file size
-            self.log_last_size = file.tell()
-            #self.logger.debug(f"returning {len(new_lines)} lines")
-            return new_lines
 
-    
-    def read_prt_lines(self):
-        #self.logger.debug(f"reading {self.logfile}")
-        with open(self.printer, "r",errors='ignore') as file:
-            # Check if the last_size attribute exists in the instance
-            if not hasattr(self, 'prt_last_size'):
-                # If not, initialize it to 0
-                self.prt_last_size = 0
-            
-            # Move the cursor to the last known position
-            file.seek(self.prt_last_size)
-            
-            # Read new lines
-            new_lines = file.readlines()
+    def send_oper(self, command=''):
+        ''' Sends operator/console commands (i.e. prepends /) '''
+        self.logger.debug(f"[AUTOMATION: {self.ip}] Sending Operator command: /{command}")
+        self.send_automvs(f'/OPER {command}')
+        self.wait_for_socket('--- DONE')   
 
-            # if self.prt_last_size > 0 :
-            #     for line in new_lines:
-            #         self.logger.debug(f"[PRT] {line.strip()}")
-            
-            # Update the last known file size
-            self.prt_last_size = file.tell()
-            #self.logger.debug(f"returning {len(new_lines)} lines")
-            return new_lines
+    def submit(self,jcl, ebcdic=False, port=None, codepage='cp037'):
+        self.logger.debug(f"[AUTOMATION: {self.ip}] Submitting JCL host={self.ip} port={self.punch_port} EBCDIC={ebcdic}")
+        #print(jcl)
 
-    def check_maxcc(self, jobname, steps_cc={},ignore=False):
-        self.logger.debug(f"[AUTOMATION: {self.system}] Checking {jobname} job results")
+        if not port:
+            port = self.punch_port 
 
-        found_job = False
-        failed_step = False
-        job_status = []
-        log = None
+        return send_deck(self.ip, port, jcl, ebcdic, codepage=codepage)
 
-        logmsg = '[MAXCC] Jobname: {:<8} Procname: {:<8} Stepname: {:<8} Progname: {:<8} Exit Code: {:<8}'
-        for line in self.read_prt_lines():
-            #print(line.strip())
-            if 'IEF403I' in line and f' {jobname} ' in line:
-                found_job = True
-                continue
-            
+class async_mvs(mvs):
+    '''
+    asyncio version of mvs, takes the same arguments.
+
+    hercules runs in the event loop that calls reset_hercules() (or ipl())
+    and tasks in that loop read its console, no threads are started, so
+    dozens of MVS/CE can be driven from one loop. reset_hercules(),
+    quit_hercules(), ipl(), shutdown_mvs(), send_herc(), send_oper(),
+    send_reply(), wait_for_string(), wait_for_strings(), wait_for_job(),
+    submit(), check_maxcc(), submit_and_check(), change_punchcard_output()
+    and restore() are coroutines. Run many jobs with asyncio.gather()
+    instead of job_tracker() or submit_many().
+    '''
 
-            if ('IEF404I' in line or 'IEF453I' in line) and jobname in line:
-                break
+    def __init__(self, *args, **kwargs):
+        kwargs['backend'] = 'asyncio'
+        super().__init__(*args, **kwargs)
+        self.stdout_q = asyncio.Queue()
+        self.stderr_q = asyncio.Queue()
 
-            if found_job and f' {jobname} ' in line and ' ABEND ' not in line:
+    async def reset_hercules(self,clpa=False):
+        self.logger.debug('[AUTOMATION: MVS/CE] Restarting hercules')
+        await self.quit_hercules(msg=False)
+        h = self.prepare_hercules(clpa)
+        self.reset_herc_event.clear()
+        self.quit_herc_event.clear()
+        self.hercproc = await self.spawn_hercules(h)
+        self.logger.debug("[AUTOMATION: MVS/CE] Hercules launched")
 
-                x = line.strip().split()
-                #y = x.index('IEF142I')
-                j = x[3:]
-                #print(j)
-                if len(j) == 5:
-                    log = logmsg.format(j[0],'',j[1],j[2],j[4])
-                    step_status = {
-                                    "jobname:" : j[0],
-                                    "procname": '',
-                                    "stepname": j[1],
-                                    "progname": j[2],
-                                    "exitcode": j[4]
-                                }
-                    maxcc=j[4]
-                    stepname = j[1]
+    async def quit_hercules(self, msg=True):
+        if msg:
+            self.logger.debug("[AUTOMATION: MVS/CE] Shutting down hercules")
+        if not self.hercules_running():
+            self.logger.debug("[AUTOMATION: MVS/CE] Hercules already shutdown")
+            return
+        self.quit_herc_event.set()
+        await self.send_herc('quit')
+        await self.wait_for_string('Hercules shutdown complete', stderr=True)
+        await self.hercproc.wait()
+        if msg:
+            self.logger.debug('[AUTOMATION: MVS/CE] Hercules has exited')
 
-                elif len(j) == 6:
-                    log = logmsg.format(j[0],j[2],j[1],j[3],j[5])
-                    step_status = {
-                                    "jobname:" : j[0],
-                                    "procname": j[2],
-                                    "stepname": j[1],
-                                    "progname": j[3],
-                                    "exitcode": j[5]
-                                }
-                    stepname = j[3]
-                    maxcc=j[5]
+    async def wait_for_job(self, jobname, stderr=False, timeout=False):
+        await self.wait_for_string("HASP250 {:<8} IS PURGED".format(jobname),stderr=stderr, timeout=timeout)
 
-                elif len(j) == 4:
-                    log = logmsg.format(j[0],'',j[1],j[2],j[3])
-                    step_status = {
-                                    "jobname:" : j[0],
-                                    "procname": '',
-                                    "stepname": j[1],
-                                    "progname": j[2],
-                                    "exitcode": j[3]
-                                }
-                    maxcc=j[3]
-                    stepname = j[1]
+    async def wait_for_string(self, string_to_waitfor, stderr=False, timeout=False):
+        await self.__wait_for_console([string_to_waitfor], stderr=stderr, timeout=timeout)
 
-                self.logger.debug(log)
-                job_status.append(step_status)
+    async def wait_for_strings(self, strings_to_waitfor, stderr=False, timeout=False):
+        return await self.__wait_for_console(strings_to_waitfor, stderr=stderr, timeout=timeout)
 
-                if stepname in steps_cc:
-                    expected_cc = steps_cc[stepname]
+    async def __wait_for_console(self, strings_to_waitfor, stderr=False, timeout=False):
+        ''' returns the string found, raises on timeout or if hercules exits '''
+        if not timeout and self.timeout:
+            timeout=self.timeout
+
+        if not timeout:
+            timeout = TIMEOUT
+
+        self.logger.debug("[AUTOMATION: MVS/CE] Waiting {} seconds for string to appear in hercules log: {}".format(timeout,strings_to_waitfor))
+
+        q = self.stderr_q if stderr else self.stdout_q
+        pending = self.stderr_pending if stderr else self.stdout_pending
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        while True:
+            if pending:
+                line = pending.popleft()
+                for word in strings_to_waitfor:
+                    if word in line:
+                        return word
+                continue
+
+            remaining = deadline - loop.time()
+            try:
+                batch = await asyncio.wait_for(q.get(), max(remaining, 0))
+            except asyncio.TimeoutError:
+                if len(strings_to_waitfor) == 1:
+                    exception = "Waiting for '{}' timed out after {} seconds".format(strings_to_waitfor[0], timeout)
                 else:
-                    expected_cc = '0000'
+                    exception = "Waiting for one of '{}' timed out after {} seconds".format(strings_to_waitfor, timeout)
+                print("[AUTOMATION: MVS/CE] {}".format(exception))
+                raise Exception(exception)
 
-                if maxcc != expected_cc:
-                    error = "[MAXCC] Step {} Condition Code does not match expected condition code: {} vs {} review prt00e.txt for errors".format(stepname,j[-1],expected_cc)
-                    if ignore:
-                        self.logger.debug(error)
-                    else:
-                        self.logger.error(error)
-                    failed_step = True
+            if batch is None:
+                # hercules is gone, leave the marker for the next waiter
+                q.put_nowait(None)
+                raise self.hercules_exit
 
-        if not found_job:
-            raise ValueError("Job {} not found in printer output {}".format(jobname, self.printer))
+            pending.extend(batch)
 
-        if failed_step and not ignore:
-            self.logger.error(f"Job Failed with maxcc: {maxcc}")
-            print_maxcc(job_status)
-            raise ValueError(error)
-            
-        return(job_status)
+    def job_tracker(self, *args, **kwargs):
+        raise Exception("job_tracker() is not available with async_mvs, use asyncio.gather() on submit_and_check()")
 
-    def hercules_web_command(self,command=''):
-        
-        cmd = f"/cgi-bin/tasks/syslog?command=" + urllib.parse.quote(command)
-        conn = http.client.HTTPConnection(self.ip, self.web_port)
-        conn.request("GET", cmd)
-        response = conn.getresponse()
-        conn.close()
+    def submit_many(self, *args, **kwargs):
+        raise Exception("submit_many() is not available with async_mvs, use asyncio.gather() on submit_and_check()")
 
-    def send_herc(self, command=''):
+    async def ipl(self, step_text='', clpa=False):
+        self.logger.debug(step_text)
+        await self.reset_hercules(clpa=clpa)
+
+        if clpa:
+            await self.send_herc("ipl 150")
+            await self.wait_for_string("input for console 0:0009")
+            await self.send_oper("r 0,clpa")
+        await self.wait_for_string("IKT005I TCAS IS INITIALIZED")
+
+    async def shutdown_mvs(self, cust=False):
+        self.logger.debug("[AUTOMATION: MVS/CE] Shutting down MVS")
+        await self.send_oper('$PJES2,ABEND')
+        await self.wait_for_string("00 $HASP098 ENTER TERMINATION OPTION")
+        await self.send_oper("r 00,PURGE")
+        if cust:
+            await self.wait_for_string('IEF404I JES2 - ENDED - ')
+        else:
+            await self.wait_for_string('IEF196I IEF285I   VOL SER NOS= SPOOL0.')
+        await self.send_oper('z eod')
+        await self.wait_for_string('IEE334I HALT     EOD SUCCESSFUL')
+        await self.send_oper('quiesce')
+        await self.wait_for_string("disabled wait state")
+        await self.send_herc('stop')
+
+    async def send_herc(self, command=''):
         ''' Sends hercules commands '''
-        self.logger.debug(f"[AUTOMATION: {self.system}] Sending Hercules Command: {command}")
-        self.hercules_web_command(command)
+        self.logger.debug("[AUTOMATION: MVS/CE] Sending Hercules Command: {}".format(command))
+        await self.write_herc(command)
 
-    def send_oper(self, command=''):
+    async def send_oper(self, command=''):
         ''' Sends operator/console commands (i.e. prepends /) '''
-        self.logger.debug(f"[AUTOMATION: {self.system}] Sending Operator command: /{command}")
-        self.send_herc(f"/{command}")
-    
-    def check_ports(self):
-        self.logger.debug(f"[AUTOMATION: {self.system}] Checking if {self.system} ports are available")
-        self.check_port(self.ip,self.punch_port)
-        self.check_port(self.ip,self.web_port)
+        self.logger.debug("[AUTOMATION: MVS/CE] Sending Operator command: /{}".format(command))
+        await self.send_herc("/{}".format(command))
 
-    def check_port(self, ip, port):
-        self.logger.debug(f"[AUTOMATION: {self.system}] Checking {ip}:{port}")
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(2)  # Set a timeout for the connection attempt
+    async def send_reply(self, command=''):
+        ''' Sends operator/console commands with automated number '''
+        self.logger.debug("[AUTOMATION: MVS/CE] Sending reply: /r {},{}".format(self.reply_num,command))
+        await self.send_herc("/r {},{}".format(self.reply_num,command))
+
+    async def submit(self,jcl, host='127.0.0.1',port=None, ebcdic=False, codepage='cp037'):
+        if not port:
+            port = self.punch_port
+        self.logger.debug("[AUTOMATION: MVS/CE] Submitting JCL host={} port={} EBCDIC={}".format(host,port,ebcdic))
+        return await async_send_deck(host, port, jcl, ebcdic, codepage=codepage)
+
+    async def check_maxcc(self, jobname, steps_cc={}, printer_file='printers/prt00e.txt',ignore=False, jobnum=None):
+        # reading the printer file blocks, keep it off the event loop
+        return await asyncio.to_thread(super().check_maxcc, jobname, steps_cc=steps_cc, printer_file=printer_file, ignore=ignore, jobnum=jobnum)
+
+    async def submit_and_check(self, jcl, host='127.0.0.1',port=None, ebcdic=False, jobname=False, steps_cc={}, ignore=False):
+        if (ebcdic or not isinstance(jcl, str)) and not jobname:
+            raise Exception("Auto detection of EBCDIC or file JCL jobname not support. Missing jobname=")
+
+        if not jobname:
+            jobname = jcl.split(" ")[0][2:]
+
+        self.logger.debug("[AUTOMATION: MVS/CE] Submitting {}".format(jobname))
+        await self.submit(jcl, host=host,port=port, ebcdic=ebcdic)
+        await self.wait_for_job(jobname)
+        return await self.check_maxcc(jobname, steps_cc=steps_cc, ignore=ignore)
+
+    async def change_punchcard_output(self,path):
+        self.logger.debug("[AUTOMATION: MVS/CE] Changing 3525 Punchcard output location to: '{}'".format(path))
+        path = self.mvsce_path(path)
+        if not os.path.exists(os.path.dirname(path)):
+            raise Exception("Punchcard folder '{}' does no exist".format(path))
+        await self.send_herc(command='detach d')
+        await self.send_herc(command='attach d 3525 {} ebcdic'.format(path))
+        self.punch_path = path
+
+    async def restore(self, name):
+        await self.quit_hercules()
+        super().restore(name)
+
+class async_turnkey(turnkey):
+    '''
+    asyncio version of turnkey, takes the same arguments.
+
+    submit(), wait_for_string(), wait_for_strings(), wait_for_job(),
+    check_maxcc(), send_herc() and send_oper() are coroutines so hundreds
+    of jobs can be watched from one event loop. A single task follows the
+    hardcopy log for as long as anything is waiting on it and hands each
+    new line to every wait, and the printer output is split up by job so
+    check_maxcc() works with many jobs running at once.
+
+    Like turnkey, a wait only sees log lines that hadn't been read when it
+    started, except wait_for_job() which sees every line since the job
+    was submitted, so a job purged before anything waited on it is found.
+    '''
+
+    RECENT_LINES = 1000 # log lines kept for wait_for_job() after they were read
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiters = [] # (strings, future) of the running waits
+        self.follower = None
+        self.log_seq = 0 # number of log lines read so far
+        self.recent = collections.deque(maxlen=self.RECENT_LINES) # (seq, line)
+        self.submitted = {} # jobname: log_seq when it was submitted
+
+    async def submit(self,jcl, ebcdic=False, port=None, codepage='cp037'):
+        return await self.__submit(jcl, ebcdic=ebcdic, port=port, codepage=codepage)
+
+    async def __submit(self, jcl, ebcdic=False, port=None, codepage='cp037', jobname=None):
+        ''' submit(), jobname is the job to wait for if it isn't in a JCL string '''
+        self.logger.debug(f"[AUTOMATION: {self.system}] Submitting JCL host={self.ip} port={self.punch_port} EBCDIC={ebcdic}")
+
+        # establish baseline, anything already waiting still sees these lines
+        self.__dispatch(self.read_log_lines())
+        self.index_prt_lines()
+        jobnames = {jobname.upper()} if jobname else set()
+        if isinstance(jcl, (str, bytes)):
+            jobnames.update(name.upper() for name in self.JOB_CARD.findall(jcl if isinstance(jcl, str) else EBCDIC_CODEPAGES['cp037'].decode(jcl) if ebcdic else jcl.decode('latin-1')))
+        for name in jobnames:
+            self.drop_prt_jobs(name)
+            # wait_for_job() looks from here, not at an earlier run
+            self.submitted[name] = self.log_seq
+
+        if not port:
+            port = self.punch_port 
+
+        return await async_send_deck(self.ip, port, jcl, ebcdic, codepage=codepage)
+
+    async def wait_for_string(self,string_to_waitfor):
+        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting {self.timeout} seconds for string to appear in hercules log: {string_to_waitfor}")
+
+        if not await self.__wait_for_log([string_to_waitfor]):
+            exception = f"Waiting for '{string_to_waitfor}' timed out after {self.timeout} seconds"
+            print("[ERR] {}".format(exception))
+            raise Exception(exception)
+
+    async def wait_for_strings(self,strings_to_waitfor):
+        '''
+        Unlike string to wait for this function takes a list of strings and returns when any of them hit
+        '''
+        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting {self.timeout} seconds for strings to appear in hercules log: {strings_to_waitfor}")
+
+        word = await self.__wait_for_log(strings_to_waitfor)
+        if not word:
+            exception = f"Waiting for any of the strings timed out after {self.timeout} seconds"
+            print("[ERR] {}".format(exception))
+            raise Exception(exception)
+        return word
+
+    async def wait_for_job(self, jobname):
+        string = "HASP250 {:<8} IS PURGED".format(jobname)
+        self.logger.debug(f"[AUTOMATION: {self.system}] Waiting {self.timeout} seconds for string to appear in hercules log: {string}")
+
+        # the job may have been purged while we were waiting on something else
+        since = self.submitted.pop(jobname.upper(), None)
+        if not await self.__wait_for_log([string], since):
+            exception = f"Waiting for '{string}' timed out after {self.timeout} seconds"
+            print("[ERR] {}".format(exception))
+            raise Exception(exception)
+
+    async def __wait_for_log(self, strings_to_waitfor, since=None):
+        '''
+        returns the string found, or None on timeout. Lines already read
+        are only looked at if since is set, from the since'th one on.
+        '''
+        if since is not None:
+            for seq, line in self.recent:
+                if seq < since:
+                    continue
+                for word in strings_to_waitfor:
+                    if word in line:
+                        return word
+
+        waiter = (strings_to_waitfor, asyncio.get_running_loop().create_future())
+        self.waiters.append(waiter)
+        if self.follower is None or self.follower.done():
+            self.follower = asyncio.create_task(self.__follow())
 
         try:
-            # Attempt to connect to the IP address and port
-            result = sock.connect_ex((ip, port))
-            if result == 0:
-                self.logger.debug(f"[AUTOMATION: {self.system}] Port {port} is open")
-            else:
-                self.logger.debug(f"[AUTOMATION: {self.system}] Port {port} is closed")
-                raise Exception(f"Port {port} is not available, is TK5 running?")
-        except Exception as e:
-            raise Exception(f"Error checking port {port}: {e}")
+            return await asyncio.wait_for(waiter[1], self.timeout)
+        except asyncio.TimeoutError:
+            return None
         finally:
-            # Close the socket
-            sock.close()
+            self.waiters.remove(waiter)
+
+    async def __follow(self):
+        ''' reads the hardcopy log for as long as something is waiting on it '''
+        watch = self.log_tail.watch
+        while self.waiters:
+            lines = self.read_log_lines()
+            if lines:
+                watch.reset()
+                self.__dispatch(lines)
+            else:
+                await watch.async_wait(watch.MAX_INOTIFY_WAIT)
 
-    def jobcard(self, jobname, title, jclass='A', msgclass='A'):
+    def __dispatch(self, lines):
+        for line in lines:
+            self.recent.append((self.log_seq, line))
+            self.log_seq += 1
+            for strings, future in self.waiters:
+                if future.done():
+                    continue
+                for word in strings:
+                    if word in line:
+                        future.set_result(word)
+                        break
+
+    async def check_maxcc(self, jobname, steps_cc={},ignore=False):
+        self.logger.debug(f"[AUTOMATION: {self.system}] Checking {jobname} job results")
+        self.index_prt_lines()
+        return self.parse_maxcc(jobname, self.pop_prt_job(jobname), steps_cc, ignore)
+
+    async def submit_and_check(self, jcl, ebcdic=False, jobname=False, steps_cc={}, ignore=False):
         '''
-        This function generates the jobcard needed to submit the jobs
+        Submits a job, waits for it to be purged and checks the results.
+
+        returns: the check_maxcc() results
         '''
+        if (ebcdic or not isinstance(jcl, str)) and not jobname:
+            raise Exception("Auto detection of EBCDIC or file JCL jobname not support. Missing jobname=")
+
+        if not jobname:
+            jobname = jcl.split(" ")[0][2:]
+
+        self.logger.debug(f"[AUTOMATION: {self.system}] Submitting {jobname}")
+        await self.__submit(jcl, ebcdic=ebcdic, jobname=jobname)
+        await self.wait_for_job(jobname)
+        return await self.check_maxcc(jobname, steps_cc=steps_cc, ignore=ignore)
+
+    def job_tracker(self, *args, **kwargs):
+        raise Exception("job_tracker() is not available with async_turnkey, use asyncio.gather() on submit_and_check()")
+
+    async def change_punchcard_output(self,path):
+        self.logger.debug(f"[AUTOMATION: {self.system}] Changing 3525 Punchcard output location to: '{path}'")
+        if not os.path.exists(os.path.dirname(path)): 
+            self.logger.debug(f"[AUTOMATION: {self.system}] Punchcard folder '{path}' does not exist")
+            raise Exception("Punchcard folder '{}' does not exist".format(path))
+        await self.send_herc(command='detach d')
+        await self.send_herc(command='attach d 3525 {} ebcdic'.format(path))
+        self.punch_path = os.path.join(self.mvs_path, path)
 
-        jobcard = ( 
-                  "//{jobname} JOB (BREXX),'{title}'," +
-                  "//       CLASS={jclass},MSGCLASS={msgclass}, " +
-                  "//       REGION=8M,MSGLEVEL=(1,1),USER={user},PASSWORD={password} " +
-                  "//********************************************************************\n"
-                  )
+    async def hercules_web_command(self,command=''):
+        cmd = f"/cgi-bin/tasks/syslog?command=" + urllib.parse.quote(command)
+        reader, writer = await asyncio.open_connection(self.ip, self.web_port)
+        try:
+            writer.write(f"GET {cmd} HTTP/1.0\r\nHost: {self.ip}:{self.web_port}\r\n\r\n".encode())
+            await writer.drain()
+            await reader.read()
+        finally:
+            writer.close()
+            await writer.wait_closed()
 
-        return jobcard.format(
-            jobname=jobname.upper(),
-            title=title,
-            jclass=jclass,
-            msgclass=msgclass,
-            user=self.username.upper(),
-            password=self.password.upper()
-            )
+    async def send_herc(self, command=''):
+        ''' Sends hercules commands '''
+        self.logger.debug(f"[AUTOMATION: {self.system}] Sending Hercules Command: {command}")
+        await self.hercules_web_command(command)
 
-    def test(self,times=5):
-        t = ''
-        for i in range(1,times):
-            t += f"//TEST{i} EXEC PGM=IEFBR14\n"
+    async def send_oper(self, command=''):
+        ''' Sends operator/console commands (i.e. prepends /) '''
+        self.logger.debug(f"[AUTOMATION: {self.system}] Sending Operator command: /{command}")
+        await self.send_herc(f"/{command}")
 
-        proc = "//TSTPROC      PROC\n//TESTPROC  EXEC  PGM=IEFBR14\n// PEND\n"
-        p = ''
-        for i in range(1,times):
-            p += f"//TST{i}     EXEC TSTPROC\n"
+class async_remote_mvs:
+    '''
+    asyncio version of remote_mvs.
 
-        self.submit(self.jobcard('test','test job')+t+proc+p)
-        self.wait_for_string("$HASP250 TEST     IS PURGED")
-        results = self.check_maxcc('TEST')
-        self.logger.debug("TEST Completed Succesfully")
-        print_maxcc(results)
-        self.send_herc('/$da')
-        self.send_oper('$da')
+    Every command is tagged (see the AUTOMVS README) so any number of
+    commands, e.g. hundreds of wait_for_job(), can be running at once on
+    one connection from one event loop. Create it then await connect(), or
+    use async with. Needs an AUTOMVS server that supports tagged commands.
+    '''
 
-class remote_mvs:
+    FILE_HEADER = remote_mvs.FILE_HEADER
 
     def __init__(self,
                  system="TK5", 
@@ -1004,16 +4544,23 @@ class remote_mvs:
                  username='HERC01',
                  password='CUL8TR'
                 ):
-        
+
         self.system = system
         self.ip = ip
         self.port = automvs_port
+        self.punch_port = punch_port
+        self.web_port = web_port
         self.timeout = timeout
         self.username = username
         self.password = password
-        self.socket = None
         self.loglevel = logging.getLevelName(loglevel)
-        self.current_job = {} # dict with jobname and jobnum
+        self.reader = None
+        self.writer = None
+        self.demux_task = None
+        self.send_lock = None
+        self.channels = {} # tag: asyncio.Queue of its responses
+        self.file_tags = set() # tags of /FILE and /FILES commands still being answered
+        self.last_tag = 0
 
         # Create the Logger
         self.logger = logging.getLogger(__name__)
@@ -1028,305 +4575,269 @@ class remote_mvs:
         if not self.logger.hasHandlers():
             self.logger.addHandler(ch)
 
-        self.punch_port = punch_port
-        self.web_port = web_port
+    async def __aenter__(self):
+        await self.connect()
+        return self
 
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Starting Automation")
-        self.check_ports()
-        self.connect()
+    async def __aexit__(self, *exc):
+        await self.disconnect()
 
-    def connect(self):
+    async def connect(self):
         self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Connecting to {self.ip}:{self.port}")
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.connect((self.ip, int(self.port)))
-        
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Connection done")
-
-        self.wait_for_socket('Please /LOGON to continue',timeout=5)
-
-        self.send_automvs("/LOGON {user} {passw}".format(user=self.username,passw=self.__hash__(self.password)))
-
-        self.wait_for_socket('LOGON OK',error_string='Logon Failed:')
-        
+        self.reader, self.writer = await asyncio.open_connection(self.ip, int(self.port))
+        self.send_lock = asyncio.Lock()
 
+        await self.__wait_untagged('Please /LOGON to continue', timeout=5)
+        self.writer.write("/LOGON {user} {passw}".format(user=self.username,passw=remote_mvs.__hash__(self, self.password)).encode('ascii'))
+        await self.writer.drain()
+        await self.__wait_untagged('LOGON OK', error_string='Logon Failed:')
 
-    def wait_for_socket(self,end_string,start_string=False, error_string="Error:",timeout=False):
-
-        if not timeout:
-            timeout = self.timeout
-        if not timeout:
-            timeout = TIMEOUT
-
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Waiting {timeout} seconds for '{end_string}'")
+        self.demux_task = asyncio.create_task(self.__demux())
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Connection done")
 
-        collector = []
-        time_started = time.time()
+    async def disconnect(self):
+        if not self.writer:
+            return
+        self.writer.write(b"/QUIT\n")
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        if self.demux_task:
+            await self.demux_task
+        self.reader = self.writer = self.demux_task = None
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Disconnected")
 
+    async def __wait_untagged(self, end_string, error_string="Error:", timeout=False):
+        ''' waits for end_string before the connection is pipelined '''
+        timeout = timeout or self.timeout or TIMEOUT
         while True:
-            if time.time() > time_started + timeout:
-                exception = f"Waiting for '{end_string}' timed out after {self.timeout} seconds"
-                print("[ERR] {}".format(exception))
-                raise Exception(exception)
-            
-            line = self.read_automvs(timeout=timeout)
-            #self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] received {line}")
-
-            if '*JOBLOG*' in line:
-                continue
-
-            if start_string and start_string in line:
-                continue
-
+            line = await asyncio.wait_for(self.reader.readline(), timeout)
+            if not line:
+                raise ConnectionError("Connection closed by remote host")
+            line = line.decode(encoding="ascii", errors="ignore")
+            self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Received: {line.strip()}")
             if end_string in line:
-                break
-            
+                return
             if error_string in line:
                 raise Exception(f"Error from {self.ip}:{self.port}: {line}")
-            
-            collector.append(line.strip())
-        
-        return collector
-
-    def read_automvs(self,timeout=False):
-        if not self.socket:
-            raise Exception("Read attempted on closed socket")
-        
-        if not timeout:
-            timeout = self.timeout
-
-        if not timeout:
-            timeout = TIMEOUT
-
-        data = b""
 
+    async def __demux(self):
+        '''
+        Hands each tagged line, and the raw file data after a BINARY or
+        TRUNC header, to the command with the same tag.
+        '''
         try:
-            self.socket.setblocking(0)  # Set non-blocking mode
-            data = b""
             while True:
-                ready = select.select([self.socket], [], [], timeout)
-                if len(ready[0]) == 0:
-                    raise TimeoutError("Receive timeout")
-                
-                byte = self.socket.recv(1)
-                if byte == b"\n":
+                line = await self.reader.readline()
+                if not line:
                     break
-                data += byte
-                
-            # self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Received {len(data)} bytes: {data.hex()}")
-            _d = data.decode(encoding="ascii", errors="ignore")
-            self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Received: {_d}")
-            
-            return data.decode(encoding="ascii", errors="ignore")
-        except BlockingIOError:
-            return ""
-        finally:
-            self.socket.setblocking(1) 
+                line = line.rstrip(b'\n')
+                self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Received: {line.decode(encoding='ascii', errors='ignore')}")
 
-        # while char != b"\n":
-        #     char = self.socket.recv(1)
-        #     data = data + char
-        # data = data.decode().strip()
+                if not line.startswith(b'#'):
+                    continue
 
-        # return data
+                tag, _, data = line[1:].partition(b' ')
+                tag = tag.decode(encoding="ascii", errors="ignore")
+                text = data.decode(encoding="ascii", errors="ignore")
+                channel = self.channels.get(tag)
+                if channel is not None:
+                    channel.put_nowait(('line', text))
+
+                # only file commands are followed by raw data
+                file_data = tag in self.file_tags
+                if file_data and remote_mvs.file_response_done(text):
+                    self.file_tags.discard(tag)
+                header = self.FILE_HEADER.search(text) if file_data else None
+                if header and header.group(3):
+                    # the raw file data follows its header straight away
+                    left = int(header.group(3))
+                    while left:
+                        chunk = await self.reader.read(min(socket_reader.BUFFER_SIZE, left))
+                        if not chunk:
+                            raise ConnectionError("Connection closed by remote host")
+                        left -= len(chunk)
+                        if channel is not None:
+                            channel.put_nowait(('frame', chunk))
+        except (ConnectionError, OSError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            for channel in self.channels.values():
+                channel.put_nowait(None)
+
+    async def __send(self, command):
+        ''' sends a tagged command, returns the tag and the queue its responses go to '''
+        if not self.writer:
+            await self.connect()
+        self.last_tag += 1
+        tag = str(self.last_tag)
+        channel = asyncio.Queue()
+        self.channels[tag] = channel
+        if remote_mvs.file_command(command):
+            self.file_tags.add(tag)
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Sending: #{tag} {command}")
+        async with self.send_lock:
+            self.writer.write(f"#{tag} {command}\n".encode('ascii'))
+            await self.writer.drain()
+        return tag, channel
+
+    async def __get(self, channel, kind, timeout):
+        try:
+            item = await asyncio.wait_for(channel.get(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Receive timeout")
+        if item is None:
+            channel.put_nowait(None)
+            raise ConnectionError("Connection closed by remote host")
+        if item[0] != kind:
+            raise ConnectionError(f"Expected {kind}, received {item[0]}")
+        return item[1]
+
+    async def __lines(self, channel, end_string, start_string=False, error_string="Error:", timeout=False):
+        ''' yields the lines for a command up to end_string, see remote_mvs.iter_socket() '''
+        timeout = timeout or self.timeout or TIMEOUT
+        deadline = time.monotonic() + timeout
 
-    def __hash__(self,password):
-        # Convert the string to EBCDIC bytes
-        ebcdic_bytes = codecs.encode(password.upper(), 'cp037')
-        
-        # Calculate the hash using the EBCDIC bytes
-        hashCode = 0
-        for byte in ebcdic_bytes:
-            hashCode = (hashCode * 31 + byte) & (2**32 - 1)  # unsigned
-        if hashCode & 2**31:
-            hashCode -= 2**32  # make it signed
-        return hashCode
-    
-    def send_automvs(self,command):
-        if not self.socket:
-            self.connect()
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Sending: {command}")
-        self.socket.sendall(command.encode('ascii'))
+        while True:
+            try:
+                line = await self.__get(channel, 'line', deadline - time.monotonic())
+            except TimeoutError:
+                exception = f"Waiting for '{end_string}' timed out after {timeout} seconds"
+                print("[ERR] {}".format(exception))
+                raise Exception(exception)
 
-    def disconnect(self):
-        self.send_automvs("/QUIT")
-        self.socket.close()
-        self.socket = None
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Disconnected")
+            kind = remote_mvs.match_line(line, end_string, start_string, error_string)
 
-    def check_ports(self):
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Checking if {self.system} ports are available")
-        self.check_port(self.ip,self.punch_port)
-        self.check_port(self.ip,self.web_port)
-        self.check_port(self.ip,self.port)
+            if kind == 'skip':
+                continue
 
-    def check_port(self, ip, port):
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Checking {ip}:{port}")
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(2)  # Set a timeout for the connection attempt
+            if kind == 'end':
+                return
 
-    def change_punchcard_output(self,path,are_u_sure=False):
-        '''
-        Changes the punch out device `d` to the specified path
+            if kind == 'error':
+                raise Exception(f"Error from {self.ip}:{self.port}: {line}")
 
-        Args:
+            yield line.strip()
 
-            path: str the path for the new punch card
-            are_u_sure: bool since this is remote we only change it if this is true
+    async def command(self, command, end_string='--- DONE', start_string=False, error_string="Error:", timeout=False):
         '''
-        if not are_u_sure:
-            self.logger.debug("are_u_sure variable set to False. Not changing punch out location")
-        else:
-            self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Changing 3525 Punchcard output location to: '{path}'")
-            self.send_herc(command='detach d')
-            self.send_herc(command=f'attach d 3525 {path} ebcdic')
-    
-    def __remote_wait_for(self, wait_for_it, timeout=False):
-
-        if not timeout and self.timeout:
-            timeout=self.timeout
-
-        if not timeout:
-            timeout = TIMEOUT
-
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Waiting for '{wait_for_it}'")
-
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Waiting {self.timeout} seconds for string to appear in hercules log: {wait_for_it}")
+        Sends an AUTOMVS command and returns the lines sent back, like
+        remote_mvs.wait_for_socket()
+        '''
+        tag, channel = await self.__send(command)
+        try:
+            return [line async for line in self.__lines(channel, end_string, start_string, error_string, timeout)]
+        finally:
+            self.channels.pop(tag, None)
 
-        self.send_automvs(f"{wait_for_it}")
+    async def wait_for_string(self, string_to_waitfor, stderr=False, timeout=False):
+        await self.command(f"/WAITFOR {string_to_waitfor}", timeout=timeout)
 
-        self.wait_for_socket('--- DONE',timeout=timeout)
-    
-    def wait_for_string(self, string_to_waitfor, stderr=False, timeout=False):
-        self.__remote_wait_for(string_to_waitfor,timeout=timeout)
-    
-    def wait_for_job(self, jobname, stderr=False, timeout=False,debug=False):
-        
+    async def wait_for_job(self, jobname, stderr=False, timeout=False, debug=False):
         if not timeout:
             timeout = self.timeout
 
         if debug or self.loglevel == 'DEBUG':
-            self.__remote_wait_for(f"/JOB {jobname} DEBUG TIMEOUT={timeout}",timeout=timeout)
+            await self.command(f"/JOB {jobname} DEBUG TIMEOUT={timeout}", timeout=timeout)
         else:
-            self.__remote_wait_for(f"/JOB {jobname} TIMEOUT={timeout}",timeout=timeout)
-    
-    def check_maxcc(self, jobname, steps_cc={}, ignore=False, keep=False):
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Checking {jobname} job results")
-
-        failed_step = False
-        job_status = []
-        log = None
-
-        self.send_automvs(f"/JOB {jobname}")
-
-        lines = []
-
-        lines = self.wait_for_socket('--- DONE',start_string='--- Job Results')
+            await self.command(f"/JOB {jobname} TIMEOUT={timeout}", timeout=timeout)
 
-        if len(lines) == 0:
-            raise Exception('No results from job in log, check printer output for errors')
-
-        logmsg = '[MAXCC] Jobname: {:<8} Procname: {:<8} Stepname: {:<8} Progname: {:<8} Exit Code: {:<8}'
-        for line in lines:
-            if len(line.split(',')) < 6:
-                raise Exception(f"Line from automvs too short: {line}")
-            num, name, step, proc, prog, cc = line.split(',')
-            self.current_job = {'jobnum': num, 'jobname': name}
-            
-            logmsg = '[MAXCC] Jobnum: {:<4} Jobname: {:<8} Procname: {:<8} Stepname: {:<8} Progname: {:<8} Exit Code: {:<8}'
-
-            log = logmsg.format(num,name,proc,step,prog,cc)
-            step_status = {
-                            "jobnum"   : num,
-                            "jobname:" : name,
-                            "procname": proc,
-                            "stepname": step,
-                            "progname": prog,
-                            "exitcode": cc
-                        }
-            maxcc=cc
-            stepname = step.strip()
-
-            self.logger.debug(log)
-            job_status.append(step_status)
+    async def check_maxcc(self, jobname, steps_cc={}, ignore=False, keep=False):
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Checking {jobname} job results")
 
-            if stepname in steps_cc:
-                expected_cc = steps_cc[stepname]
-            else:
-                expected_cc = '0000'
+        lines = await self.command(f"/JOB {jobname}", start_string='--- Job Results')
 
-            if maxcc != expected_cc and maxcc != "*FLUSH*":
-                error = "[MAXCC] Step {} Condition Code does not match expected condition code: {} vs {} review prt00e.txt for errors".format(stepname,cc,expected_cc)
-                if ignore:
-                    self.logger.debug(error)
-                else:
-                    self.logger.error(error)
-                failed_step = True
+        job_status = parse_job_results(lines, self.logger, steps_cc, ignore)
 
-        if failed_step and not ignore:
-            self.logger.error(f"Job Failed with maxcc: {maxcc}")
-            print_maxcc(job_status)
-            raise ValueError(error)
-        
         if not keep:
-            self.purge(self.current_job['jobnum'],self.current_job['jobname'])
-            
-        return(job_status)
-    
-    def purge(self, jobnum=False, jobname=False):
-        self.logger.debug(f"Purging job {jobname} #{jobnum}")
-        self.send_automvs(f"/PURGE {jobnum} {jobname}")
-        self.wait_for_socket('--- DONE')
-
-
-        
-    def get_file(self,dsn,out_file,timeout=False):
-        '''
-        Using Automvs rexx script get a file
-        '''
+            await self.purge(job_status[-1]['jobnum'], job_status[-1]['jobname:'])
 
-        self.send_automvs(f'/FILE {dsn}')
-        lines = self.wait_for_socket('--- DONE',start_string='--- Sending BASE64 Encoded File')
-    
-        b64_file = ''.join(lines)
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Decoding Base64 file - {len(b64_file)} bytes")
-        file = base64.b64decode(b64_file)
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] File Decoded - {len(file)} bytes")
-        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Writing file to: {out_file}")
+        return job_status
 
-        with open(out_file,'wb') as binary_out:
-            binary_out.write(file)
-    
-    def hercules_web_command(self,command=''):
-        raise Exception("Hercules Web not supported in remote mode")
+    async def purge(self, jobnum=False, jobname=False):
+        self.logger.debug(f"Purging job {jobname} #{jobnum}")
+        await self.command(f"/PURGE {jobnum} {jobname}")
 
-    def send_herc(self, command='uptime'):
+    async def send_herc(self, command='uptime'):
         ''' Sends hercules commands '''
         self.logger.debug(f"[AUTOMATION: {self.ip}] Sending Hercules Command: {command}")
-        self.send_automvs(f'/HERCULES {command}')
-        self.wait_for_socket('--- DONE')       
-
+        await self.command(f'/HERCULES {command}')
 
-    def send_oper(self, command=''):
+    async def send_oper(self, command=''):
         ''' Sends operator/console commands (i.e. prepends /) '''
         self.logger.debug(f"[AUTOMATION: {self.ip}] Sending Operator command: /{command}")
-        self.send_automvs(f'/OPER {command}')
-        self.wait_for_socket('--- DONE')   
+        await self.command(f'/OPER {command}')
 
-    def submit(self,jcl, ebcdic=False, port=None):
+    async def submit(self,jcl, ebcdic=False, port=None, codepage='cp037'):
         self.logger.debug(f"[AUTOMATION: {self.ip}] Submitting JCL host={self.ip} port={self.punch_port} EBCDIC={ebcdic}")
-        #print(jcl)
 
         if not port:
             port = self.punch_port 
 
+        return await async_send_deck(self.ip, port, jcl, ebcdic, codepage=codepage)
+
+    async def get_file(self,dsn,out_file,timeout=False,progress=None,mode='base64',codepage=None,lrecl=None):
+        '''
+        Using Automvs rexx script get a file, see remote_mvs.get_file()
+
+        returns: the number of bytes written
+        '''
+        timeout = timeout or self.timeout or TIMEOUT
+        mode = mode.upper()
+        if mode == 'BASE64':
+            tag, channel = await self.__send(f'/FILE {dsn}')
+        else:
+            tag, channel = await self.__send(f'/FILE {dsn} {mode}')
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] Writing file to: {out_file}")
+
+        if hasattr(out_file, 'write'):
+            output = contextlib.nullcontext(out_file)
+        else:
+            output = open(out_file,'wb')
+
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            # Connect to server and send data
-            sock.connect((self.ip, int(port)))
-            if ebcdic:
-              sock.send(jcl)
-            else:
-              sock.send(jcl.encode())
+            with output as binary_out:
+                if codepage:
+                    binary_out = ebcdic_text_writer(binary_out, codepage, lrecl)
+                while True:
+                    line = await self.__get(channel, 'line', timeout)
+                    if "Error:" in line:
+                        raise Exception(f"Error from {self.ip}:{self.port}: {line}")
+                    header = self.FILE_HEADER.search(line)
+                    if header:
+                        break
 
+                mode, lrecl, frame_size = header.groups()
+                written = 0
+
+                if mode != 'BASE64':
+                    frame = frame_writer(mode, int(lrecl or 0), binary_out, progress)
+                    left = int(frame_size)
+                    while left:
+                        chunk = await self.__get(channel, 'frame', timeout)
+                        left -= len(chunk)
+                        frame.write(chunk)
+                    written = frame.close()
+                    progress = None
+
+                writer = base64_writer(binary_out, progress, written=written)
+                async for line in self.__lines(channel, '--- DONE', timeout=timeout):
+                    writer.line(line)
+                written = writer.close()
+                if codepage:
+                    binary_out.close()
         finally:
-            sock.close()
\ No newline at end of file
+            self.channels.pop(tag, None)
+
+        if writer.expected is not None and written != writer.expected:
+            raise Exception(f"Error from {self.ip}:{self.port}: received {written} bytes, expected {writer.expected}")
+
+        self.logger.debug(f"[AUTOMATION: {self.ip}:{self.port}] File Decoded - {written} bytes")
+        return written
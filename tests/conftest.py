@@ -0,0 +1,279 @@
+import base64
+import os
+import re
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class fake_turnkey:
+    '''
+    A TK4-/TK5 folder with a card reader and web server. Every deck read
+    is kept in decks and, unless auto is False, each job in it "runs":
+    its $HASP messages go to the hardcopy log and its step results to the
+    printer, the same way TK5 writes them.
+    '''
+
+    JOB_CARD = re.compile(r'^//(\S+)\s+JOB\s', re.MULTILINE)
+
+    def __init__(self, path, auto=True):
+        self.path = path
+        self.auto = auto
+        self.decks = []
+        self.cc = {}          # jobname: condition code to print, default 0000
+        self.next_jobnum = 100
+        self.jobnums = []     # (jobname, jobnum) in the order they were read
+        os.makedirs(path / 'prt')
+        os.makedirs(path / 'log')
+        (path / 'prt/prt00e.txt').write_text('')
+        (path / 'log/hardcopy.log').write_text('')
+        self.reader = self.__listen(self.__read_deck)
+        self.web = self.__listen(self.__web)
+
+    def __listen(self, handler):
+        server = socket.socket()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('127.0.0.1', 0))
+        server.listen(50)
+
+        def accept():
+            while True:
+                try:
+                    client, _ = server.accept()
+                except OSError:
+                    return
+                threading.Thread(target=handler, args=(client,), daemon=True).start()
+
+        threading.Thread(target=accept, daemon=True).start()
+        return server
+
+    @property
+    def reader_port(self):
+        return self.reader.getsockname()[1]
+
+    @property
+    def web_port(self):
+        return self.web.getsockname()[1]
+
+    def __read_deck(self, client):
+        data = b''
+        while chunk := client.recv(65536):
+            data += chunk
+        client.close()
+        if not data:
+            return # check_ports()
+        self.decks.append(data)
+        jobs = []
+        for jobname in self.JOB_CARD.findall(data.decode('latin-1')):
+            jobs.append((jobname, self.next_jobnum))
+            self.jobnums.append(jobs[-1])
+            self.next_jobnum += 1
+        if self.auto:
+            time.sleep(0.05)
+            for jobname, jobnum in jobs:
+                self.run(jobname, jobnum)
+
+    def __web(self, client):
+        client.recv(65536)
+        client.sendall(b'HTTP/1.0 200 OK\r\n\r\nok')
+        client.close()
+
+    def log(self, line):
+        with open(self.path / 'log/hardcopy.log', 'a') as f:
+            f.write(line + '\n')
+
+    def print(self, line):
+        with open(self.path / 'prt/prt00e.txt', 'a') as f:
+            f.write(line + '\n')
+
+    def start(self, jobname, jobnum):
+        self.log(f'12.00.00 JOB {jobnum:>4}  $HASP373 {jobname:<8} STARTED - INIT  1')
+        self.print(f' 12.00.00 JOB {jobnum:>4}  IEF403I {jobname} - STARTED - TIME=12.00.00')
+
+    def step(self, jobname, jobnum, stepname='STEP1', cc=None):
+        cc = cc or self.cc.get(jobname, '0000')
+        self.print(f' 12.00.00 JOB {jobnum:>4}  {jobname:<8} {stepname:<8} IEFBR14  RC= {cc}')
+
+    def end(self, jobname, jobnum):
+        self.print(f' 12.00.00 JOB {jobnum:>4}  IEF404I {jobname} - ENDED - TIME=12.00.00')
+        self.log(f'12.00.00 JOB {jobnum:>4}  $HASP395 {jobname:<8} ENDED')
+        self.log(f'12.00.00 JOB {jobnum:>4}  $HASP250 {jobname:<8} IS PURGED')
+
+    def run(self, jobname, jobnum):
+        self.start(jobname, jobnum)
+        self.step(jobname, jobnum)
+        self.end(jobname, jobnum)
+
+    def close(self):
+        self.reader.close()
+        self.web.close()
+
+
+@pytest.fixture
+def tk(tmp_path):
+    fake = fake_turnkey(tmp_path / 'tk5')
+    yield fake
+    fake.close()
+
+
+FAKE_HERCULES = '''#!/bin/sh
+# echoes commands back, enough for mvs to start, IPL, talk to and quit it.
+# 'die' makes it exit with return code 3 as if it crashed.
+# Dies straight away if there is a fail_boot file in the MVS/CE folder.
+echo "HHC01603I hercules started"
+if [ -e fail_boot ]; then
+  echo "HHC01413E fail_boot found" >&2
+  exit 1
+fi
+echo "IKT005I TCAS IS INITIALIZED"
+while read -r line; do
+  case "$line" in
+    quit) echo "HHC01427I Hercules shutdown complete" >&2; exit 0;;
+    die) echo "HHC00801I dying"; exit 3;;
+    *) echo "HHC01603I $line";;
+  esac
+done
+'''
+
+
+@pytest.fixture
+def mvsce(tmp_path, monkeypatch):
+    ''' an MVS/CE folder with a fake hercules on the PATH '''
+    folder = tmp_path / "mvsce"
+    os.makedirs(folder / "conf")
+    (folder / "conf/local.cnf").write_text("")
+    (folder / "conf/mvsce.rc").write_text("")
+    os.makedirs(tmp_path / "bin")
+    hercules = tmp_path / "bin/hercules"
+    hercules.write_text(FAKE_HERCULES)
+    hercules.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path / 'bin'}{os.pathsep}{os.environ['PATH']}")
+    return folder
+
+
+class fake_automvs:
+    '''
+    An AUTOMVS server for one client. Each command is answered by
+    handlers['/COMMAND'](tag, values) in the server thread (tag is '' for
+    untagged commands), which replies with reply(). Commands are kept in
+    commands and the lines uploaded by /PUT in uploads.
+    '''
+
+    def __init__(self):
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.client = None
+        self.lock = threading.Lock()
+        self.handlers = {'/PUT': self.put, '/QUIT': lambda tag, values: None}
+        self.commands = []
+        self.uploads = []
+        self.uploading = None # tag of the /PUT being sent
+        self.timers = [] # replies sent later()
+        threading.Thread(target=self.__serve, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server.getsockname()[1]
+
+    def send(self, data):
+        with self.lock:
+            self.client.sendall(data)
+
+    def reply(self, tag, *lines, data=b''):
+        ''' sends lines with the tag, data (raw file data) after the first one '''
+        prefix = f'#{tag} '.encode() if tag else b''
+        out = [prefix + line.encode('latin-1') + b'\n' for line in lines]
+        self.send(out[0] + data + b''.join(out[1:]))
+
+    def later(self, delay, tag, *lines):
+        timer = threading.Timer(delay, self.reply, args=(tag, *lines))
+        self.timers.append(timer)
+        timer.start()
+
+    def put(self, tag, values):
+        self.uploading = tag
+        self.uploads.append([])
+        self.reply(tag, '--- Ready')
+
+    def __serve(self):
+        self.client, _ = self.server.accept()
+        self.send(b"Welcome\nPlease /LOGON to continue\n")
+        buf = b''
+        while True:
+            data = self.client.recv(65536)
+            if not data:
+                break
+            buf += data
+            if buf.startswith(b'/LOGON'):
+                buf = b''
+                self.send(b"LOGON OK\n")
+                continue
+            if not buf.startswith(b'#') and b'\n' not in buf and self.uploading is None:
+                # untagged commands come one per send, without a newline
+                buf += b'\n'
+            while b'\n' in buf:
+                line, buf = buf.split(b'\n', 1)
+                line = line.decode('latin-1')
+                if self.uploading is not None:
+                    if line == '--- END':
+                        records = sum(len(base64.b64decode(r)) for r in self.uploads[-1])
+                        self.reply(self.uploading, f'--- Wrote {records} bytes', '--- DONE')
+                        self.uploading = None
+                    else:
+                        self.uploads[-1].append(line)
+                    continue
+                tag = ''
+                if line.startswith('#'):
+                    tag, _, line = line[1:].partition(' ')
+                self.commands.append(line)
+                command, _, values = line.partition(' ')
+                self.handlers.get(command.upper(), self.unknown)(tag, values)
+        self.client.close()
+
+    def unknown(self, tag, values):
+        self.reply(tag, 'Error: unknown command')
+
+    def close(self):
+        for timer in self.timers:
+            timer.cancel()
+        self.server.close()
+
+
+@pytest.fixture
+def automvs_server():
+    server = fake_automvs()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def reader():
+    ''' a card reader socket, returns (port, list of the decks read) '''
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(5)
+    decks = []
+
+    def accept():
+        while True:
+            try:
+                client, _ = server.accept()
+            except OSError:
+                return
+            data = b''
+            while chunk := client.recv(65536):
+                data += chunk
+            client.close()
+            decks.append(data)
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    yield server.getsockname()[1], decks
+    server.close()
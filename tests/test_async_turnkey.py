@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+import automvs
+
+
+def async_tk(tk, timeout=3):
+    return automvs.async_turnkey(mvs_tk_path=str(tk.path), punch_port=tk.reader_port,
+                                 web_port=tk.web_port, timeout=timeout)
+
+
+
+def test_wait_started_after_another_wait_matched(tk):
+    # A is purged before anything waits on it, then B's wait is matched
+    async def run():
+        build = async_tk(tk)
+        await build.submit('//A JOB 1\n')
+        await asyncio.sleep(0.3)
+        await build.submit('//B JOB 1\n')
+        await build.wait_for_job('B')
+        await build.wait_for_job('A')
+
+    asyncio.run(run())
+
+
+def test_many_waits(tk):
+    async def run():
+        build = async_tk(tk)
+        for jobname in 'ABC':
+            await build.submit(f'//{jobname} JOB 1\n')
+        await asyncio.gather(*(build.wait_for_job(jobname) for jobname in 'CBA'))
+
+    asyncio.run(run())
+
+
+def test_line_ends_one_wait(tk):
+    async def run():
+        build = async_tk(tk, timeout=1)
+        await build.submit('//A JOB 1\n')
+        await build.wait_for_job('A')
+        with pytest.raises(Exception, match='timed out'):
+            await build.wait_for_job('A')
+
+    asyncio.run(run())
+
+
+def test_resubmit_ignores_earlier_run(tk):
+    tk.auto = False
+
+    async def run():
+        build = async_tk(tk, timeout=1)
+        tk.run('A', 1)
+        await build.submit('//A JOB 1\n')
+        with pytest.raises(Exception, match='timed out'):
+            await build.wait_for_job('A')
+
+    asyncio.run(run())
+
+
+def test_submit_and_check(tk):
+    tk.cc['BAD'] = '0008'
+
+    async def run():
+        build = async_tk(tk)
+        results = await asyncio.gather(*(build.submit_and_check(f'//{jobname} JOB 1\n') for jobname in ('A', 'B')))
+        assert [steps[0]['jobname:'] for steps in results] == ['A', 'B']
+        assert len(tk.decks) == 2
+        with pytest.raises(ValueError, match='Condition Code'):
+            await build.submit_and_check('//BAD JOB 1\n')
+
+    asyncio.run(run())
+
+
+def test_sync_only_helpers(tk):
+    build = async_tk(tk)
+    with pytest.raises(Exception, match='not available'):
+        build.job_tracker()
+    with pytest.raises(Exception, match='build_cache needs'):
+        automvs.build_cache(build)
+
+
+def test_wait_for_string_ignores_lines_already_read(tk):
+    async def run():
+        build = async_tk(tk, timeout=1)
+        tk.log('12.00.00 HELLO')
+        # read by submit(), before the wait
+        await build.submit('//A JOB 1\n')
+        await build.wait_for_job('A')
+        with pytest.raises(Exception, match='timed out'):
+            await build.wait_for_string('HELLO')
+
+        wait = asyncio.ensure_future(build.wait_for_string('HELLO'))
+        await asyncio.sleep(0.1)
+        tk.log('12.00.01 HELLO AGAIN')
+        await wait
+
+    asyncio.run(run())
+
+
+def test_submit_and_check_file_deck(tk, tmp_path):
+    # the job card can't be read from a file, jobname= says what to wait for
+    deck = tmp_path / 'deck.jcl'
+    deck.write_text('//FILEJOB JOB 1\n')
+
+    async def run():
+        build = async_tk(tk)
+        await build.submit('//OTHER JOB 1\n')
+        await asyncio.sleep(0.3)
+        steps = await build.submit_and_check(deck, jobname='FILEJOB')
+        assert steps[0]['jobname:'] == 'FILEJOB'
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+import asyncio
+import threading
+
+import automvs
+
+
+def test_send_herc(mvsce):
+    build = automvs.mvs(mvsce=mvsce, backend='asyncio', timeout=10)
+    build.reset_hercules()
+    try:
+        build.send_herc('hello')
+        build.wait_for_string('HHC01603I hello')
+    finally:
+        build.quit_hercules()
+    assert not build.hercules_running()
+
+
+def test_async_mvs_send_herc(mvsce):
+    async def run():
+        build = automvs.async_mvs(mvsce=mvsce, timeout=10)
+        await build.reset_hercules()
+        assert build.hercproc is not False
+        await build.send_herc('hello')
+        await build.wait_for_string('HHC01603I hello')
+        await build.quit_hercules()
+        assert not build.hercules_running()
+    asyncio.run(run())
+
+
+def test_async_mvs_check_maxcc_off_loop(mvsce, monkeypatch):
+    threads = []
+    def check_maxcc(self, jobname, **kwargs):
+        threads.append(threading.current_thread())
+        return [{'jobname:': jobname}]
+    monkeypatch.setattr(automvs.mvs, 'check_maxcc', check_maxcc)
+
+    build = automvs.async_mvs(mvsce=mvsce)
+    assert asyncio.run(build.check_maxcc('TEST')) == [{'jobname:': 'TEST'}]
+    assert threads != [threading.main_thread()]
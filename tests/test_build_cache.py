@@ -0,0 +1,137 @@
+import logging
+import pathlib
+
+import pytest
+
+import automvs
+
+
+JCL = "//BUILD JOB (1)\n//S1 EXEC PGM=IEFBR14\n"
+
+
+class fake_build:
+    ''' submit_and_check() returns results, one step per steps_cc entry '''
+
+    def __init__(self, system='MVSCE:test', exitcode='0000'):
+        self.logger = logging.getLogger('test')
+        self.system = system
+        self.exitcode = exitcode
+        self.runs = []
+
+    def cache_key(self):
+        return self.system
+
+    def submit_and_check(self, jcl, ebcdic=False, jobname=False, steps_cc={}, ignore=False, **kwargs):
+        self.runs.append(jobname)
+        results = [{'jobname': jobname, 'procname': '', 'stepname': 'S1', 'exitcode': self.exitcode}]
+        if self.exitcode != '0000' and not ignore:
+            raise ValueError("Step S1 failed")
+        return results
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return tmp_path / "cache.json"
+
+
+def test_key(cache_file, tmp_path):
+    cache = automvs.build_cache(fake_build(), path=cache_file)
+    key = cache.key(JCL)
+    assert key == automvs.build_cache(fake_build(), path=cache_file).key(JCL)
+    assert key != automvs.build_cache(fake_build('TK5:other'), path=cache_file).key(JCL)
+    others = [cache.key(JCL + "//"), cache.key(JCL, steps_cc={'S1': '0004'}),
+              cache.key(JCL, ignore=True), cache.key(JCL, jobname='OTHER')]
+    assert len({key, *others}) == 5
+
+    # paths are hashed by content
+    path = tmp_path / "build.jcl"
+    path.write_text(JCL)
+    assert cache.key(path) == cache.key(JCL)
+    with pytest.raises(ValueError, match="open file"):
+        with open(path) as f:
+            cache.key(f)
+
+
+def test_inputs(cache_file, tmp_path):
+    source = tmp_path / "prog.asm"
+    source.write_text("         BR    14\n")
+    build = fake_build()
+    cache = automvs.build_cache(build, path=cache_file)
+
+    cache.submit_and_check(JCL, inputs=[source])
+    cache.submit_and_check(JCL, inputs=[source])
+    assert build.runs == ['BUILD']
+
+    source.write_text("         SR    15,15\n         BR    14\n")
+    cache.submit_and_check(JCL, inputs=[source])
+    assert build.runs == ['BUILD', 'BUILD']
+    # the name of an input is part of it too
+    source.rename(tmp_path / "other.asm")
+    cache.submit_and_check(JCL, inputs=[tmp_path / "other.asm"])
+    assert len(build.runs) == 3
+
+
+def test_hit_miss_force(cache_file):
+    build = fake_build()
+    cache = automvs.build_cache(build, path=cache_file)
+    results = cache.submit_and_check(JCL)
+    assert cache.submit_and_check(JCL) == results
+    assert build.runs == ['BUILD']
+
+    cache.submit_and_check(JCL, force=True)
+    automvs.build_cache(build, path=cache_file, force=True).submit_and_check(JCL)
+    assert len(build.runs) == 3
+
+
+def test_jobname_in_key(cache_file):
+    build = fake_build()
+    cache = automvs.build_cache(build, path=cache_file)
+    cache.submit_and_check(JCL)
+    cache.submit_and_check(JCL, jobname='OTHER')
+    cache.submit_and_check(JCL, jobname='OTHER')
+    assert build.runs == ['BUILD', 'OTHER']
+
+
+def test_failures_not_saved(cache_file):
+    build = fake_build(exitcode='0008')
+    cache = automvs.build_cache(build, path=cache_file)
+    with pytest.raises(ValueError):
+        cache.submit_and_check(JCL)
+    cache.submit_and_check(JCL, ignore=True)
+    cache.submit_and_check(JCL, ignore=True)
+    assert len(build.runs) == 3
+    assert cache.entries == {}
+
+    # expected condition codes pass
+    cache.submit_and_check(JCL, ignore=True, steps_cc={'S1': '0008'})
+    cache.submit_and_check(JCL, ignore=True, steps_cc={'S1': '0008'})
+    assert len(build.runs) == 4
+
+
+def test_passed():
+    steps = [{'procname': 'ASMFC', 'stepname': 'LKED', 'exitcode': '0004'}]
+    assert not automvs.build_cache.passed(steps)
+    assert automvs.build_cache.passed(steps, {'LKED': '0004'})
+    assert automvs.build_cache.passed(steps, {'ASMFC.LKED': '0004', 'LKED': '0000'})
+
+
+def test_save_reload_invalidate(cache_file):
+    build = fake_build()
+    other = fake_build('TK5:other')
+    cache = automvs.build_cache(build, path=cache_file)
+    cache.submit_and_check(JCL)
+    cache.submit_and_check(JCL + "//\n")
+    automvs.build_cache(other, path=cache_file).submit_and_check(JCL)
+
+    reloaded = automvs.build_cache(build, path=cache_file)
+    assert len(reloaded.entries) == 3
+    reloaded.submit_and_check(JCL)
+    assert build.runs == ['BUILD', 'BUILD']
+
+    reloaded.invalidate(JCL)
+    reloaded.submit_and_check(JCL)
+    assert len(build.runs) == 3
+
+    reloaded.invalidate()
+    assert [e['system'] for e in automvs.build_cache(build, path=cache_file).entries.values()] == ['TK5:other']
+    assert not list(pathlib.Path(cache_file).parent.glob("*.tmp"))
@@ -0,0 +1,59 @@
+import automvs
+
+
+def test_labels():
+    c = automvs.console_classifier(noise=['HHC00811I'], fatal=['open error'])
+    c.add_event('ipl', r'IKT005I TCAS IS INIT\w+', regex=True)
+    found = c.classify(['HHC00811I busy', 'nothing', 'IKT005I TCAS IS INITIALIZED', 'x open error'])
+    assert {i: label for i, (label, name, cb) in found.items()} == {0: 'noise', 2: 'event', 3: 'fatal'}
+    assert found[2][1] == 'ipl'
+
+
+def test_fatal_before_noise():
+    c = automvs.console_classifier(noise=['HHC0'], fatal=['HHC00100E open error'])
+    assert c.classify(['HHC00100E open error on 0150'])[0][0] == 'fatal'
+    # noise found first on the line, fatal after it
+    c = automvs.console_classifier(noise=['HHC00100E'], fatal=['open error'])
+    assert c.classify(['HHC00100E open error on 0150'])[0][0] == 'fatal'
+
+
+def test_event_before_noise():
+    c = automvs.console_classifier(noise=['IEF'])
+    c.add_event('abend', 'IEF450I')
+    assert c.classify(['IEF450I TEST ABEND'])[0][:2] == ('event', 'abend')
+
+
+def test_trie_prefixes():
+    c = automvs.console_classifier(noise=['ab', 'abc', 'b'])
+    assert set(c.classify(['abc', 'ab', 'xb', 'a'])) == {0, 1, 2}
+
+
+def test_remove():
+    c = automvs.console_classifier(noise=['HHC00811I'])
+    c.remove('HHC00811I')
+    assert c.classify(['HHC00811I busy']) == {}
+
+
+def test_stderr_keeps_noise(mvsce):
+    build = automvs.mvs(mvsce=mvsce)
+    build.classifier.add_noise('HHC00811I')
+    assert build.stdout_lines(['HHC00811I busy', 'kept']) == ['kept']
+    assert build.stderr_lines(['HHC00811I busy', 'kept']) == ['HHC00811I busy', 'kept']
+
+
+def test_fatal_inside_noise():
+    # the fatal string starts inside the noise match
+    c = automvs.console_classifier(noise=['HHC00100E open'], fatal=['open error'])
+    assert c.classify(['HHC00100E open error on 0150'])[0][0] == 'fatal'
+
+
+def test_regex_stays_on_its_line():
+    c = automvs.console_classifier()
+    c.add_fatal(r'DASD\s+ERROR', regex=True)
+    assert c.classify(['last word DASD', 'ERROR is the next line']) == {}
+    assert c.classify(['ok', 'DASD  ERROR'])[1][0] == 'fatal'
+
+
+def test_same_string_two_labels():
+    c = automvs.console_classifier(noise=['HHC00007I'], fatal=['HHC00007I'])
+    assert c.classify(['HHC00007I x'])[0][0] == 'fatal'
@@ -0,0 +1,22 @@
+import logging
+
+import pytest
+
+import automvs
+
+
+@pytest.mark.parametrize('loglevel, debug', [
+    ('DEBUG', True), (logging.DEBUG, True), ('WARNING', False), (logging.INFO, False)])
+def test_loglevel_names(mvsce, loglevel, debug):
+    assert automvs.mvs(mvsce=mvsce, loglevel=loglevel).console_debug is debug
+
+
+def test_lines_split_across_chunks():
+    lines = automvs.console_lines()
+    assert lines.feed(b'HHC0001I one\nHHC0002I t') == ['HHC0001I one']
+    assert lines.feed(b'wo\r\n\nHHC') == ['HHC0002I two', '']
+    assert lines.feed(b'0003I \xc3') == []
+    assert lines.feed(b'\xa9\n') == ['HHC0003I \xe9']
+    assert lines.flush() == []
+    lines.feed(b'last')
+    assert lines.flush() == ['last']
@@ -0,0 +1,54 @@
+import codecs
+import io
+
+import pytest
+
+import automvs
+
+
+@pytest.mark.parametrize('codepage', ['cp037', 'cp1047', 'hercules', '819/1047'])
+def test_round_trip(codepage):
+    codec = automvs.ebcdic_codec.get(codepage)
+    data = bytes(range(256))
+    assert codec.encode(codec.decode(data)) == data
+    assert codec.decode(codec.encode(data.decode('latin-1'))) == data.decode('latin-1')
+
+
+def test_matches_python_codecs():
+    text = "//HELLO JOB (1),'[^]!|'\n"
+    assert automvs.ebcdic_codec.get('cp037').encode(text) == codecs.encode(text, 'cp037')
+    assert automvs.ebcdic_codec.get('cp1047').encode('[^]') == b'\xad\x5f\xbd'
+    # hercules swaps NL and LF so EBCDIC newlines come out as ASCII ones
+    assert automvs.ebcdic_codec.get('hercules').decode(b'\x15') == '\n'
+
+
+def test_records():
+    codec = automvs.ebcdic_codec.get('cp037')
+    data = codec.encode_records(['//A JOB', '//S EXEC PGM=IEFBR14'])
+    assert len(data) == 160 and data[79:80] == codec.space
+    assert codec.decode_records(data) == ['//A JOB', '//S EXEC PGM=IEFBR14']
+
+    records = codec.split_records(data)
+    assert [bytes(r) for r in records] == [data[:80], data[80:]]
+    assert codec.join_records([codec.encode('//A JOB'), codec.encode('//S EXEC PGM=IEFBR14')]) == data
+
+    with pytest.raises(ValueError):
+        codec.split_records(data[:-1])
+    with pytest.raises(ValueError):
+        codec.encode_records(['X' * 81])
+
+
+def test_text_writer():
+    codec = automvs.ebcdic_codec.get('cp037')
+    out = io.BytesIO()
+    writer = automvs.ebcdic_text_writer(out, lrecl=8)
+    data = codec.encode_records(['ONE', 'TWO', 'THR'], lrecl=8)
+    for i in range(0, len(data), 5):
+        writer.write(data[i:i + 5])
+    writer.close()
+    assert out.getvalue() == b"ONE\nTWO\nTHR\n"
+
+
+def test_unknown_codepage():
+    with pytest.raises(ValueError, match="Unknown EBCDIC codepage"):
+        automvs.ebcdic_codec.get('cp500')
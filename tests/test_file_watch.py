@@ -0,0 +1,82 @@
+import asyncio
+import ctypes
+import threading
+import time
+
+import pytest
+
+import automvs
+
+
+def write_later(path, delay=0.1):
+    timer = threading.Timer(delay, path.write_text, args=("changed\n",))
+    timer.start()
+    return timer
+
+
+def test_inotify_wakes_on_write(tmp_path):
+    path = tmp_path / "hardcopy.log"
+    watch = automvs.file_watch(path)
+    if watch.fd is None:
+        pytest.skip("no inotify here")
+    write_later(path)
+    start = time.monotonic()
+    watch.wait(5)
+    # MAX_INOTIFY_WAIT is 1 second, the write has to be what woke us up
+    assert time.monotonic() - start < 0.8
+    watch.close()
+    assert watch.fd is None
+
+
+def test_inotify_async_wait(tmp_path):
+    path = tmp_path / "hardcopy.log"
+    watch = automvs.file_watch(path)
+    if watch.fd is None:
+        pytest.skip("no inotify here")
+
+    async def run():
+        write_later(path)
+        start = time.monotonic()
+        await watch.async_wait(5)
+        return time.monotonic() - start
+    assert asyncio.run(run()) < 0.8
+    watch.close()
+
+
+@pytest.fixture
+def no_inotify(monkeypatch):
+    def CDLL(*args, **kwargs):
+        raise OSError("no libc")
+    monkeypatch.setattr(ctypes, 'CDLL', CDLL)
+
+
+def test_polling_fallback(tmp_path, no_inotify):
+    watch = automvs.file_watch(tmp_path / "hardcopy.log")
+    assert watch.fd is None
+
+    delays = []
+    for i in range(10):
+        delays.append(watch.delay)
+        watch.wait(5)
+    assert delays[:3] == [watch.MIN_DELAY, watch.MIN_DELAY * 2, watch.MIN_DELAY * 4]
+    assert watch.delay == watch.MAX_DELAY
+
+    watch.reset()
+    assert watch.delay == watch.MIN_DELAY
+    start = time.monotonic()
+    watch.wait(0)
+    assert time.monotonic() - start < 0.01
+
+
+def test_polling_async_wait(tmp_path, no_inotify):
+    watch = automvs.file_watch(tmp_path / "hardcopy.log")
+    asyncio.run(watch.async_wait(5))
+    assert watch.delay == watch.MIN_DELAY * 2
+
+
+def test_log_tail_without_inotify(tmp_path, no_inotify):
+    path = tmp_path / "hardcopy.log"
+    tail = automvs.log_tail(path)
+    write_later(path, 0.05)
+    assert tail.wait_lines(2) == ["changed\n"]
+    tail.close()
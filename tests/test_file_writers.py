@@ -0,0 +1,69 @@
+import base64
+import io
+
+import pytest
+
+import automvs
+
+
+DATA = bytes(range(256)) * 4 + b'tail'
+
+
+def test_base64_split_mid_quad():
+    text = base64.b64encode(DATA).decode()
+    out = io.BytesIO()
+    progress = []
+    # 5 character lines and a 9 character chunk: every flush leaves part
+    # of a quad behind for the next one
+    writer = automvs.base64_writer(out, progress.append, chunk_size=9)
+    for i in range(0, len(text), 5):
+        writer.line(text[i:i + 5])
+    writer.line(f'--- Size: {len(DATA)}')
+    assert writer.close() == len(DATA)
+    assert out.getvalue() == DATA
+    assert writer.expected == len(DATA)
+    assert len(progress) > 100 and progress == sorted(progress) and progress[-1] == len(DATA)
+    assert all(p % 3 == 0 for p in progress[:-1])
+
+
+def test_base64_written_before():
+    out = io.BytesIO()
+    writer = automvs.base64_writer(out, written=10)
+    writer.line(base64.b64encode(b'abc').decode())
+    assert writer.close() == 13 and writer.expected is None
+
+
+RECORDS = [b'\xc1' * 3, b'', b'\xc2' * 80, b'\x15\x0a' + b'\xc3' * 50]
+
+
+def trunc_frame(records):
+    return b''.join(len(r).to_bytes(2, 'big') + r for r in records)
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 1000])
+def test_frame_trunc_split(size):
+    # size 1 splits every 2 byte header across writes
+    frame = trunc_frame(RECORDS)
+    out = io.BytesIO()
+    writer = automvs.frame_writer('TRUNC', 80, out)
+    for i in range(0, len(frame), size):
+        writer.write(frame[i:i + size])
+    assert writer.close() == 320
+    assert out.getvalue() == b''.join(r.ljust(80, b'\x40') for r in RECORDS)
+
+
+def test_frame_trunc_left_over():
+    writer = automvs.frame_writer('TRUNC', 80, io.BytesIO())
+    writer.write(trunc_frame(RECORDS)[:-1])
+    with pytest.raises(Exception, match='53 bytes left over'):
+        writer.close()
+
+
+def test_frame_binary():
+    out = io.BytesIO()
+    progress = []
+    writer = automvs.frame_writer('BINARY', 0, out, progress.append)
+    for i in range(0, len(DATA), 100):
+        writer.write(DATA[i:i + 100])
+    assert writer.close() == len(DATA)
+    assert out.getvalue() == DATA and progress[-1] == len(DATA)
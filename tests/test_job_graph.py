@@ -0,0 +1,94 @@
+import logging
+
+import pytest
+
+import automvs
+
+
+class fake_tracker:
+    ''' finishes the oldest job in flight each time completed() is called '''
+
+    def __init__(self, build):
+        self.build = build
+        self.running = []
+
+    @property
+    def in_flight(self):
+        return len(self.running)
+
+    def submit(self, jcl, jobname=False, steps_cc={}, ignore=False, ebcdic=False, **extra):
+        self.build.submitted.append(extra['name'])
+        self.build.most = max(self.build.most, len(self.running) + 1)
+        job = dict(extra, jobname=jobname or jcl, steps=None, error=None)
+        self.running.append(job)
+        return job
+
+    def completed(self, timeout=False):
+        job = self.running.pop(0)
+        if job['name'] in self.build.fail:
+            job['error'] = Exception(f"{job['name']} failed")
+        else:
+            job['steps'] = []
+        return [job]
+
+
+class fake_build:
+    def __init__(self, fail=()):
+        self.logger = logging.getLogger('test')
+        self.fail = set(fail)
+        self.submitted = []
+        self.most = 0
+
+    def job_tracker(self, timeout=False):
+        return fake_tracker(self)
+
+
+def diamond(build, **kwargs):
+    graph = automvs.job_graph(build, **kwargs)
+    graph.add('alloc', 'ALLOC')
+    graph.add('asm1', 'ASM1', after=['alloc'])
+    graph.add('asm2', 'ASM2', after=['alloc'])
+    graph.add('install', 'INSTALL', after=['asm1', 'asm2'])
+    graph.add('other', 'OTHER')
+    return graph
+
+
+def test_dependency_order():
+    build = fake_build()
+    jobs = diamond(build, max_in_flight=2).run()
+    assert build.submitted == ['alloc', 'other', 'asm1', 'asm2', 'install']
+    assert build.most == 2
+    assert {job['status'] for job in jobs.values()} == {'DONE'}
+
+
+def test_failure_cancels_dependents():
+    build = fake_build(fail={'alloc'})
+    graph = diamond(build, max_in_flight=1)
+    with pytest.raises(Exception, match="alloc failed"):
+        graph.run()
+    assert build.submitted == ['alloc']
+    assert {name: job['status'] for name, job in graph.jobs.items()} == {
+        'alloc': 'FAILED', 'asm1': 'CANCELLED', 'asm2': 'CANCELLED',
+        'install': 'CANCELLED', 'other': 'CANCELLED'}
+
+
+def test_keep_going():
+    build = fake_build(fail={'asm1'})
+    graph = diamond(build, max_in_flight=1, keep_going=True)
+    with pytest.raises(Exception, match="asm1 failed"):
+        graph.run()
+    assert {name: job['status'] for name, job in graph.jobs.items()} == {
+        'alloc': 'DONE', 'asm1': 'FAILED', 'asm2': 'DONE',
+        'install': 'CANCELLED', 'other': 'DONE'}
+
+
+def test_bad_graphs():
+    graph = automvs.job_graph(fake_build())
+    graph.add('a', 'A', after=['b'])
+    with pytest.raises(ValueError, match="unknown job b"):
+        graph.run()
+    graph.add('b', 'B', after=['a'])
+    with pytest.raises(ValueError, match="Dependency loop"):
+        graph.run()
+    with pytest.raises(ValueError, match="already added"):
+        graph.add('a', 'A')
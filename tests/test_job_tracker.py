@@ -0,0 +1,179 @@
+import logging
+import threading
+
+import pytest
+
+import automvs
+
+
+class console:
+    ''' job_tracker callbacks fed from a list of console lines '''
+
+    def __init__(self, lines=()):
+        self.lines = list(lines)
+        self.submitted = []
+        self.checked = []
+        self.fail = set()
+
+    def submit(self, jcl, ebcdic=False, jobname=None):
+        self.submitted.append(jobname)
+        return len(jcl)
+
+    def check_maxcc(self, jobname, steps_cc={}, ignore=False, jobnum=None):
+        self.checked.append((jobname, jobnum))
+        if jobnum in self.fail:
+            raise Exception(f"{jobname} #{jobnum} failed")
+        return [{'jobname:': jobname, 'jobnum': jobnum}]
+
+    def next_line(self, timeout):
+        return self.lines.pop(0) if self.lines else None
+
+    def tracker(self, timeout=1):
+        return automvs.job_tracker(self.submit, self.check_maxcc, self.next_line,
+                                   logging.getLogger('test'), timeout=timeout)
+
+
+def test_jobs_in_any_order():
+    c = console([
+        "$HASP100 A        ON READER1",
+        "JOB   11  $HASP100 B        ON READER1",
+        "JOB   10  $HASP373 A        STARTED",
+        "JOB   11  $HASP373 B        STARTED",
+        "JOB   11  $HASP395 B        ENDED",
+        "JOB   11  $HASP250 B        PURGED",
+        "JOB   10  $HASP395 A        ENDED",
+        "JOB   10  $HASP250 A        PURGED",
+    ])
+    tracker = c.tracker()
+    a = tracker.submit("//A JOB\n", build='a')
+    b = tracker.submit("//B JOB\n")
+    assert a['sent'] == 8 and c.submitted == ['A', 'B']
+
+    assert tracker.completed() == [b]
+    assert b['status'] == 'PURGED' and b['jobnum'] == '11'
+    assert tracker.completed() == [a]
+    assert a['jobnum'] == '10' and a['build'] == 'a'
+    assert c.checked == [('B', '11'), ('A', '10')]
+    assert tracker.in_flight == 0 and tracker.completed() == []
+
+
+def test_same_jobname_by_number():
+    c = console([
+        "JOB   20  $HASP100 SAME     ON READER1",
+        "JOB   21  $HASP100 SAME     ON READER1",
+        "JOB   21  $HASP373 SAME     STARTED",
+        "JOB   21  $HASP250 SAME     PURGED",
+        "JOB   20  $HASP250 SAME     PURGED",
+    ])
+    c.fail.add('21')
+    tracker = c.tracker()
+    first = tracker.submit("//SAME JOB\n")
+    second = tracker.submit("//SAME JOB\n")
+
+    assert tracker.completed() == [second]
+    assert isinstance(second['error'], Exception) and second['steps'] is None
+    assert first['status'] == 'READ'
+    assert tracker.completed() == [first]
+    assert first['error'] is None and first['steps'] == [{'jobname:': 'SAME', 'jobnum': '20'}]
+
+
+def test_ignores_other_jobs():
+    c = console(["JOB   30  $HASP250 OTHER    PURGED", "JOB   31  $HASP250 MINE     PURGED"])
+    tracker = c.tracker()
+    mine = tracker.submit("//MINE JOB\n")
+    assert tracker.completed() == [mine]
+    assert c.checked == [('MINE', '31')]
+
+
+def test_timeout():
+    tracker = console().tracker(timeout=0.1)
+    tracker.submit("//LOST JOB\n")
+    with pytest.raises(Exception, match=r"\['LOST'\] timed out"):
+        tracker.completed()
+
+
+def test_file_jcl_needs_jobname():
+    with pytest.raises(Exception, match="Missing jobname="):
+        console().tracker().submit(b"//A JOB\n")
+
+
+def test_submit_many(mvsce, monkeypatch):
+    c = console([
+        "JOB   10  $HASP100 A        ON READER1",
+        "JOB   11  $HASP100 B        ON READER1",
+        "JOB   11  $HASP250 B        PURGED",
+        "JOB   12  $HASP100 C        ON READER1",
+        "JOB   10  $HASP250 A        PURGED",
+        "JOB   12  $HASP250 C        PURGED",
+    ])
+    c.fail.add('12')
+    build = automvs.mvs(mvsce=mvsce)
+    monkeypatch.setattr(build, 'job_tracker', lambda **kwargs: c.tracker())
+
+    jobs = build.submit_many(["//A JOB\n", {'jcl': "//B JOB\n", 'steps_cc': {'S1': '0004'}}, "//C JOB\n"],
+                             max_in_flight=2)
+    b = next(jobs)
+    assert b['index'] == 1 and b['jobnum'] == '11' and b['steps_cc'] == {'S1': '0004'}
+    # C only goes in once B is out
+    assert c.submitted == ['A', 'B']
+    a = next(jobs)
+    assert a['index'] == 0 and c.submitted == ['A', 'B', 'C']
+    last = next(jobs)
+    assert last['index'] == 2 and isinstance(last['error'], Exception)
+    assert next(jobs, None) is None
+
+
+@pytest.fixture
+def remote(automvs_server, reader):
+    delays = {'SLOW': 0.6, 'FAST': 0.1, 'BAD': 0.35}
+    def job(tag, values):
+        name = values.split()[0]
+        cc = '0008' if name == 'BAD' else '0000'
+        num = str(list(delays).index(name) + 1)
+        automvs_server.later(delays[name], tag, '--- Job Results (1)', f'{num},{name},STEP1,,IEFBR14,{cc}', '--- DONE')
+    automvs_server.handlers['/JOB'] = job
+    automvs_server.handlers['/PURGE'] = lambda tag, values: automvs_server.reply(tag, '--- DONE')
+    remote = automvs.remote_mvs(automvs_port=automvs_server.port, pipeline=True, loglevel=logging.WARNING, timeout=5)
+    yield remote
+    remote.disconnect()
+
+
+def test_remote_job_tracker(automvs_server, reader, remote):
+    port, decks = reader
+    tracker = remote.job_tracker(port=port, timeout=5)
+    slow = tracker.submit("//SLOW JOB\n")
+    fast = tracker.submit("//FAST JOB\n")
+    bad = tracker.submit("//BAD JOB\n")
+    assert tracker.in_flight == 3
+
+    # in the order they end, not the order they were submitted
+    assert tracker.completed() == [fast]
+    assert tracker.completed() == [bad]
+    assert tracker.completed() == [slow]
+    assert tracker.in_flight == 0 and tracker.completed() == []
+
+    assert fast['status'] == 'PURGED' and fast['jobnum'] == '2' and fast['error'] is None
+    assert fast['steps'][0]['exitcode'] == '0000'
+    # failed jobs stay on the spool, as with check_maxcc
+    assert bad['status'] == 'ENDED' and isinstance(bad['error'], Exception) and bad['steps'] is None
+    assert '/PURGE 2 FAST' in automvs_server.commands and '/PURGE 1 SLOW' in automvs_server.commands
+    assert not any('BAD' in command for command in automvs_server.commands if command.startswith('/PURGE'))
+    assert '/JOB SLOW TIMEOUT=5' in automvs_server.commands
+    for _ in range(100):
+        if len(decks) == 3:
+            break
+        threading.Event().wait(0.01)
+    assert sorted(decks) == [b"//BAD JOB\n", b"//FAST JOB\n", b"//SLOW JOB\n"]
+
+
+def test_remote_job_tracker_keep_and_timeout(automvs_server, reader, remote):
+    port, decks = reader
+    tracker = remote.job_tracker(port=port, timeout=5, keep=True)
+    fast = tracker.submit("//FAST JOB\n")
+    assert tracker.completed() == [fast]
+    assert fast['status'] == 'ENDED' and fast['jobnum'] == '2'
+    assert not any(command.startswith('/PURGE') for command in automvs_server.commands)
+
+    tracker.submit("//SLOW JOB\n")
+    with pytest.raises(Exception, match=r"\['SLOW'\] timed out"):
+        tracker.completed(timeout=0.1)
@@ -0,0 +1,28 @@
+import os
+
+import automvs
+
+
+def test_log_tail(tmp_path):
+    log = tmp_path / "hardcopy.log"
+    tail = automvs.log_tail(log)
+    assert tail.read_lines() == []
+
+    log.write_text("one\ntw")
+    assert tail.read_lines() == ["one\n"]
+    with open(log, 'a') as f:
+        f.write("o\n")
+    assert tail.read_lines() == ["two\n"]
+    assert tail.wait_lines(0.1) == []
+
+    # rotated: the rest of the old file, then the new one
+    with open(log, 'a') as f:
+        f.write("three\n")
+    os.rename(log, tmp_path / "hardcopy.log.1")
+    log.write_text("four\n")
+    assert tail.read_lines() == ["three\n", "four\n"]
+
+    # truncated: from the top
+    log.write_text("5\n")
+    assert tail.wait_lines(1) == ["5\n"]
+    tail.close()
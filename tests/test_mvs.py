@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+
+import pytest
+
+import automvs
+
+
+def test_instances_are_isolated(mvsce, tmp_path):
+    other = tmp_path / "other"
+    os.makedirs(other / "conf")
+    (other / "conf/local.cnf").write_text("")
+    (other / "conf/mvsce.rc").write_text("")
+    cwd = os.getcwd()
+
+    a = automvs.mvs(mvsce=mvsce, timeout=10)
+    b = automvs.mvs(mvsce=other, timeout=10)
+    a.ipl()
+    b.ipl()
+    try:
+        a.stdout_lines(["/*12 IEF238D REPLY DEVICE NAME"])
+        assert a.reply_num == '12' and b.reply_num == 0
+
+        a.quit_hercules()
+        assert a.quit_herc_event.is_set()
+        assert not b.quit_herc_event.is_set() and not b.kill_hercules.is_set()
+        b.send_herc("still here")
+        b.wait_for_string("HHC01603I still here")
+        assert b.hercules_running()
+        assert os.getcwd() == cwd
+        assert b.mvsce_path("prt00e.txt") == f"{other}/prt00e.txt"
+    finally:
+        b.quit_hercules()
+
+
+@pytest.mark.parametrize('backend', ['threads', 'asyncio'])
+def test_wait_ends_when_hercules_dies(mvsce, backend):
+    build = automvs.mvs(mvsce=mvsce, backend=backend, timeout=60)
+    build.ipl()
+    threading.Timer(0.5, build.send_herc, args=('die',)).start()
+    started, cpu = time.monotonic(), time.process_time()
+    with pytest.raises(automvs.HerculesExited) as exited:
+        build.wait_for_string('NEVER PRINTED')
+    assert time.monotonic() - started < 5
+    # blocked, not spinning, while it waited
+    assert time.process_time() - cpu < 0.3
+    assert exited.value.returncode == 3
+    assert 'HHC00801I dying' in exited.value.last_lines[-1]
+    # and to whoever waits next
+    with pytest.raises(automvs.HerculesExited):
+        build.wait_for_strings(['NEVER', 'PRINTED'])
+
+
+def test_supervisor_blocks_and_reports(mvsce):
+    build = automvs.mvs(mvsce=mvsce, timeout=10)
+    build.ipl()
+    supervisor = build.check_hercules_thread
+    cpu = time.process_time()
+    time.sleep(1)
+    assert time.process_time() - cpu < 0.2
+    assert supervisor.is_alive()
+
+    # asked to quit: nothing to report
+    build.quit_hercules()
+    supervisor.join(timeout=5)
+    assert not supervisor.is_alive() and build.hercules_exit is None
+
+    build.ipl()
+    build.send_herc('die')
+    build.check_hercules_thread.join(timeout=5)
+    assert build.hercules_exit.returncode == 3
+    assert not build.hercules_running()
@@ -0,0 +1,117 @@
+import os
+import types
+
+import pytest
+
+import automvs
+
+
+CONFIG = """CNSLPORT 3270
+HTTP PORT 8038
+000C 3505 3505 sockdev ascii trunc eof
+0150 3350 DASD/mvsres.3350 # sysres
+0151 3350 DASD/work.3350 ro
+"""
+
+
+@pytest.fixture
+def golden(mvsce):
+    (mvsce / "conf/local.cnf").write_text(CONFIG)
+    (mvsce / "DASD").mkdir()
+    (mvsce / "DASD/mvsres.3350").write_bytes(b"mvsres")
+    (mvsce / "DASD/work.3350").write_bytes(b"work")
+    return mvsce
+
+
+def test_clone_file_and_tree(tmp_path):
+    (tmp_path / "src/sub").mkdir(parents=True)
+    (tmp_path / "src/a").write_bytes(b"a" * 100000)
+    (tmp_path / "src/sub/b").write_bytes(b"b")
+    (tmp_path / "src/skip").write_bytes(b"skip")
+
+    automvs.clone_file(tmp_path / "src/a", tmp_path / "a")
+    with open(tmp_path / "a", 'r+b') as f:
+        f.write(b"x")
+    assert (tmp_path / "src/a").read_bytes() == b"a" * 100000
+
+    automvs.clone_tree(tmp_path / "src", tmp_path / "dst", ignore=lambda path, names: ['skip'])
+    assert sorted(os.listdir(tmp_path / "dst")) == ['a', 'sub']
+    assert (tmp_path / "dst/sub/b").read_bytes() == b"b"
+
+
+def test_rewrite_ports(golden):
+    pool = types.SimpleNamespace(base_port=20000, port_step=10, PORTS=automvs.mvs_pool.PORTS)
+    config = golden / "conf/local.cnf"
+    assert automvs.mvs_pool.rewrite_ports(pool, config, 1) == {3270: 20010, 8038: 20011, 3505: 20012}
+    assert config.read_text().splitlines()[:3] == [
+        "CNSLPORT 20010", "HTTP PORT 20011", "000C 3505 20012 sockdev ascii trunc eof"]
+
+    pool.port_step = 2
+    config.write_text(CONFIG)
+    with pytest.raises(Exception, match="More than 2 ports"):
+        automvs.mvs_pool.rewrite_ports(pool, config, 0)
+
+
+def test_shadow_copy(golden, tmp_path):
+    pool = types.SimpleNamespace(golden=golden, shadow=True)
+    folder = tmp_path / "i0"
+    automvs.mvs_pool.copy(pool, folder)
+    assert not (folder / "DASD/mvsres.3350").exists()
+    assert (folder / "shadows").is_dir()
+    lines = (folder / "conf/local.cnf").read_text().splitlines()
+    assert lines[3] == f"0150 3350 {golden}/DASD/mvsres.3350 sf={folder}/shadows/mvsres_*.3350 # sysres"
+    assert lines[4] == f"0151 3350 {golden}/DASD/work.3350 ro sf={folder}/shadows/work_*.3350"
+
+
+def test_acquire_release_fresh(golden, tmp_path):
+    with automvs.mvs_pool(golden, size=1, work_dir=tmp_path / "pool", timeout=10) as pool:
+        build = pool.acquire(timeout=10)
+        assert build.hercules_running()
+        assert build.punch_port == 20002 and build.ports[3505] == 20002
+        assert build.mvsce_location == tmp_path / "pool/mvsce0"
+        (build.mvsce_location / "dirty").write_text("")
+        pool.release(build)
+
+        build = pool.acquire(timeout=10)
+        assert not (build.mvsce_location / "dirty").exists()
+        with pytest.raises(Exception, match="No MVS/CE instance"):
+            pool.acquire(timeout=0.1)
+        pool.release(build)
+    assert not build.hercules_running()
+
+
+def test_reipl_keeps_folder(golden):
+    with automvs.mvs_pool(golden, size=1, recycle='reipl', timeout=10) as pool:
+        with pool.instance(timeout=10) as build:
+            (build.mvsce_location / "kept").write_text("")
+        with pool.instance(timeout=10) as again:
+            assert again.hercules_running()
+            assert (again.mvsce_location / "kept").exists()
+        temp_dir = pool.temp_dir
+    assert not os.path.exists(temp_dir)
+
+
+def test_shadow_recycle_clears_shadows(golden):
+    with automvs.mvs_pool(golden, size=1, shadow=True, timeout=10) as pool:
+        with pool.instance(timeout=10) as build:
+            (build.mvsce_location / "shadows/mvsres_1.3350").write_bytes(b"changed")
+        with pool.instance(timeout=10) as build:
+            assert os.listdir(build.mvsce_location / "shadows") == []
+
+
+def test_failed_boot_is_retried(golden, monkeypatch):
+    monkeypatch.setattr(automvs.mvs_pool, 'BOOT_RETRY_DELAY', 0.01)
+    (golden / "fail_boot").write_text("")
+    with automvs.mvs_pool(golden, size=1, timeout=10) as pool:
+        # hercules dies before or after mvs sees it start
+        with pytest.raises(Exception, match='(?i)hercules'):
+            pool.acquire(timeout=10)
+        # still failing, retried again later
+        with pytest.raises(Exception, match='(?i)hercules'):
+            pool.acquire(timeout=10)
+        assert pool.failures == {0: 2}
+
+        (golden / "fail_boot").unlink()
+        build = pool.acquire(timeout=10)
+        assert build.hercules_running()
+        assert pool.failures == {}
@@ -0,0 +1,50 @@
+import automvs
+
+
+def step(jobname, stepname, cc):
+    return f"IEF142I {jobname} {stepname} - STEP WAS EXECUTED - COND CODE {cc}\n"
+
+
+def test_printer_index(tmp_path):
+    printer = tmp_path / "prt00e.txt"
+    printer.write_text(" 10.00.00 JOB   12  $HASP373 BUILD    STARTED\n" + step('BUILD', 'ASM', '0000'))
+    index = automvs.printer_index(printer)
+    assert [r['fields'][2] for r in index.steps('BUILD')] == ['ASM']
+
+    # appended, the last line not finished yet
+    with open(printer, 'a') as f:
+        f.write(step('BUILD', 'LKED', '0004') + " 10.01.00 JOB   13  $HASP373 BUILD    STARTED\n" + step('BUILD', 'ASM', '0008')[:20])
+    assert [r['fields'][2] for r in index.steps('BUILD', jobnum=12)] == ['ASM', 'LKED']
+    assert index.steps('BUILD', jobnum=13) == []
+    with open(printer, 'a') as f:
+        f.write(step('BUILD', 'ASM', '0008')[20:])
+    assert [r['fields'][-1] for r in index.steps('BUILD', jobnum='0013')] == ['0008']
+    assert len(index.steps('BUILD')) == 3
+
+    # hercules restarted, new printer file
+    printer.write_text(step('OTHER', 'GO', '0000'))
+    assert index.steps('BUILD') == []
+    assert index.steps('OTHER')[0]['jobnum'] is None
+
+
+def test_short_lines_skipped(tmp_path):
+    printer = tmp_path / "prt00e.txt"
+    printer.write_text(
+        "IEF142I BUILD ASM - STEP WAS EXECUTED - COND\n"
+        # procstep line cut off before the condition code
+        "IEF142I BUILD ASMFC ASM - STEP WAS EXECUTED - COND CODE\n"
+        "IEF142I BUILD ASMFC LKED - STEP WAS EXECUTED - COND CODE 0004\n")
+    index = automvs.printer_index(printer)
+    assert [r['fields'][3] for r in index.steps('BUILD')] == ['LKED']
+
+
+def test_check_maxcc_procsteps(mvsce):
+    printers = mvsce / "printers"
+    printers.mkdir()
+    (printers / "prt00e.txt").write_text(
+        " JOB   12  $HASP373 BUILD    STARTED\n"
+        "IEF142I BUILD ASMFC ASM - STEP WAS EXECUTED - COND CODE\n"
+        "IEF142I BUILD ASMFC LKED - STEP WAS EXECUTED - COND CODE 0004\n")
+    build = automvs.mvs(mvsce=mvsce)
+    steps = build.check_maxcc('BUILD', steps_cc={'ASMFC.LKED': '0004'})
+    assert [(s['procname'], s['stepname'], s['exitcode']) for s in steps] == [('ASMFC', 'LKED', '0004')]
@@ -0,0 +1,64 @@
+import os
+
+import automvs
+
+# JES2 4.1 (TK4-/TK5, MVS/CE) job separators, START and END cards around
+# each job's punched output: "****A  START  JOB   27  HERC01A   ROOM ..."
+# (the separator line JES2 also prints) cut to 80 columns
+FIXTURE = os.path.join(os.path.dirname(__file__), 'data', 'pch00d.txt')
+
+
+def cards(codepage='cp037'):
+    with open(FIXTURE) as f:
+        return automvs.ebcdic_codec.get(codepage).encode_records(f.read().splitlines())
+
+
+def test_split_decks(tmp_path):
+    punch = tmp_path / 'pch00d.txt'
+    punch.write_bytes(cards())
+    decks = automvs.punch_reader(str(punch)).read_decks()
+    assert [(deck['jobname'], deck['jobnum']) for deck in decks] == [('HERC01A', '27'), ('XMIT#1', '28')]
+    assert decks[0]['cards'] == [
+        "//HERC01B JOB (1),'PUNCHED',CLASS=A,MSGCLASS=A",
+        '//STEP1   EXEC PGM=IEFBR14',
+        '//START   JOB 1 IS JUST A COMMENT HERE',
+        '',
+    ]
+    assert decks[0]['data'] == automvs.ebcdic_codec.get('cp037').encode_records(decks[0]['cards'])
+    assert decks[1]['cards'] == [' INMR01']
+
+
+def test_cards_split_across_reads(tmp_path):
+    punch = tmp_path / 'pch00d.txt'
+    data = cards('cp1047')
+    reader = automvs.punch_reader(str(punch), codepage='cp1047')
+    decks = []
+    with open(punch, 'wb') as f:
+        for start in range(0, len(data), 37):
+            f.write(data[start:start + 37])
+            f.flush()
+            decks += reader.read_decks()
+    assert [deck['jobnum'] for deck in decks] == ['27', '28']
+    assert reader.read_decks() == []
+
+
+def test_truncated_file_starts_over(tmp_path):
+    punch = tmp_path / 'pch00d.txt'
+    punch.write_bytes(cards())
+    reader = automvs.punch_reader(str(punch))
+    assert len(reader.read_decks()) == 2
+    punch.write_bytes(cards()[:80 * 8])
+    assert [deck['jobnum'] for deck in reader.read_decks()] == ['27']
+
+
+def test_missing_file(tmp_path):
+    assert automvs.punch_reader(str(tmp_path / 'pch00d.txt')).read_decks() == []
+
+
+def test_own_separator(tmp_path):
+    punch = tmp_path / 'pch00d.txt'
+    punch.write_bytes(automvs.ebcdic_codec.get('cp037').encode_records(
+        ['$$ START 5 MYJOB', 'CARD', '$$ END 5 MYJOB']))
+    reader = automvs.punch_reader(str(punch), separator=r'\$\$ (?P<edge>START|END) (?P<jobnum>\d+) (?P<jobname>\S+)')
+    decks = reader.read_decks()
+    assert [(deck['jobname'], deck['jobnum'], deck['cards']) for deck in decks] == [('MYJOB', '5', ['CARD'])]
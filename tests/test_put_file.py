@@ -0,0 +1,56 @@
+import base64
+import io
+import logging
+
+import pytest
+
+import automvs
+
+
+@pytest.fixture
+def remote(automvs_server):
+    remote = automvs.remote_mvs(automvs_port=automvs_server.port, loglevel=logging.WARNING, timeout=5)
+    yield remote
+    remote.disconnect()
+
+
+def records(server):
+    return [base64.b64decode(line) for line in server.uploads[-1]]
+
+
+def test_put_text_fb(automvs_server, remote):
+    lines = ['//TEST JOB', '', 'X' * 80] * 100
+    progress = []
+    sent = remote.put_file(io.StringIO('\n'.join(lines) + '\n'), 'A.B(C)', chunk_size=500, progress=progress.append)
+    assert sent == 300 * 80
+    assert automvs_server.commands[-1] == '/PUT A.B(C) RECFM=FB LRECL=80'
+    assert records(automvs_server) == [line.ljust(80).encode('cp037') for line in lines]
+    # sent in chunks
+    assert len(progress) > 2 and progress[-1] == sent
+
+
+def test_put_text_vb(automvs_server, remote, tmp_path):
+    source = tmp_path / "source.txt"
+    source.write_text("short\r\n\nlonger line\n")
+    assert remote.put_file(str(source), 'A.VB', recfm='vb', lrecl=84) == 16
+    assert automvs_server.commands[-1] == '/PUT A.VB RECFM=VB LRECL=84'
+    assert records(automvs_server) == [b'\xa2\x88\x96\x99\xa3', b'', 'longer line'.encode('cp037')]
+
+
+def test_put_ebcdic_split(automvs_server, remote):
+    data = bytes(range(170))
+    assert remote.put_file(io.BytesIO(data), 'A.B', ebcdic=True) == 240
+    assert records(automvs_server) == [data[:80], data[80:160], data[160:] + b'\x40' * 70]
+
+
+@pytest.mark.parametrize('recfm, lrecl, length', [('FB', 80, 81), ('VB', 84, 81)])
+def test_put_line_too_long(remote, recfm, lrecl, length):
+    with pytest.raises(ValueError, match=f'{recfm} record length of {lrecl}'):
+        remote.put_file(io.StringIO('ok\n' + 'X' * length + '\n'), 'A.B', recfm=recfm, lrecl=lrecl)
+
+
+def test_put_bad_options(remote):
+    with pytest.raises(ValueError, match='FB or VB'):
+        remote.put_file(io.StringIO(''), 'A.B', recfm='U')
+    with pytest.raises(ValueError, match='only be written to FB'):
+        remote.put_file(io.BytesIO(b''), 'A.B', recfm='VB', ebcdic=True)
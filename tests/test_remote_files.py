@@ -0,0 +1,82 @@
+import base64
+import io
+import logging
+
+import pytest
+
+import automvs
+
+
+def base64_lines(data, width=76):
+    text = base64.b64encode(data).decode()
+    return [text[i:i + width] for i in range(0, len(text), width)]
+
+
+def sending(data, size=None):
+    ''' a base64 file as the server sends it, with a '--- Size:' trailer '''
+    return ['--- Sending BASE64 Encoded File', *base64_lines(data), f'--- Size: {len(data) if size is None else size}']
+
+
+@pytest.fixture
+def remote(automvs_server):
+    remote = automvs.remote_mvs(automvs_port=automvs_server.port, loglevel=logging.WARNING, timeout=5)
+    yield remote
+    remote.disconnect()
+
+
+def test_get_file_base64(automvs_server, remote):
+    data = bytes(range(256)) * 10
+    automvs_server.handlers['/FILE'] = lambda tag, values: automvs_server.reply(tag, *sending(data), '--- DONE')
+    out = io.BytesIO()
+    assert remote.get_file('A.B', out) == len(data)
+    assert out.getvalue() == data
+    assert automvs_server.commands[-1] == '/FILE A.B'
+
+
+def test_get_file_size_mismatch(automvs_server, remote):
+    automvs_server.handlers['/FILE'] = lambda tag, values: automvs_server.reply(
+        tag, *sending(b'hello', size=6), '--- DONE')
+    with pytest.raises(Exception, match='received 5 bytes, expected 6'):
+        remote.get_file('A.B', io.BytesIO())
+
+
+def test_get_file_error(automvs_server, remote):
+    automvs_server.handlers['/FILE'] = lambda tag, values: automvs_server.reply(
+        tag, 'Error: dataset not found: A.B')
+    with pytest.raises(Exception, match='dataset not found'):
+        remote.get_file('A.B', io.BytesIO())
+
+
+def test_get_file_trunc(automvs_server, remote):
+    # TRUNC frames are records without their trailing blanks, see frame_writer
+    records = [b'\xc1' * 3, b'', b'\xc2' * 80]
+    frame = b''.join(len(r).to_bytes(2, 'big') + r for r in records)
+    automvs_server.handlers['/FILE'] = lambda tag, values: automvs_server.reply(
+        tag, f'--- Sending TRUNC File LRECL=80 ({len(frame)} bytes)', '--- Size: 240', '--- DONE', data=frame)
+    out = io.BytesIO()
+    assert remote.get_file('A.B', out, mode='trunc') == 240
+    assert out.getvalue() == b''.join(r.ljust(80, b'\x40') for r in records)
+    assert automvs_server.commands[-1] == '/FILE A.B TRUNC'
+
+
+def test_get_files_same_member_in_two_pds(automvs_server, remote, tmp_path):
+    files = {'A.PDS(M1)': b'from a', 'B.PDS(M1)': b'from b', 'A.SEQ': b'sequential'}
+
+    def get_files(tag, values):
+        lines = ['--- Directory', *files, 'C.PDS(GONE)']
+        for dsn, data in files.items():
+            lines += [f'--- File {dsn}', *sending(data), '--- End']
+        lines += ['--- File C.PDS(GONE)', '--- Skipped C.PDS(GONE): not found', '--- DONE']
+        automvs_server.reply(tag, *lines)
+    automvs_server.handlers['/FILES'] = get_files
+
+    progress = []
+    written = remote.get_files('A.PDS(*) B.PDS(*) A.SEQ C.PDS(GONE)', tmp_path,
+                               progress=lambda name, n: progress.append(name))
+    assert written == {
+        'A.PDS(M1)': str(tmp_path / 'A.PDS/M1'),
+        'B.PDS(M1)': str(tmp_path / 'B.PDS/M1'),
+        'A.SEQ': str(tmp_path / 'A.SEQ')}
+    for dsn, path in written.items():
+        assert open(path, 'rb').read() == files[dsn]
+    assert progress == ['A.PDS/M1', 'B.PDS/M1', 'A.SEQ']
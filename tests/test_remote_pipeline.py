@@ -0,0 +1,56 @@
+import asyncio
+import io
+import logging
+
+import pytest
+
+import automvs
+
+
+FILE = bytes(range(256)) * 300 # newlines and # in the data too
+LOOKALIKE = '--- Sending BINARY File (100 bytes)'
+
+
+@pytest.fixture
+def server(automvs_server):
+    ''' answers /JOB half a second later, out of order, the rest at once '''
+    def job(tag, values):
+        name = values.split()[0]
+        automvs_server.later(0.5, tag, '--- Job Results (1)', f'1,{name},S,,P,0000', '--- DONE')
+    automvs_server.handlers['/JOB'] = job
+    # console text that looks like a file header must stay text
+    automvs_server.handlers['/OPER'] = lambda tag, values: automvs_server.reply(
+        tag, '--- Log for oper command:', LOOKALIKE, 'hello', '--- DONE')
+    automvs_server.handlers['/FILE'] = lambda tag, values: automvs_server.reply(
+        tag, f'--- Sending BINARY File ({len(FILE)} bytes)', f'--- Size: {len(FILE)}', '--- DONE', data=FILE)
+    return automvs_server
+
+
+def test_tagged_demux(server):
+    remote = automvs.remote_mvs(automvs_port=server.port, pipeline=True, loglevel=logging.WARNING)
+    try:
+        futures = [remote.request(f'/JOB J{i}', start_string='--- Job Results') for i in range(20)]
+        # answered while the jobs wait
+        assert remote.request('/OPER $D A').result(5) == ['--- Log for oper command:', LOOKALIKE, 'hello']
+        out = io.BytesIO()
+        assert remote.get_file('X', out, mode='binary') == len(FILE)
+        assert out.getvalue() == FILE
+        assert not any(f.done() for f in futures)
+
+        assert [f.result(5) for f in futures] == [[f'1,J{i},S,,P,0000'] for i in range(20)]
+        assert remote.request('/OPER $D A').result(5)[2] == 'hello'
+    finally:
+        remote.disconnect()
+
+
+def test_async_tagged_demux(server):
+    async def run():
+        async with automvs.async_remote_mvs(automvs_port=server.port, timeout=5) as remote:
+            jobs = [asyncio.ensure_future(remote.command(f'/JOB J{i}', start_string='--- Job Results')) for i in range(20)]
+            assert await remote.command('/OPER $D A') == ['--- Log for oper command:', LOOKALIKE, 'hello']
+            out = io.BytesIO()
+            assert await remote.get_file('X', out, mode='binary') == len(FILE)
+            assert out.getvalue() == FILE
+            assert not any(job.done() for job in jobs)
+            assert await asyncio.gather(*jobs) == [[f'1,J{i},S,,P,0000'] for i in range(20)]
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+
+import pytest
+
+import automvs
+
+
+@pytest.fixture
+def server(automvs_server):
+    def waitfor(tag, values):
+        automvs_server.reply(tag, f'--- Waiting 60 seconds for {values}')
+        if values == 'UNFINDABLE':
+            automvs_server.later(0.1, tag, f'Error: string not found in MTT: {values}')
+        else:
+            automvs_server.later(0.1, tag, '--- DONE')
+    automvs_server.handlers['/WAITFOR'] = waitfor
+    return automvs_server
+
+
+def test_wait_for_string(server):
+    remote = automvs.remote_mvs(automvs_port=server.port, loglevel=logging.WARNING, timeout=5)
+    try:
+        remote.wait_for_string('$HASP000 NO ACTIVE JOBS')
+        with pytest.raises(Exception, match='not found'):
+            remote.wait_for_string('UNFINDABLE')
+    finally:
+        remote.disconnect()
+    assert server.commands[:2] == ['/WAITFOR $HASP000 NO ACTIVE JOBS', '/WAITFOR UNFINDABLE']
+
+
+def test_async_wait_for_string(server):
+    async def run():
+        async with automvs.async_remote_mvs(automvs_port=server.port, timeout=5) as remote:
+            await remote.wait_for_string('$HASP000 NO ACTIVE JOBS')
+            with pytest.raises(Exception, match='not found'):
+                await remote.wait_for_string('UNFINDABLE')
+    asyncio.run(run())
+    assert server.commands[:2] == ['/WAITFOR $HASP000 NO ACTIVE JOBS', '/WAITFOR UNFINDABLE']
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+
+import pytest
+
+import automvs
+
+
+def read(decks, count=1):
+    for _ in range(200):
+        if len(decks) >= count:
+            return decks[-1]
+        threading.Event().wait(0.01)
+    raise AssertionError('deck not read')
+
+
+JCL = '//HELLO JOB 1\n//STEP1 EXEC PGM=IEFBR14\n'
+
+
+def test_card_images_across_chunks():
+    cards = b''.join(automvs.card_images(['//HEL', 'LO JOB 1\r\n//STEP1', ' EXEC PGM=IEFBR14']))
+    assert len(cards) == 160
+    assert automvs.ebcdic_codec.get('cp037').decode_records(cards) == ['//HELLO JOB 1', '//STEP1 EXEC PGM=IEFBR14']
+
+
+@pytest.mark.parametrize('ebcdic', [False, True])
+def test_send_str(reader, ebcdic):
+    port, decks = reader
+    sent = automvs.send_deck('127.0.0.1', port, JCL, ebcdic=ebcdic, chunk_size=7)
+    deck = read(decks)
+    assert sent == len(deck)
+    if ebcdic:
+        assert deck == automvs.ebcdic_codec.get('cp037').encode_records(JCL.splitlines())
+    else:
+        assert deck == JCL.encode()
+
+
+@pytest.mark.parametrize('ebcdic', [False, True])
+def test_send_path(reader, tmp_path, ebcdic):
+    port, decks = reader
+    path = tmp_path / 'hello.jcl'
+    path.write_text(JCL)
+    automvs.send_deck('127.0.0.1', port, path, ebcdic=ebcdic)
+    if ebcdic:
+        assert read(decks) == automvs.ebcdic_codec.get('cp037').encode_records(JCL.splitlines())
+    else:
+        assert read(decks) == JCL.encode()
+
+
+def test_send_bytes_as_is(reader, tmp_path):
+    port, decks = reader
+    cards = automvs.ebcdic_codec.get('cp1047').encode_records(JCL.splitlines())
+    automvs.send_deck('127.0.0.1', port, cards, ebcdic=True)
+    assert read(decks) == cards
+    path = tmp_path / 'cards.bin'
+    path.write_bytes(cards)
+    with open(path, 'rb') as f:
+        automvs.send_deck('127.0.0.1', port, f, ebcdic=True)
+    assert read(decks, 2) == cards
+
+
+def test_async_send_path(reader, tmp_path):
+    port, decks = reader
+    path = tmp_path / 'hello.jcl'
+    path.write_text(JCL)
+    sent = asyncio.run(automvs.async_send_deck('127.0.0.1', port, path, ebcdic=True, codepage='cp1047'))
+    assert sent == 160
+    assert read(decks) == automvs.ebcdic_codec.get('cp1047').encode_records(JCL.splitlines())
@@ -0,0 +1,70 @@
+import types
+
+import pytest
+
+import automvs
+
+
+@pytest.fixture
+def golden(tmp_path):
+    folder = tmp_path / "golden"
+    (folder / "conf").mkdir(parents=True)
+    (folder / "DASD").mkdir()
+    (folder / "conf/mvsce.rc").write_text("")
+    (folder / "conf/local.cnf").write_text(
+        "0150 3350 DASD/mvsres.3350 # sysres\n"
+        "0151 3350 DASD/work.3350 ro\n")
+    (folder / "DASD/mvsres.3350").write_bytes(b"mvsres")
+    (folder / "DASD/work.3350").write_bytes(b"work")
+    return folder
+
+
+def pool_copy(golden, folder):
+    automvs.mvs_pool.copy(types.SimpleNamespace(golden=golden, shadow=True), folder)
+
+
+def test_dasd_devices(golden, tmp_path):
+    assert automvs.dasd_devices(golden / "conf/local.cnf") == [
+        ("DASD/mvsres.3350", None), ("DASD/work.3350", None)]
+
+    pool_copy(golden, tmp_path / "i0")
+    devices = automvs.dasd_devices(tmp_path / "i0/conf/local.cnf")
+    assert devices == [
+        (str(golden / "DASD/mvsres.3350"), f"{tmp_path}/i0/shadows/mvsres_*.3350"),
+        (str(golden / "DASD/work.3350"), f"{tmp_path}/i0/shadows/work_*.3350")]
+
+
+def test_snapshot_restore_images(golden):
+    build = automvs.mvs(mvsce=golden)
+    build.snapshot('clean')
+    (golden / "DASD/work.3350").write_bytes(b"changed")
+    assert build.snapshots() == ['clean']
+
+    build.restore('clean')
+    assert (golden / "DASD/work.3350").read_bytes() == b"work"
+
+
+def test_snapshot_restore_shadows(golden, tmp_path):
+    # pool instances read golden's images and write shadow files
+    pool_copy(golden, tmp_path / "i0")
+    shadows = tmp_path / "i0/shadows"
+    (shadows / "mvsres_1.3350").write_bytes(b"ipl")
+    build = automvs.mvs(mvsce=tmp_path / "i0")
+    build.snapshot('ipl')
+    assert sorted(p.name for p in (tmp_path / "i0/snapshots/ipl/shadows").iterdir()) == ["mvsres_1.3350"]
+
+    (shadows / "mvsres_1.3350").write_bytes(b"build")
+    (shadows / "mvsres_2.3350").write_bytes(b"more")
+    (shadows / "work_1.3350").write_bytes(b"build")
+    build.restore('ipl')
+    assert sorted(p.name for p in shadows.iterdir()) == ["mvsres_1.3350"]
+    assert (shadows / "mvsres_1.3350").read_bytes() == b"ipl"
+    assert (golden / "DASD/mvsres.3350").read_bytes() == b"mvsres"
+
+
+def test_snapshot_image_outside_folder(golden, tmp_path):
+    (tmp_path / "other.3350").write_bytes(b"other")
+    with open(golden / "conf/local.cnf", 'a') as f:
+        f.write(f"0152 3350 {tmp_path}/other.3350\n")
+    with pytest.raises(Exception, match="can't be part of a snapshot"):
+        automvs.mvs(mvsce=golden).snapshot('clean')
@@ -0,0 +1,62 @@
+import socket
+import threading
+
+import pytest
+
+import automvs
+
+
+class small_reader(automvs.socket_reader):
+    # small blocks so lines and frames span several recv_into calls
+    BUFFER_SIZE = 7
+
+
+@pytest.fixture
+def pair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+def send_slowly(sock, *pieces):
+    def send():
+        for piece in pieces:
+            sock.sendall(piece)
+            threading.Event().wait(0.01)
+    thread = threading.Thread(target=send)
+    thread.start()
+    return thread
+
+
+def test_lines_across_blocks(pair):
+    a, b = pair
+    sender = send_slowly(a, b'first li', b'ne\nsec', b'ond\n\nthird line is longer than a block\n')
+    reader = small_reader(b)
+    assert [reader.readline(5) for _ in range(4)] == [
+        b'first line', b'second', b'', b'third line is longer than a block']
+    sender.join()
+
+
+def test_frame_after_line(pair):
+    a, b = pair
+    frame = bytes(range(256)) # has newlines in it
+    sender = send_slowly(a, b'--- Sending BINARY File (256 bytes)\n' + frame[:10], frame[10:], b'--- DONE\n')
+    reader = small_reader(b)
+    assert reader.readline(5) == b'--- Sending BINARY File (256 bytes)'
+    assert reader.read(100, 5) + reader.read(156, 5) == frame
+    assert reader.readline(5) == b'--- DONE'
+    sender.join()
+
+
+def test_timeout_and_close(pair):
+    a, b = pair
+    reader = automvs.socket_reader(b)
+    a.sendall(b'partial')
+    with pytest.raises(TimeoutError):
+        reader.readline(0.1)
+    a.sendall(b' line\n')
+    assert reader.readline(5) == b'partial line'
+    a.close()
+    with pytest.raises(ConnectionError):
+        reader.readline(5)
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+import automvs
+
+
+def turnkey(tk, timeout=3):
+    return automvs.turnkey(mvs_tk_path=str(tk.path), punch_port=tk.reader_port,
+                           web_port=tk.web_port, timeout=timeout)
+
+
+def wait_for_decks(tk, count):
+    deadline = time.monotonic() + 3
+    while len(tk.jobnums) < count:
+        assert time.monotonic() < deadline, 'decks not read'
+        time.sleep(0.01)
+
+
+def test_index_prt_lines_by_job_number(tk):
+    build = turnkey(tk)
+    tk.cc['A'] = '0004'
+    tk.run('A', 1)
+    tk.cc['A'] = '0000'
+    tk.run('A', 2)
+    tk.run('B', 3)
+    build.index_prt_lines()
+    assert set(build.prt_jobs) == {('A', '1'), ('A', '2'), ('B', '3')}
+    assert build.parse_maxcc('A', build.pop_prt_job('A', 1), ignore=True)[0]['exitcode'] == '0004'
+    assert build.parse_maxcc('A', build.pop_prt_job('A'))[0]['exitcode'] == '0000'
+    assert build.pop_prt_job('A') == []
+
+
+def test_job_tracker_same_jobname(tk):
+    tk.auto = False
+    build = turnkey(tk)
+    tracker = build.job_tracker(timeout=3)
+    first = tracker.submit('//A JOB 1\n')
+    second = tracker.submit('//A JOB 1\n', steps_cc={'STEP1': '0004'})
+    wait_for_decks(tk, 2)
+
+    # both run and print before either is purged
+    (_, num1), (_, num2) = tk.jobnums
+    for jobnum, cc in ((num1, '0000'), (num2, '0004')):
+        tk.start('A', jobnum)
+        tk.step('A', jobnum, cc=cc)
+        tk.print(f' 12.00.00 JOB {jobnum:>4}  IEF404I A - ENDED - TIME=12.00.00')
+    for jobnum in (num1, num2):
+        tk.log(f'12.00.00 JOB {jobnum:>4}  $HASP250 A        IS PURGED')
+
+    finished = []
+    while tracker.in_flight:
+        finished += tracker.completed()
+    assert [job['jobnum'] for job in finished] == [str(num1), str(num2)]
+    assert first['error'] is None and first['steps'][0]['exitcode'] == '0000'
+    assert second['error'] is None and second['steps'][0]['exitcode'] == '0004'
+
+
+def test_check_maxcc_fails(tk):
+    tk.cc['BAD'] = '0008'
+    build = turnkey(tk)
+    with pytest.raises(ValueError, match='Condition Code'):
+        build.submit_and_check('//BAD JOB 1\n')
@@ -0,0 +1,115 @@
+import logging
+
+import pytest
+
+import automvs
+
+
+def records(deck):
+    data = b''.join(deck)
+    assert len(data) % 80 == 0
+    return [data[i:i + 80] for i in range(0, len(data), 80)]
+
+
+def xmi_file(path, starts):
+    ''' an XMI lookalike, one 80 byte record starting with each of starts '''
+    path.write_bytes(b''.join(start.encode('cp037').ljust(80, b'\x00') for start in starts))
+    return path
+
+
+def test_xmi_deck(tmp_path):
+    # takes the first delimiters there are, and //, /* and blank records
+    taken = ['@@', '@#', '@$', '@A', '//', '/*', '  ']
+    path = xmi_file(tmp_path / "test.xmi", taken)
+    cards = records(automvs.xmi_deck(str(path), 'HERC01.TEST', 'TEST', user='HERC01', password='CUL8TR', replace=True))
+
+    jcl = [card.decode('cp037').rstrip() for card in cards]
+    start = jcl.index('//SYSUT1   DD DATA,DLM=@B') + 1
+    # the file as is, then the delimiter no record of it starts with
+    assert b''.join(cards[start:start + len(taken)]) == path.read_bytes()
+    assert jcl[start + len(taken)] == '@B'
+    assert all(card[:2] != '@B'.encode('cp037') for card in cards[start:start + len(taken)])
+
+    assert jcl[0] == "//TEST JOB (XMI),'DEPLOY XMI',CLASS=A,MSGCLASS=A,"
+    assert jcl[1] == "//         MSGLEVEL=(1,1),USER=HERC01,PASSWORD=CUL8TR"
+    assert jcl[2:5] == ["//DELETE   EXEC PGM=IEFBR14",
+                        "//DD1      DD DSN=HERC01.TEST,DISP=(MOD,DELETE),",
+                        "//            UNIT=SYSALLDA,SPACE=(TRK,0)"]
+    assert jcl[5] == "//UPLOAD   EXEC PGM=IEBGENER"
+    assert "//RECV370  EXEC PGM=RECV370,COND=(0,NE)" in jcl
+    assert "//SYSUT2   DD DSN=HERC01.TEST,DISP=(NEW,CATLG,DELETE),UNIT=SYSALLDA," in jcl
+    assert jcl[-1] == "//"
+
+
+def test_xmi_deck_no_replace(tmp_path):
+    path = xmi_file(tmp_path / "test.xmi", ['\0\0'])
+    jcl = [card.decode('cp037').rstrip() for card in records(automvs.xmi_deck(str(path), 'A.B', 'J'))]
+    assert jcl[1] == "//         MSGLEVEL=(1,1)"
+    assert jcl[2] == "//UPLOAD   EXEC PGM=IEBGENER"
+    assert "//SYSUT1   DD DATA,DLM=@@" in jcl
+
+
+def test_xmi_deck_bad_files(tmp_path):
+    (tmp_path / "short.xmi").write_bytes(b'x' * 81)
+    with pytest.raises(ValueError, match='not a multiple of 80'):
+        automvs.xmi_deck(str(tmp_path / "short.xmi"), 'A.B', 'J')
+    every = [a + b for a in automvs.XMI_DLM_CHARS for b in automvs.XMI_DLM_CHARS]
+    with pytest.raises(ValueError, match='No DLM='):
+        automvs.xmi_deck(str(xmi_file(tmp_path / "full.xmi", every)), 'A.B', 'J')
+
+
+class build:
+    ''' enough of a build for deploy_xmi, every job ends as soon as it is sent '''
+    logger = logging.getLogger('test')
+    username, password = 'HERC01', 'CUL8TR'
+
+    def __init__(self):
+        self.jobs = []
+        self.done = []
+        self.ports = []
+
+    def job_tracker(self, port=None, timeout=False):
+        self.ports.append(port)
+        return self
+
+    @property
+    def in_flight(self):
+        return len(self.jobs) - len(self.done)
+
+    def submit(self, deck, jobname=False, ebcdic=False, **extra):
+        assert ebcdic
+        cards = records(deck)
+        self.jobs.append(dict(extra, jobname=jobname, jobnum=str(len(self.jobs) + 1), sent=len(cards) * 80,
+                              steps=[], error=None, status='PURGED',
+                              card=cards[0].decode('cp037').rstrip()))
+
+    def completed(self):
+        self.done = self.jobs[:]
+        return self.jobs[-1:]
+
+
+def test_deploy_xmi_jobnames(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    paths = {"a/brexx.xmi": None, "b/brexx.xmi": 'herc01.other.brexx',
+             "longname1.xmi": 'HERC01.LONG1', "longname2.xmi": 'HERC01.LONG2',
+             "1st.xmi": None, "brexx1.xmi": None}
+    for path in paths:
+        xmi_file(tmp_path / path, ['\0\0'])
+
+    fake = build()
+    report = automvs.automation.deploy_xmi(fake, {str(tmp_path / p): d for p, d in paths.items()},
+                                           'HERC01.XMI', max_in_flight=1)
+    assert [r['jobname'] for r in report] == ['BREXX', 'BREXX1', 'LONGNAME', 'LONGNAM1', 'X1ST', 'BREXX11']
+    assert [r['dsn'] for r in report] == ['HERC01.XMI.BREXX', 'HERC01.OTHER.BREXX', 'HERC01.LONG1',
+                                          'HERC01.LONG2', 'HERC01.XMI.X1ST', 'HERC01.XMI.BREXX1']
+    # the job card matches the name the job is tracked by
+    assert [job['card'].split()[0] for job in fake.jobs] == [f"//{r['jobname']}" for r in report]
+    assert fake.ports == [3506]
+
+
+def test_deploy_xmi_same_dataset(tmp_path):
+    for path in ["a.xmi", "A.xmi"]:
+        xmi_file(tmp_path / path, ['\0\0'])
+    with pytest.raises(ValueError, match='would also be received to HERC01.XMI.A'):
+        automvs.automation.deploy_xmi(build(), [str(tmp_path / "a.xmi"), str(tmp_path / "A.xmi")], 'HERC01.XMI')